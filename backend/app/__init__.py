@@ -6,7 +6,7 @@ import httpx
 from werkzeug.exceptions import HTTPException
 from .extensions import Session, limiter, socketio, redis, setup_logging
 from .config import Config
-from .api import auth, users, songs, charters, scores, status, leaderboards, spotify, achievements
+from .api import auth, users, songs, charters, scores, status, leaderboards, rankings, spotify, achievements
 from .cli import register_cli
 from .services.supabase_service import init_supabase
 
@@ -36,7 +36,12 @@ def create_app(config_class: type[Config] = Config) -> Flask:
         "allow_headers": ["Content-Type", "Authorization"]
     }})
     Session(app)
-    socketio.init_app(app, cors_allowed_origins=app.config["ALLOWED_ORIGINS"])
+    # the Redis message queue lets ingest worker processes emit to web clients
+    socketio.init_app(
+        app,
+        cors_allowed_origins=app.config["ALLOWED_ORIGINS"],
+        message_queue=app.config.get("REDIS_URL"),
+    )
     redis.init_app(app)
     limiter.init_app(app)
 
@@ -50,6 +55,7 @@ def create_app(config_class: type[Config] = Config) -> Flask:
     app.register_blueprint(scores.bp)
     app.register_blueprint(status.bp)
     app.register_blueprint(leaderboards.bp)
+    app.register_blueprint(rankings.bp)
     app.register_blueprint(spotify.bp)
     app.register_blueprint(achievements.bp)
 
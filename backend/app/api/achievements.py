@@ -1,5 +1,6 @@
-from flask import Blueprint, jsonify
-from ..utils.achievement_processor import achievement_processor
+from flask import Blueprint, request
+from ..utils.achievement_catalog import achievement_catalog
+from ..utils.payloads import send_payload
 from ..types import FlaskResponse
 
 bp = Blueprint("achievements", __name__)
@@ -10,8 +11,6 @@ def get_all_achievements() -> FlaskResponse:
     Retrieve the complete list of all possible achievements
 
     Returns:
-        JSON: Complete achievement definitions
+        JSON: Complete achievement definitions, pre-encoded, with a strong ETag
     """
-    return jsonify({
-        "achievements": achievement_processor.serializable_achievements()
-    })
+    return send_payload(request, achievement_catalog.payload)
@@ -1,21 +1,93 @@
-from flask import Blueprint, jsonify
+from typing import Any, Optional
+from flask import Blueprint, current_app, jsonify, request
+from ..extensions import redis
+from ..services.leaderboard_mirror import get_mirrored_around, get_mirrored_page, get_mirrored_rank, mirrored_size
+from ..services.leaderboard_store import (
+    get_leaderboard_around,
+    get_leaderboard_page,
+    get_song_leaderboard,
+    get_song_leaderboard_size,
+)
 from ..services.supabase_service import get_supabase, rows
 from ..types import FlaskResponse
+from ..utils.helpers import int_arg
 
 bp = Blueprint("leaderboard", __name__)
 
+MAX_PAGE_LIMIT = 100
+DEFAULT_PAGE_LIMIT = 50
+MAX_AROUND_RADIUS = 50
+DEFAULT_AROUND_RADIUS = 5
+
+def _mirror() -> Optional[Any]:
+    """the redis client when leaderboard reads may use the mirror"""
+    return redis if current_app.config.get("LEADERBOARD_MIRROR") else None
+
 @bp.route("/api/leaderboard/<string:song_id>", methods=["GET"])
 def get_leaderboard(song_id: str) -> FlaskResponse:
+    """
+    a song's leaderboard
+
+    with no query args the whole leaderboard is returned. ``offset``/``limit``
+    return one page in rank order, and ``around=<user_id>`` returns that user's
+    entry with up to ``radius`` entries on either side. ``total`` is always the
+    song's full entry count.
+    """
+    around = request.args.get("around")
+    try:
+        offset = int_arg("offset")
+        limit = int_arg("limit")
+        radius = int_arg("radius", DEFAULT_AROUND_RADIUS)
+    except ValueError:
+        return jsonify({"error": "offset, limit and radius must be non-negative integers"}), 400
+
     supabase = get_supabase()
 
-    query = supabase.table("songs_new").select("leaderboard").eq("id", song_id)
-    result = query.execute()
+    song = get_song_leaderboard_size(supabase, song_id)
+    if song is None:
+        return jsonify({"error": "Song not found"}), 404
+    md5, total = song
 
-    if not result.data:
+    if around:
+        radius = min(radius or 0, MAX_AROUND_RADIUS)
+        mirror = _mirror()
+        leaderboard = get_mirrored_around(mirror, md5, around, radius) if mirror else None
+        if leaderboard is None:
+            leaderboard = get_leaderboard_around(supabase, md5, around, radius)
+        return jsonify({"leaderboard": leaderboard, "total": total, "around": around, "radius": radius})
+
+    if offset is not None or limit is not None:
+        offset = offset or 0
+        limit = min(DEFAULT_PAGE_LIMIT if limit is None else limit, MAX_PAGE_LIMIT)
+        mirror = _mirror()
+        leaderboard = get_mirrored_page(mirror, md5, offset, limit) if mirror else None
+        if leaderboard is None:
+            leaderboard = get_leaderboard_page(supabase, md5, offset, limit)
+        return jsonify({"leaderboard": leaderboard, "total": total, "offset": offset, "limit": limit})
+
+    leaderboard = get_song_leaderboard(supabase, md5)
+    return jsonify({"leaderboard": leaderboard, "total": len(leaderboard)})
+
+@bp.route("/api/leaderboard/<string:song_id>/rank/<string:user_id>", methods=["GET"])
+def get_leaderboard_rank(song_id: str, user_id: str) -> FlaskResponse:
+    """a user's rank on a song's leaderboard"""
+    supabase = get_supabase()
+
+    song = get_song_leaderboard_size(supabase, song_id)
+    if song is None:
         return jsonify({"error": "Song not found"}), 404
+    md5, total = song
+
+    mirror = _mirror()
+    if mirror and mirrored_size(mirror, md5) is not None:
+        rank = get_mirrored_rank(mirror, md5, user_id)
+    else:
+        entries = get_leaderboard_around(supabase, md5, user_id, 0)
+        rank = entries[0].get("rank") if entries else None
 
-    leaderboard = rows(result.data)[0].get("leaderboard", []) or []
-    return jsonify({"leaderboard": leaderboard})
+    if rank is None:
+        return jsonify({"error": "No score on this song"}), 404
+    return jsonify({"user_id": user_id, "rank": rank, "total": total})
 
 @bp.route("/api/user/<string:user_id>/scores", methods=["GET"])
 def get_user_scores(user_id: str) -> FlaskResponse:
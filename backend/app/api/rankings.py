@@ -0,0 +1,97 @@
+from flask import Blueprint, jsonify, request
+from ..services.player_standings import (
+    STANDING_BOARDS,
+    get_ranking_changes,
+    get_standings_around,
+    get_standings_page,
+)
+from ..services.supabase_service import get_supabase
+from ..types import FlaskResponse
+from ..utils.helpers import int_arg
+
+bp = Blueprint("rankings", __name__)
+
+MAX_PAGE_LIMIT = 100
+DEFAULT_PAGE_LIMIT = 50
+MAX_NEARBY_RANGE = 25
+DEFAULT_NEARBY_RANGE = 5
+MAX_CHANGES_LIMIT = 100
+DEFAULT_CHANGES_LIMIT = 20
+
+def _board() -> str:
+    return request.args.get("by") or "elo"
+
+@bp.route("/api/rankings", methods=["GET"])
+def get_rankings() -> FlaskResponse:
+    """
+    one page of the global player standings
+
+    params:
+        by (str, optional): elo (default), total_score, total_fcs or avg_percent
+        offset (int, optional): standings to skip
+        limit (int, optional): page size, at most 100
+
+    returns:
+        JSON: ``rankings`` in position order and the board's ``total``
+    """
+    board = _board()
+    if board not in STANDING_BOARDS:
+        return jsonify({"error": f"by must be one of {', '.join(STANDING_BOARDS)}"}), 400
+    try:
+        offset = int_arg("offset", 0) or 0
+        limit = int_arg("limit", DEFAULT_PAGE_LIMIT) or 0
+    except ValueError:
+        return jsonify({"error": "offset and limit must be non-negative integers"}), 400
+    limit = min(limit, MAX_PAGE_LIMIT)
+
+    rankings, total = get_standings_page(get_supabase(), board, offset, limit)
+    return jsonify({"rankings": rankings, "total": total, "by": board, "offset": offset, "limit": limit})
+
+@bp.route("/api/rankings/recent-changes", methods=["GET"])
+def get_recent_ranking_changes() -> FlaskResponse:
+    """
+    feed of ELO and ELO-rank changes, oldest first
+
+    params:
+        since (int, optional): cursor from a previous response; only newer changes are returned
+        limit (int, optional): at most 100
+
+    returns:
+        JSON: ``changes`` and ``next_cursor`` to pass as ``since`` on the next poll
+    """
+    try:
+        since = int_arg("since")
+        limit = min(int_arg("limit", DEFAULT_CHANGES_LIMIT) or 0, MAX_CHANGES_LIMIT)
+    except ValueError:
+        return jsonify({"error": "since and limit must be non-negative integers"}), 400
+
+    changes = get_ranking_changes(get_supabase(), since, limit) if limit else []
+    next_cursor = changes[-1]["id"] if changes else since
+    return jsonify({"changes": changes, "next_cursor": next_cursor})
+
+@bp.route("/api/rankings/<string:user_id>", methods=["GET"])
+def get_nearby_rankings(user_id: str) -> FlaskResponse:
+    """
+    a user's standing and the players around them
+
+    params:
+        by (str, optional): elo (default), total_score, total_fcs or avg_percent
+        range (int, optional): players to include on either side, at most 25
+
+    returns:
+        JSON: the ``user``'s standing, ``rankings`` around it and the board's ``total``
+    """
+    board = _board()
+    if board not in STANDING_BOARDS:
+        return jsonify({"error": f"by must be one of {', '.join(STANDING_BOARDS)}"}), 400
+    try:
+        radius = min(int_arg("range", DEFAULT_NEARBY_RANGE) or 0, MAX_NEARBY_RANGE)
+    except ValueError:
+        return jsonify({"error": "range must be a non-negative integer"}), 400
+
+    found = get_standings_around(get_supabase(), board, user_id, radius)
+    if found is None:
+        return jsonify({"error": "User is not ranked"}), 404
+
+    user, rankings, total = found
+    return jsonify({"user": user, "rankings": rankings, "total": total, "by": board, "range": radius})
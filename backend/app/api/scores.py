@@ -1,23 +1,41 @@
 from flask import Blueprint, jsonify, request, current_app
 from ..services.supabase_service import get_supabase, rows
+from ..services.cpu_pool import run_cpu_bound
+from ..services.ingest_queue import enqueue_ingest_job, get_ingest_job
+from ..services.progress_reporter import ProgressReporter, write_processing_status
+from ..services.leaderboard_mirror import mirror_leaderboard_updates, mirror_merged_scores
+from ..services.leaderboard_store import fetch_leaderboards
+from ..services.song_fetcher import SONG_FETCH_CONCURRENCY, fetch_songs_by_md5
+from ..services.upload_digest import (
+    forget_processed_upload,
+    get_processed_upload,
+    record_processed_upload,
+    scoredata_digest,
+)
 from ..utils.helpers import allowed_file, get_process_songs_script
 from ..extensions import socketio, redis
 from datetime import datetime, UTC
+import io
 import re
-from typing import Any, BinaryIO, Callable, Dict, Optional
-from ..utils.achievement_processor import achievement_processor
+from typing import Any, BinaryIO, Callable, Dict, List, Optional
+from ..utils.achievement_index import achievement_view, score_changes
+from ..utils.achievement_processor import achievement_processor, process_user_achievements_incremental
 from ..utils.helpers import token_required
 from ..utils.score_processing import (
+    DRUMS_INSTRUMENT,
     apply_score_to_leaderboard,
     evaluate_score_update,
     merge_unknown_scores,
+    select_changed_songs,
+    to_leaderboard_score,
 )
 from ..utils.user_stats import compute_user_stats
 from ..utils.leaderboard_writer import (
     LEADERBOARD_CHUNK_SIZE,
+    merge_leaderboard_scores,
     push_leaderboard_updates as _push_leaderboard_updates,
 )
-from ..types import FlaskResponse
+from ..types import FlaskResponse, LeaderboardScore
 
 bp = Blueprint("scores", __name__)
 
@@ -27,38 +45,62 @@ bp = Blueprint("scores", __name__)
 parse_score_data: Callable[[BinaryIO], Dict[str, Any]]
 exec(get_process_songs_script())
 
+def parse_scoredata_bytes(data: bytes) -> Dict[str, Any]:
+    """Run ``parse_score_data`` over raw bytes; picklable for the CPU pool."""
+    return parse_score_data(io.BytesIO(data))
+
 def update_processing_status(
     user_id: str, status: str, progress: float, processed: int, total: int
 ) -> None:
     """
     updates the processing status in redis
     """
-    redis.hset(f"processing_status:{user_id}", mapping={
-        "status": status,
-        "progress": progress,
-        "processed": processed,
-        "total": total
-    })
-
-def process_and_save_scores(result: Dict[str, Any], user_id: str) -> None:
+    write_processing_status(redis, user_id, status, progress, processed, total)
+
+def report_ingest_failure(user_id: str, error: str) -> None:
+    """Tell the user an ingest job gave up after exhausting its retries."""
+    update_processing_status(user_id, "error", 100, 0, 0)
+    socketio.emit("score_processing_error",
+                  {"message": "Score processing failed, please try uploading again"},
+                  to=user_id)
+
+def process_and_save_scores(
+    result: Dict[str, Any],
+    user_id: str,
+    upload_digest: Optional[str] = None,
+    heartbeat: Optional[Callable[[], None]] = None,
+) -> bool:
     """
     Process scoredata.bin content and save scores to the database
     
     Args:
         result: Result from PSDF.parse()
         user_id: Discord ID of the user
+        upload_digest: SHA-256 of the uploaded file, recorded on a clean run so
+            identical re-uploads can be skipped
+        heartbeat: called whenever progress is reported, so the ingest worker
+            knows the job is still running
         
     Returns:
-        count: Number of scores processed
+        False if a fatal error stopped processing (already reported to the user)
     """
     supabase = get_supabase()
     logger = current_app.logger
     total_songs = len(result["songs"])
-    processed_songs = 0
     leaderboard_updates = []
+    # with the merge RPC only compact scores go to the database, which merges them
+    merge_in_db = bool(current_app.config.get("LEADERBOARD_MERGE_RPC"))
+    merge_scores: List[LeaderboardScore] = []
+    mirror = bool(current_app.config.get("LEADERBOARD_MIRROR"))
+    reporter = ProgressReporter(
+        redis, socketio.emit, user_id,
+        min_interval=current_app.config.get("PROGRESS_MIN_INTERVAL", 0.5),
+        min_delta=current_app.config.get("PROGRESS_MIN_DELTA", 1.0),
+        on_update=heartbeat,
+    )
 
     logger.info(f"Fetching user data for user {user_id}")
-    user_data = rows(supabase.table("users").select("username, scores, unknown_scores, stats, achievements").eq("id", user_id).execute().data)
+    user_data = rows(supabase.table("users").select("username, scores, unknown_scores, stats, achievements, achievement_counters").eq("id", user_id).execute().data)
     username = user_data[0]["username"] if user_data else "Unknown User"
 
     existing_scores = user_data[0].get("scores", []) if user_data else []
@@ -68,6 +110,8 @@ def process_and_save_scores(result: Dict[str, Any], user_id: str) -> None:
     else:
         existing_scores = []
         logger.info("No existing scores found for user")
+    # what the stored achievement counters were computed from, before anything below mutates the scores
+    previous_achievement_scores = [achievement_view(s) for s in existing_scores if s.get("speed", 0) >= 100]
 
     existing_unknown_scores = user_data[0].get("unknown_scores", []) if user_data else []
     existing_unknown_scores_dict = {}
@@ -77,27 +121,45 @@ def process_and_save_scores(result: Dict[str, Any], user_id: str) -> None:
         existing_unknown_scores = []
         logger.info("No existing unknown scores found for user")
 
-    batch_size = 500
-    songs_dict = {}
+    changed_songs = select_changed_songs(
+        result["songs"], existing_scores_dict, existing_unknown_scores_dict
+    )
+    processed_songs = total_songs - len(changed_songs)
+    logger.info(f"{len(changed_songs)} of {total_songs} songs changed since the last upload")
+
     unknown_identifiers = [s["identifier"] for s in existing_unknown_scores if "identifier" in s]
     song_identifiers = list(dict.fromkeys(
-        [song["identifier"] for song in result["songs"]] + unknown_identifiers
+        [song["identifier"] for song in changed_songs] + unknown_identifiers
     ))
 
-    logger.info(f"Fetching song data for {len(song_identifiers)} songs")
-    for i in range(0, len(song_identifiers), batch_size):
-        batch = song_identifiers[i:i+batch_size]
-        logger.info(f"Fetching batch of {len(batch)} songs")
+    def report_batch(start: int, count: int, seconds: float) -> None:
+        logger.info(f"Fetched batch of {count} songs in {seconds:.2f}s")
         socketio.emit("score_processing_fetching_songs",
-                        {"message": f"Fetching user scores for songs {i+1} - {i+len(batch)}"},
+                        {"message": f"Fetching user scores for songs {start+1} - {start+count}"},
                         to=user_id)
-        batch_songs_info = rows(supabase.table("songs_new").select("md5,name,artist,charter_refs,leaderboard").in_("md5", batch).execute().data)
-        songs_dict.update({song["md5"]: song for song in batch_songs_info})
+
+    logger.info(f"Fetching song data for {len(song_identifiers)} songs")
+    fetch_concurrency = current_app.config.get("SONG_FETCH_CONCURRENCY", SONG_FETCH_CONCURRENCY)
+    songs_dict = fetch_songs_by_md5(
+        supabase, song_identifiers, concurrency=fetch_concurrency, on_batch=report_batch
+    )
+    if not merge_in_db:
+        leaderboards = fetch_leaderboards(supabase, list(songs_dict), concurrency=fetch_concurrency)
+        for md5, song_row in songs_dict.items():
+            song_row["leaderboard"] = leaderboards.get(md5, [])
 
     newly_known_scores, remaining_unknown_scores, unknown_leaderboard_updates = merge_unknown_scores(
         existing_unknown_scores, songs_dict, user_id, username, existing_scores_dict
     )
-    leaderboard_updates.extend(unknown_leaderboard_updates)
+    if merge_in_db:
+        merge_scores.extend(
+            to_leaderboard_score(update["md5"], entry)
+            for update in unknown_leaderboard_updates
+            for entry in update["leaderboard"]
+            if entry["user_id"] == user_id
+        )
+    else:
+        leaderboard_updates.extend(unknown_leaderboard_updates)
 
     if existing_scores:
         existing_scores.extend(newly_known_scores)
@@ -114,12 +176,12 @@ def process_and_save_scores(result: Dict[str, Any], user_id: str) -> None:
     else:
         existing_unknown_scores_dict = {}
 
-    for song in result["songs"]:
+    for song in changed_songs:
         processed_songs += 1
         song_info = songs_dict.get(song["identifier"], None)
     
         for score in song["scores"]:
-            if score["instrument"] == 9:  # drums
+            if score["instrument"] == DRUMS_INSTRUMENT:
                 play_count = song["play_count"]
                 if song_info:
                     existing_user_score = existing_scores_dict.get(song["identifier"], None)
@@ -147,8 +209,6 @@ def process_and_save_scores(result: Dict[str, Any], user_id: str) -> None:
                                                              else song_info.get("charter_refs", []))
                        existing_scores_dict[song["identifier"]] = incoming_score_data
 
-                    leaderboard = song_info.get("leaderboard", []) or []
-
                     leaderboard_entry_from_incoming = {
                         "user_id": user_id,
                         "username": username,
@@ -160,6 +220,11 @@ def process_and_save_scores(result: Dict[str, Any], user_id: str) -> None:
                         "posted": incoming_score_data["posted"]
                     }
 
+                    if merge_in_db:
+                        merge_scores.append(to_leaderboard_score(song["identifier"], leaderboard_entry_from_incoming))
+                        continue
+
+                    leaderboard = song_info.get("leaderboard", []) or []
                     leaderboard, should_update_leaderboard = apply_score_to_leaderboard(
                         leaderboard, leaderboard_entry_from_incoming, user_id
                     )
@@ -196,15 +261,12 @@ def process_and_save_scores(result: Dict[str, Any], user_id: str) -> None:
                     if evaluate_score_update(incoming_unknown_score_data, existing_unknown_score):
                         existing_unknown_scores_dict[song["identifier"]] = incoming_unknown_score_data
 
-        progress = (processed_songs / total_songs) * 100
-        update_processing_status(user_id, "in_progress", progress, processed_songs, total_songs)
-        socketio.emit("score_processing_progress",
-                        {"progress": progress, "processed": processed_songs, "total": total_songs},
-                        to=user_id)
+        reporter.songs(processed_songs, total_songs)
+    reporter.flush()
 
     failed_md5s: set[str] = set()
-    if leaderboard_updates:
-        total_updates = len(leaderboard_updates)
+    if leaderboard_updates or merge_scores:
+        total_updates = len(merge_scores) if merge_in_db else len(leaderboard_updates)
         logger.info(f"Updating leaderboards for {total_updates} songs")
         socketio.emit("score_processing_uploading",
                     {"message": f"Updating leaderboards for {total_updates} songs"},
@@ -216,15 +278,25 @@ def process_and_save_scores(result: Dict[str, Any], user_id: str) -> None:
         def report_progress(written: int) -> None:
             nonlocal pushed
             pushed += written
-            socketio.emit("score_processing_updating_progress",
-                        {"message": f"Updating leaderboards {pushed} / {total_updates}",
-                         "progress": (pushed / total_updates) * 100},
-                        to=user_id)
+            reporter.leaderboards(pushed, total_updates)
 
-        failed_updates = _push_leaderboard_updates(
-            supabase, leaderboard_updates, LEADERBOARD_CHUNK_SIZE, logger, report_progress
-        )
-        failed_md5s = {update["md5"] for update in failed_updates}
+        if merge_in_db:
+            merged_ranks, failed_scores = merge_leaderboard_scores(
+                supabase, user_id, username, merge_scores, LEADERBOARD_CHUNK_SIZE, logger, report_progress,
+                (lambda chunk, merged: mirror_merged_scores(redis, user_id, username, chunk, merged))
+                if mirror else None,
+            )
+            for identifier, rank in merged_ranks.items():
+                if identifier in existing_scores_dict:
+                    existing_scores_dict[identifier]["rank"] = rank
+            failed_md5s = {merge_score["md5"] for merge_score in failed_scores}
+        else:
+            failed_updates = _push_leaderboard_updates(
+                supabase, leaderboard_updates, LEADERBOARD_CHUNK_SIZE, logger, report_progress,
+                (lambda chunk: mirror_leaderboard_updates(redis, chunk)) if mirror else None,
+            )
+            failed_md5s = {update["md5"] for update in failed_updates}
+        reporter.flush()
 
         if failed_md5s:
             logger.error(
@@ -271,15 +343,20 @@ def process_and_save_scores(result: Dict[str, Any], user_id: str) -> None:
         "achievements": user_data[0].get("achievements", {}) or {},
     }
 
+    achievement_changes = score_changes(previous_achievement_scores, achievement_filtered_scores)
+    achievement_counters = user_data[0].get("achievement_counters") if user_data else None
+
     try:
-        achievements, achievement_errors = achievement_processor.process_achievements(user_achievement_data)
+        achievements, achievement_errors, achievement_counters = run_cpu_bound(
+            process_user_achievements_incremental, user_achievement_data, achievement_changes, achievement_counters
+        )
     except Exception as e:
         logger.error(f"Fatal error during achievement processing for user {user_id}: {str(e)}", exc_info=True)
         update_processing_status(user_id, "error", 100, processed_songs, total_songs)
         socketio.emit("score_processing_error",
                       {"message": "A fatal error occurred during achievement processing"},
                       to=user_id)
-        return
+        return False
 
     existing_achievements = user_data[0].get("achievements", {}) or {}
     for achievement_id, timestamp in achievements.items():
@@ -293,6 +370,7 @@ def process_and_save_scores(result: Dict[str, Any], user_id: str) -> None:
         "scores": updated_scores,
         "unknown_scores": updated_unknown_scores,
         "achievements": achievements,
+        "achievement_counters": achievement_counters,
     }
 
     logger.info(f"Updating scores and achievements for user {user_id}")
@@ -308,7 +386,7 @@ def process_and_save_scores(result: Dict[str, Any], user_id: str) -> None:
         socketio.emit("score_processing_error",
                       {"message": "Failed to save final scores/achievements to profile"},
                       to=user_id)
-        return
+        return False
 
     if achievement_errors and failed_md5s:
         final_message = "Score processing completed with achievement errors and incomplete leaderboard updates."
@@ -321,11 +399,19 @@ def process_and_save_scores(result: Dict[str, Any], user_id: str) -> None:
 
     final_status = "completed_with_errors" if (achievement_errors or failed_md5s) else "completed"
 
+    if upload_digest and final_status == "completed":
+        record_processed_upload(redis, user_id, upload_digest, {
+            "total_songs": total_songs,
+            "changed_songs": len(changed_songs),
+            "leaderboard_updates": len(merge_scores) if merge_in_db else len(leaderboard_updates),
+        })
+
     update_processing_status(user_id, final_status, 100, total_songs, total_songs)
     socketio.emit("score_processing_complete",
                   {"message": final_message, "status": final_status, "errors": achievement_errors},
                   to=user_id)
     logger.info(final_message)
+    return True
 
 @bp.route("/api/upload_scoredata", methods=["POST"])
 @token_required
@@ -350,10 +436,27 @@ def upload_scoredata(user_id: str) -> FlaskResponse:
         if file.filename != "scoredata.bin":
             return jsonify({"error": "File must be named scoredata.bin"}), 400
         
+        data = file.read()
+        digest = scoredata_digest(data)
+        previous = get_processed_upload(redis, user_id, digest)
+        if previous is not None:
+            message = "Score data unchanged since the last upload, nothing to process."
+            update_processing_status(user_id, "completed", 100, previous.get("total_songs", 0), previous.get("total_songs", 0))
+            socketio.emit("score_processing_complete",
+                          {"message": message, "status": "completed", "errors": []},
+                          to=user_id)
+            return jsonify({
+                "message": message,
+                "total_songs": previous.get("total_songs", 0),
+                "duplicate": True,
+                "previous": previous,
+            }), 200
+        forget_processed_upload(redis, user_id)
+
         try:
             socketio.emit("score_processing_start", to=user_id)
             # from process_songs.py, encoded and saved in env
-            result = parse_score_data(file.stream)  # type: ignore
+            result = run_cpu_bound(parse_scoredata_bytes, data)
             
             if not result:
                 return jsonify({"error": "Invalid score data"}), 400
@@ -361,12 +464,21 @@ def upload_scoredata(user_id: str) -> FlaskResponse:
             if result["version"] != 20211009:
                 return jsonify({"error": "Score data is outdated"}), 400
             
-            def run_with_app_context(app: Any, result: Dict[str, Any], user_id: str) -> None:
+            if current_app.config.get("INGEST_QUEUE_ENABLED"):
+                job_id = enqueue_ingest_job(redis, user_id, result, digest)
+                update_processing_status(user_id, "queued", 0, 0, len(result["songs"]))
+                return jsonify({
+                    "message": "Score processing queued",
+                    "total_songs": len(result["songs"]),
+                    "job_id": job_id,
+                }), 202
+
+            def run_with_app_context(app: Any, result: Dict[str, Any], user_id: str, digest: str) -> None:
                 with app.app_context():
-                    process_and_save_scores(result, user_id)
+                    process_and_save_scores(result, user_id, digest)
             
             app = current_app._get_current_object()  # type: ignore[attr-defined]
-            socketio.start_background_task(run_with_app_context, app, result, user_id)
+            socketio.start_background_task(run_with_app_context, app, result, user_id, digest)
             
             return jsonify({"message": "Score processing started", "total_songs": len(result["songs"])}), 202
         except ValueError as e:
@@ -396,6 +508,29 @@ def processing_status(user_id: str) -> FlaskResponse:
     else:
         return jsonify({"status": "no_active_processing"}), 200
 
+@bp.route("/api/ingest_jobs/<string:job_id>", methods=["GET"])
+@token_required
+def ingest_job_status(user_id: str, job_id: str) -> FlaskResponse:
+    """
+    Retrieves a queued score ingest job owned by the user
+
+    returns:
+        JSON: job status, attempt count, and last error
+    """
+    job = get_ingest_job(redis, job_id)
+    if not job or job.get("user_id") != user_id:
+        return jsonify({"error": "Job not found"}), 404
+
+    return jsonify({
+        "id": job["id"],
+        "status": job.get("status"),
+        "attempts": job["attempts"],
+        "total_songs": int(job.get("total_songs") or 0),
+        "created_at": job.get("created_at"),
+        "finished_at": job.get("finished_at") or None,
+        "error": job.get("error") or None,
+    }), 200
+
 def find_file_path_for_md5(file_content: bytes, md5_hex: str, search_back: int = 1024) -> Optional[str]:
     """
     Searches for the specified MD5 hash in the binary file and extracts the relevant file path.
@@ -2,15 +2,22 @@ import re
 import requests
 from datetime import datetime, UTC
 from flask import Blueprint, jsonify, request, current_app, Response
-from typing import Any, Dict, Iterator
+from typing import Any, Dict, Iterator, Optional
+from ..extensions import redis
+from ..services.leaderboard_mirror import forget_leaderboard
+from ..services.related_songs import RELATIONS, fetch_related_songs
+from ..services.song_browse import BROWSE_SORT_COLUMNS, browse_songs, decode_cursor
+from ..services.song_catalog import parse_timestamp, request_song_list, song_catalog
+from ..services.song_extras import get_song_extra_payload, invalidate_song_extras
+from ..services.song_rows import SongKey, lookup_songs, song_key, song_rows
+from ..services.song_snapshots import snapshot_response
 from ..services.supabase_service import get_supabase, rows
-from ..utils.helpers import token_required
+from ..utils.helpers import int_arg, token_required
+from ..utils.payloads import send_payload
 from ..types import FlaskResponse
 
 bp = Blueprint("songs", __name__)
 
-session = requests.Session()
-
 ALLOWED_FIELDS = {"name", "artist", "album", "year", "genre", "charter", "song_length", "last_update", "scores_count", "md5"}
 ALLOWED_FILTERS = {"name", "artist", "album", "genre", "charter"}
 
@@ -19,6 +26,136 @@ SLIM_SONG_COLUMNS = (
     "scores_count,last_update,instruments,has_2x_kick,loading_phrase,playlist_path"
 )
 
+MAX_SEARCH_LIMIT = 100
+DEFAULT_SEARCH_LIMIT = 25
+MAX_BROWSE_LIMIT = 100
+DEFAULT_BROWSE_LIMIT = 50
+MAX_TOP_LIMIT = 100
+DEFAULT_TOP_LIMIT = 20
+
+@bp.route("/api/songs/search", methods=["GET"])
+def search_songs() -> FlaskResponse:
+    """
+    searches the song list by name, artist, album and charter
+
+    params:
+        q (str): search terms; a song matches when it contains every term
+        offset (int, optional): results to skip
+        limit (int, optional): page size, at most 100
+
+    returns:
+        JSON: ranked ``songs`` and the ``total`` number of matches
+    """
+    query = (request.args.get("q") or "").strip()
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+    try:
+        offset = int_arg("offset", 0) or 0
+        limit = min(int_arg("limit", DEFAULT_SEARCH_LIMIT) or 0, MAX_SEARCH_LIMIT)
+    except ValueError:
+        return jsonify({"error": "offset and limit must be non-negative integers"}), 400
+
+    if not song_catalog.ensure_fresh():
+        return jsonify({"error": "Failed to fetch songs"}), 502
+
+    songs, total = song_catalog.index.search(query, offset, limit)
+    return jsonify({"songs": songs, "total": total, "offset": offset, "limit": limit})
+
+@bp.route("/api/songs/browse", methods=["GET"])
+def browse() -> FlaskResponse:
+    """
+    pages through songs matching exact filters, in a chosen order
+
+    params:
+        name, artist, album, genre, charter (str, optional): filters; name
+            matches anywhere in the song name, charter any credited charter
+        sort (str, optional): one of BROWSE_SORT_COLUMNS, default name
+        order (str, optional): asc (default) or desc
+        limit (int, optional): page size, at most 100
+        cursor (str, optional): next_cursor of the previous page
+
+    returns:
+        JSON: ``songs`` and the ``next_cursor``, null on the last page
+    """
+    sort = request.args.get("sort", "name")
+    if sort not in BROWSE_SORT_COLUMNS:
+        return jsonify({"error": f"Invalid sort field: {sort}"}), 400
+    order = request.args.get("order", "asc")
+    if order not in ("asc", "desc"):
+        return jsonify({"error": "order must be asc or desc"}), 400
+    unknown = set(request.args) - ALLOWED_FILTERS - {"sort", "order", "limit", "cursor"}
+    if unknown:
+        return jsonify({"error": f"Invalid filter: {', '.join(sorted(unknown))}"}), 400
+    filters = {name: request.args[name] for name in ALLOWED_FILTERS if request.args.get(name)}
+    try:
+        limit = min(int_arg("limit", DEFAULT_BROWSE_LIMIT) or 0, MAX_BROWSE_LIMIT)
+        cursor = request.args.get("cursor")
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if limit == 0:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+
+    songs, next_cursor = browse_songs(
+        get_supabase(), SLIM_SONG_COLUMNS, filters, sort, order == "desc", limit, after
+    )
+    return jsonify({"songs": songs, "next_cursor": next_cursor, "sort": sort, "order": order, "limit": limit})
+
+def _top_limit() -> int:
+    limit = min(int_arg("limit", DEFAULT_TOP_LIMIT) or 0, MAX_TOP_LIMIT)
+    if limit == 0:
+        raise ValueError("limit must be a positive integer")
+    return limit
+
+@bp.route("/api/songs/popular", methods=["GET"])
+def get_popular_songs() -> FlaskResponse:
+    """
+    retrieves the songs with the most leaderboard entries
+
+    params:
+        limit (int, optional): number of songs, at most 100
+
+    returns:
+        JSON: songs by scores_count, highest first
+    """
+    try:
+        limit = _top_limit()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    result = (
+        get_supabase().table("songs_new").select(SLIM_SONG_COLUMNS)
+        .order("scores_count", desc=True, nullsfirst=False)
+        .order("id")
+        .limit(limit)
+        .execute()
+    )
+    return jsonify(result.data)
+
+@bp.route("/api/songs/recent", methods=["GET"])
+def get_recent_songs() -> FlaskResponse:
+    """
+    retrieves the songs played most recently
+
+    params:
+        limit (int, optional): number of songs, at most 100
+        unique_users (bool, optional): at most one song per player
+
+    returns:
+        JSON: songs with most_recent_player, most_recent_user_id and
+        most_recent_date, newest first
+    """
+    try:
+        limit = _top_limit()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    unique_users = request.args.get("unique_users", "false").lower() in ("1", "true", "yes")
+
+    result = get_supabase().rpc(
+        "get_recent_songs", {"p_limit": limit, "p_unique_users": unique_users}
+    ).execute()
+    return jsonify(result.data or [])
+
 @bp.route("/api/songs/<string:identifier>", methods=["GET"])
 def get_song(identifier: str) -> FlaskResponse:
     """
@@ -127,11 +264,29 @@ def _stream_songs_array(chunks: Iterator[bytes]) -> Iterator[bytes]:
             continue
         yield chunk
 
+def _cached_songs(since: Optional[str], envelope: bool) -> Optional[Response]:
+    """
+    the song list or delta from the in-memory catalog, ``None`` when it can't answer
+    """
+    if since is not None:
+        delta = song_catalog.delta(parse_timestamp(since))
+        return jsonify(delta) if delta is not None else None
+
+    snapshot = song_catalog.snapshot()
+    if envelope:
+        return snapshot_response(request, "envelope", snapshot.envelope_etag, snapshot.envelope)
+    return snapshot_response(request, "array", snapshot.array_etag, snapshot.array)
+
 @bp.route("/api/songs", methods=["GET"])
 def get_songs() -> FlaskResponse:
     """
     retrieves the full song list or delta via the ``get_song_list`` RPC
 
+    served from the in-memory song catalog when ``SONG_CATALOG_CACHE`` is on;
+    the full list is then sent pre-compressed (zstd, br or gzip) with an ETag
+    per encoding and honours If-None-Match. A ``since`` older than the
+    catalog's first load still goes to the RPC.
+
     query params:
         since (str, optional): ISO-8601 timestamp; returns only songs updated
             at/after it plus tombstones deleted since then
@@ -146,26 +301,19 @@ def get_songs() -> FlaskResponse:
     since = request.args.get("since")
     if since is not None:
         try:
-            datetime.fromisoformat(since)
+            parse_timestamp(since)
         except ValueError:
             return jsonify({"error": "Invalid 'since' timestamp; expected ISO-8601"}), 400
 
     envelope = since is not None or request.args.get("v") == "2"
 
-    body: Dict[str, Any] = {}
-    if since is not None:
-        body["since"] = since
-
-    url = f"{current_app.config['SUPABASE_URL']}/rest/v1/rpc/get_song_list"
-    key = current_app.config["SUPABASE_SERVICE_KEY"]
-    headers = {
-        "apikey": key,
-        "Authorization": f"Bearer {key}",
-        "Content-Type": "application/json",
-    }
+    if current_app.config.get("SONG_CATALOG_CACHE") and song_catalog.ensure_fresh():
+        cached = _cached_songs(since, envelope)
+        if cached is not None:
+            return cached
 
     try:
-        resp = session.post(url, json=body, headers=headers, stream=True, timeout=(5, 120))
+        resp = request_song_list(since, stream=True)
     except (requests.Timeout, requests.ConnectionError) as e:
         logger.error(f"get_song_list RPC error: {e}")
         return jsonify({"error": "Failed to fetch songs"}), 502
@@ -186,68 +334,27 @@ def get_related_songs() -> FlaskResponse:
         album (str, optional): album name
         artist (str, optional): artist name
         genre (str, optional): genre name
-        charter (str, optional): charter name
+        charter (str, optional): comma-separated charter names
     
     returns:
-        JSON: list of related songs 
+        JSON: up to RELATED_SONGS_LIMIT related songs per relation
     """
-    supabase = get_supabase()
-    logger = current_app.logger
-
-    album = request.args.get("album")
-    album_songs = []
-    if album:
-        album_query = supabase.table("songs_new").select(SLIM_SONG_COLUMNS).eq("album", album)
-        album_response = album_query.execute()
-        album_songs = album_response.data
-
-    artist = request.args.get("artist")
-    artist_songs = []
-    if artist:
-        artist_query = supabase.table("songs_new").select(SLIM_SONG_COLUMNS).eq("artist", artist)
-        artist_response = artist_query.execute()
-        artist_songs = artist_response.data
-    
-    genre = request.args.get("genre")
-    genre_songs = []
-    if genre:
-        genre_query = supabase.table("songs_new").select(SLIM_SONG_COLUMNS).eq("genre", genre)
-        genre_response = genre_query.execute()
-        genre_songs = genre_response.data
-
-    charter = request.args.get("charter")
-    charter_songs = []
-    if charter:
-        charters = charter.split(",")
-        charter_query = supabase.table("charters").select("name").in_("name", charters)
-        charter_response = charter_query.execute()
-        matching_charters = [charter["name"] for charter in rows(charter_response.data)]
-
-        if matching_charters:
-            charters_query = supabase.table("songs_new").select(SLIM_SONG_COLUMNS).overlaps("charter_refs", matching_charters)
-            charters_response = charters_query.execute()
-            charter_songs = charters_response.data
-
-    return jsonify({
-        "album_songs": album_songs,
-        "artist_songs": artist_songs,
-        "genre_songs": genre_songs,
-        "charter_songs": charter_songs
-    })
+    criteria = {relation: request.args[relation] for relation in RELATIONS if request.args.get(relation)}
+    return jsonify(fetch_related_songs(get_supabase(), criteria))
 
 @bp.route("/api/songs-by-ids", methods=["POST"])
 def get_songs_by_ids() -> FlaskResponse:
     """
-    retrieves songs from the database by their IDs
+    retrieves songs from the database by their IDs or MD5s
 
     params:
-        ids (str[] | int[]): list of song IDs
+        ids ((str | int)[]): song IDs and/or MD5s, in any mix
+        include_missing (bool, optional): also list the identifiers not found
 
     returns:
-        JSON: list of songs
+        JSON: the songs found, in request order without duplicates; with
+        include_missing, ``{"songs": [...], "missing": [...]}``
     """
-    supabase = get_supabase()
-    
     data = request.json
     if not data:
         return jsonify({"error": "No data provided"}), 400
@@ -255,18 +362,22 @@ def get_songs_by_ids() -> FlaskResponse:
     ids = data.get("ids", [])
     if not ids:
         return jsonify({"error": "No IDs provided"}), 400
-
-    songs = []
-    for i in range(0, len(ids), 500):
-        batch = ids[i:i+500]
-        if isinstance(batch[0], int):
-            query = supabase.table("songs_new").select(SLIM_SONG_COLUMNS).in_("id", batch)
-        else:
-            query = supabase.table("songs_new").select(SLIM_SONG_COLUMNS).in_("md5", batch)
-        result = query.execute()
-        songs.extend(result.data)
-
-    return jsonify(songs)
+    if not isinstance(ids, list):
+        return jsonify({"error": "ids must be a list"}), 400
+    requested: Dict[SongKey, Any] = {}
+    try:
+        for identifier in ids:
+            requested.setdefault(song_key(identifier), identifier)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    keys = list(requested)
+
+    found = lookup_songs(get_supabase(), keys, SLIM_SONG_COLUMNS)
+    # the same song asked for by id and by md5 is returned once
+    songs = list({found[key]["id"]: found[key] for key in keys if key in found}.values())
+    if not data.get("include_missing"):
+        return jsonify(songs)
+    return jsonify({"songs": songs, "missing": [requested[key] for key in keys if key not in found]})
 
 @bp.route("/api/songs/<string:md5>/extra", methods=["GET"])
 def get_song_extra(md5: str) -> FlaskResponse:
@@ -277,18 +388,12 @@ def get_song_extra(md5: str) -> FlaskResponse:
         md5 (str): MD5 of the song to retrieve
 
     returns:
-        JSON: detailed song data
+        JSON: detailed song data, or 304 when If-None-Match has its ETag
     """
-    supabase = get_supabase()
-    
-    query = supabase.table("songs_extra").select("song_data").eq("md5", md5)
-    result = query.execute()
-
-    if not result.data:
+    payload = get_song_extra_payload(get_supabase(), md5)
+    if payload is None:
         return jsonify({"error": "Song not found"}), 404
-
-    song_data = rows(result.data)[0]["song_data"]
-    return jsonify(song_data)
+    return send_payload(request, payload)
 
 @bp.route("/api/songs/<int:song_id>/admin", methods=["POST"])
 @token_required
@@ -328,6 +433,8 @@ def admin_song_action(user_id: str, song_id: int) -> FlaskResponse:
             "last_update": datetime.now(UTC).isoformat(),
         }).eq("id", song_id).execute()
         if update_response.data:
+            song_catalog.expire()
+            song_rows.forget(song_id)
             return jsonify({"message": "Song verified successfully"}), 200
         else:
             return jsonify({"error": "Failed to verify song"}), 500
@@ -340,6 +447,12 @@ def admin_song_action(user_id: str, song_id: int) -> FlaskResponse:
         supabase.table("deleted_songs").upsert({"song_id": song["id"], "md5": song["md5"]}).execute()
         delete_response = supabase.table("songs_new").delete().eq("id", song_id).execute()
         if delete_response.data:
+            song_catalog.expire()
+            song_rows.forget(song_id)
+            invalidate_song_extras([song["md5"]])
+            # the delete cascades to leaderboard_entries; the mirror would still serve the board
+            if current_app.config.get("LEADERBOARD_MIRROR"):
+                forget_leaderboard(redis, song["md5"])
             return jsonify({"message": "Song removed successfully"}), 200
         else:
             try:
@@ -1,8 +1,9 @@
 from typing import List, Optional
 from flask import Blueprint, jsonify, request
 from ..services.supabase_service import get_supabase, rows, rows_as
-from ..utils.achievement_processor import achievement_processor
+from ..utils.achievement_catalog import achievement_catalog
 from ..utils.helpers import token_required
+from ..utils.payloads import send_payload
 from ..types import ComparisonResult, FlaskResponse, ScoreEntry, UserRow
 
 bp = Blueprint("users", __name__)
@@ -198,7 +199,11 @@ def get_user_achievements(user_id: str) -> FlaskResponse:
     
     Args:
         user_id (str): The ID of the user to retrieve achievements for
-        
+
+    Params:
+        view (str, optional): "achieved" for only the user's achievement timestamps
+            and the ETag of the /api/achievements catalog they apply to
+
     Returns:
         JSON: List of user achievements with achieved status
     """
@@ -210,15 +215,10 @@ def get_user_achievements(user_id: str) -> FlaskResponse:
 
     user_achievements = rows(response.data)[0].get("achievements", {}) or {}
 
-    all_achievements = achievement_processor.serializable_achievements()
-
-    for achievement in all_achievements:
-        achievement_id = achievement["id"]
-        if achievement_id in user_achievements:
-            achievement["achieved"] = True
-            achievement["timestamp"] = user_achievements[achievement_id]
-        else:
-            achievement["achieved"] = False
-            achievement["timestamp"] = None
+    if request.args.get("view") == "achieved":
+        return jsonify({
+            "catalog_etag": achievement_catalog.payload.etag,
+            "achieved": achievement_catalog.achieved(user_achievements),
+        })
 
-    return jsonify({"achievements": all_achievements})
\ No newline at end of file
+    return send_payload(request, achievement_catalog.user_payload(user_achievements))
\ No newline at end of file
@@ -3,7 +3,23 @@ import importlib
 import click
 from flask import Flask
 
+from .api.scores import process_and_save_scores, report_ingest_failure
+from .extensions import redis
+from .services.achievement_backfill import (
+    BACKFILL_PAGE_SIZE,
+    BACKFILL_WRITE_BATCH_SIZE,
+    backfill_achievements,
+)
+from .services.ingest_queue import (
+    JOB_STATES,
+    list_ingest_jobs,
+    queue_counts,
+    retry_dead_job,
+    run_worker,
+)
+from .services.leaderboard_mirror import mirror_leaderboard_updates, rebuild_leaderboard_mirror
 from .services.score_migration import promote_unknown_scores
+from .services.song_fetcher import SONG_FETCH_CONCURRENCY
 from .services.supabase_service import get_supabase
 
 
@@ -31,4 +47,104 @@ def register_cli(app: Flask) -> None:
     def promote_unknown_scores_command(dry_run: bool) -> None:
         """Promote unknown scores whose songs now exist in songs_new."""
         with app.app_context():
-            promote_unknown_scores(get_supabase(), dry_run=dry_run, log=click.echo)
+            promote_unknown_scores(
+                get_supabase(),
+                dry_run=dry_run,
+                concurrency=app.config.get("SONG_FETCH_CONCURRENCY", SONG_FETCH_CONCURRENCY),
+                log=click.echo,
+                on_leaderboards_written=(lambda chunk: mirror_leaderboard_updates(redis, chunk))
+                if app.config.get("LEADERBOARD_MIRROR") else None,
+            )
+
+    @app.cli.command("backfill-achievements")
+    @click.option(
+        "--dry-run/--no-dry-run",
+        default=True,
+        help="Report would-be changes without writing (default: on).",
+    )
+    @click.option("--workers", type=int, default=None, help="Evaluation processes (default: CPU_POOL_SIZE, 0 runs inline).")
+    @click.option("--page-size", default=BACKFILL_PAGE_SIZE, show_default=True, help="Users read per page.")
+    @click.option("--batch-size", default=BACKFILL_WRITE_BATCH_SIZE, show_default=True, help="Users written per update.")
+    @click.option(
+        "--checkpoint",
+        default="achievement_backfill.checkpoint.json",
+        show_default=True,
+        help="File recording the last user id written.",
+    )
+    @click.option("--resume", is_flag=True, help="Continue after the user id in the checkpoint.")
+    def backfill_achievements_command(
+        dry_run: bool, workers: int | None, page_size: int, batch_size: int, checkpoint: str, resume: bool
+    ) -> None:
+        """Re-evaluate every user's achievements against the current definitions."""
+        with app.app_context():
+            backfill_achievements(
+                get_supabase(),
+                dry_run=dry_run,
+                workers=app.config.get("CPU_POOL_SIZE", 0) if workers is None else workers,
+                page_size=page_size,
+                batch_size=batch_size,
+                checkpoint_path=checkpoint,
+                resume=resume,
+                log=click.echo,
+            )
+
+    @app.cli.command("rebuild-leaderboard-mirror")
+    @click.option("--md5", "md5s", multiple=True, help="Only rebuild these songs (repeatable).")
+    def rebuild_leaderboard_mirror_command(md5s: tuple[str, ...]) -> None:
+        """Rewrite the Redis leaderboard mirror from Postgres."""
+        with app.app_context():
+            mirrored = rebuild_leaderboard_mirror(
+                redis,
+                get_supabase(),
+                list(md5s) or None,
+                concurrency=app.config.get("SONG_FETCH_CONCURRENCY", SONG_FETCH_CONCURRENCY),
+                log=click.echo,
+            )
+        click.echo(f"Mirrored {mirrored} leaderboard(s)")
+
+    @app.cli.command("ingest-worker")
+    @click.option("--poll-timeout", default=5, show_default=True, help="Seconds to block waiting for a job.")
+    @click.option("--max-jobs", type=int, default=None, help="Exit after this many jobs (default: run forever).")
+    def ingest_worker_command(poll_timeout: int, max_jobs: int | None) -> None:
+        """Consume queued scoredata uploads."""
+        with app.app_context():
+            handled = run_worker(
+                redis,
+                process_and_save_scores,
+                report_ingest_failure,
+                poll_timeout=poll_timeout,
+                max_jobs=max_jobs,
+                log=click.echo,
+            )
+        click.echo(f"Ingest worker stopped after {handled} job(s)")
+
+    @app.cli.command("ingest-jobs")
+    @click.option(
+        "--state",
+        type=click.Choice(sorted(JOB_STATES)),
+        default=None,
+        help="List the jobs in one state instead of the per-state counts.",
+    )
+    @click.option("--limit", default=50, show_default=True)
+    def ingest_jobs_command(state: str | None, limit: int) -> None:
+        """Inspect the ingest job queue."""
+        with app.app_context():
+            if state is None:
+                for name, count in queue_counts(redis).items():
+                    click.echo(f"{name}: {count}")
+                return
+            for job in list_ingest_jobs(redis, state, limit):
+                click.echo(
+                    f"{job['id']} user={job.get('user_id')} status={job.get('status')} "
+                    f"attempts={job['attempts']} created={job.get('created_at')} "
+                    f"error={job.get('error') or '-'}"
+                )
+
+    @app.cli.command("ingest-retry")
+    @click.argument("job_id")
+    def ingest_retry_command(job_id: str) -> None:
+        """Requeue a dead ingest job."""
+        with app.app_context():
+            if not retry_dead_job(redis, job_id):
+                raise click.ClickException(f"Job {job_id} is not on the dead list or its payload expired")
+        click.echo(f"Job {job_id} requeued")
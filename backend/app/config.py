@@ -32,6 +32,32 @@ class Config:
     REDIS_URL = os.getenv("REDIS_URL")
     SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
     SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
+    # hand uploads to `flask ingest-worker` processes instead of the web worker (opt-in: needs a worker running)
+    INGEST_QUEUE_ENABLED = bool(_REDIS_URL) and os.getenv("INGEST_QUEUE_ENABLED", "false").lower() == "true"
+    # processes for CPU-bound parsing/achievement work; 0 runs it inline
+    CPU_POOL_SIZE = int(os.getenv("CPU_POOL_SIZE", "2"))
+    CPU_POOL_MAX_PENDING = int(os.getenv("CPU_POOL_MAX_PENDING", "4"))
+    # songs_new md5 lookups run in parallel batches of 500
+    SONG_FETCH_CONCURRENCY = int(os.getenv("SONG_FETCH_CONCURRENCY", "4"))
+    # merge ingest scores into leaderboards in Postgres with merge_leaderboard_scores (opt-in).
+    # Migration 008 is needed with or without it: leaderboards are read from its leaderboard_ranked
+    # view, and it replaces 007's version of the function
+    LEADERBOARD_MERGE_RPC = os.getenv("LEADERBOARD_MERGE_RPC", "false").lower() == "true"
+    # keep the Redis leaderboard mirror in sync and serve rank/slice reads from it
+    # (opt-in: fill it with `flask rebuild-leaderboard-mirror` first)
+    LEADERBOARD_MIRROR = os.getenv("LEADERBOARD_MIRROR", "false").lower() == "true"
+    # serve /api/songs from the in-memory song catalog instead of streaming the RPC per request,
+    # and cache related song sets until the catalog sees one of their songs change
+    SONG_CATALOG_CACHE = os.getenv("SONG_CATALOG_CACHE", "true").lower() != "false"
+    # seconds between get_song_list delta syncs of the in-memory song catalog
+    SONG_CATALOG_REFRESH_SECONDS = float(os.getenv("SONG_CATALOG_REFRESH_SECONDS", "60"))
+    # seconds /api/songs-by-ids serves a song row from memory; 0 disables the cache
+    SONG_ROW_CACHE_SECONDS = float(os.getenv("SONG_ROW_CACHE_SECONDS", "30"))
+    # bytes of encoded /api/songs/<md5>/extra payloads each worker keeps in memory
+    SONG_EXTRA_CACHE_BYTES = int(os.getenv("SONG_EXTRA_CACHE_BYTES", str(64 * 1024 * 1024)))
+    # progress updates are sent at most every N seconds unless they move by N percent
+    PROGRESS_MIN_INTERVAL = float(os.getenv("PROGRESS_MIN_INTERVAL", "0.5"))
+    PROGRESS_MIN_DELTA = float(os.getenv("PROGRESS_MIN_DELTA", "1.0"))
 
     REQUIRED_VARS = (
         "SECRET_KEY",
@@ -127,6 +127,7 @@ import os
 
 load_dotenv()
 
+from app.services.song_extras import invalidate_song_extras
 from app.services.supabase_service import get_supabase, rows
 
 def load_json_data(file_path):
@@ -272,6 +273,7 @@ def populate_songs_new_table():
     
     # Update songs with different names in batches - one at a time to avoid errors
     print(f"Processing {len(prepared_update_songs)} songs for update")
+    rewritten_md5s = []
     for song in prepared_update_songs:
         try:
             # First, check if the song exists in songs_new
@@ -330,7 +332,13 @@ def populate_songs_new_table():
                     extra_error = getattr(extra_result, "error", None)
                     if extra_error:
                         print(f"Error updating song {song['md5']} in songs_extra: {extra_error}")
+                    else:
+                        rewritten_md5s.append(song["md5"])
         except Exception as e:
             print(f"Error processing update for {song['md5']}: {str(e)}")
+
+    # Drop cached /extra payloads of the rewritten songs so workers reload them
+    invalidate_song_extras(rewritten_md5s)
+    print(f"Invalidated cached extra data for {len(rewritten_md5s)} songs")
     
     print("Song population completed.")
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""Re-evaluate every user's achievements against the current definitions.
+
+New achievement definitions (usually songs added to ``achievement_songs.json``)
+only reach a user on their next upload. :func:`backfill_achievements` walks the
+users table in id order, evaluates each page in a process pool and writes back,
+in batches through ``bulk_update_achievements``, only the users whose
+achievements changed. The write merges achievements into the stored ones and
+sends the page's ``achievement_scores_digest`` with the counters, so an
+upload that lands mid-run keeps what it granted and its own counters. After
+each page the last user id is saved to a
+checkpoint file so an interrupted run can resume where it stopped.
+"""
+
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from ..types import AchievementCounters, AchievementError
+from ..utils.achievement_processor import achievement_processor
+from .supabase_service import Row, rows
+
+BACKFILL_PAGE_SIZE = 500
+BACKFILL_WRITE_BATCH_SIZE = 100
+
+
+def evaluate_user_achievements(user: Row) -> Tuple[Dict[str, str], List[AchievementError], AchievementCounters]:
+    """Fully evaluate one ``users`` row, as a score upload would."""
+    return achievement_processor.process_achievements_incremental(
+        {
+            "id": user["id"],
+            "scores": [s for s in user.get("scores") or [] if s.get("speed", 0) >= 100],
+            "stats": user.get("stats") or {},
+            "achievements": user.get("achievements") or {},
+        },
+        [],
+        None,
+    )
+
+
+def _user_pages(supabase: Any, after: Optional[str], page_size: int) -> Iterator[List[Row]]:
+    while True:
+        query = supabase.table("users").select("id,scores,stats,achievements,achievement_scores_digest").order("id")
+        if after is not None:
+            query = query.gt("id", after)
+        page = rows(query.limit(page_size).execute().data)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        after = str(page[-1]["id"])
+
+
+def _load_checkpoint(path: str) -> Dict[str, Any]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+
+def backfill_achievements(
+    supabase: Any,
+    *,
+    dry_run: bool = True,
+    workers: int = 0,
+    page_size: int = BACKFILL_PAGE_SIZE,
+    batch_size: int = BACKFILL_WRITE_BATCH_SIZE,
+    checkpoint_path: Optional[str] = None,
+    resume: bool = False,
+    log: Callable[[str], None] = lambda _msg: None,
+) -> Dict[str, Any]:
+    """Grant every user the achievements they qualify for.
+
+    ``workers`` processes evaluate the users (``0`` runs inline). With
+    ``resume``, users up to the id saved in ``checkpoint_path`` are skipped.
+    A dry run evaluates and reports but writes neither users nor the checkpoint.
+    """
+    prefix = "[dry-run] " if dry_run else ""
+    checkpoint = _load_checkpoint(checkpoint_path) if resume and checkpoint_path else {}
+    after = checkpoint.get("last_id")
+    totals = {key: checkpoint.get(key, 0) for key in ("scanned", "changed", "granted", "errors")}
+    if after is not None:
+        log(f"{prefix}Resuming after user {after} ({totals['scanned']} user(s) already scanned)")
+
+    started = time.monotonic()
+    scanned_now = 0
+    pool = (
+        ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        if workers > 0 else nullcontext()
+    )
+    with pool as executor:
+        for page in _user_pages(supabase, after, page_size):
+            results = (
+                executor.map(evaluate_user_achievements, page, chunksize=max(1, len(page) // (workers * 4)))
+                if executor is not None else map(evaluate_user_achievements, page)
+            )
+            pending: List[Dict[str, Any]] = []
+            for user, (achievements, errors, counters) in zip(page, results):
+                totals["errors"] += len(errors)
+                previous = user.get("achievements") or {}
+                if achievements == previous:
+                    continue
+                totals["changed"] += 1
+                totals["granted"] += len(achievements.keys() - previous.keys())
+                pending.append({
+                    "id": str(user["id"]),
+                    "achievements": achievements,
+                    "achievement_counters": counters,
+                    "scores_digest": user.get("achievement_scores_digest"),
+                })
+
+            if not dry_run:
+                for start in range(0, len(pending), batch_size):
+                    supabase.rpc(
+                        "bulk_update_achievements", {"updates": pending[start:start + batch_size]}
+                    ).execute()
+
+            after = str(page[-1]["id"])
+            totals["scanned"] += len(page)
+            scanned_now += len(page)
+            if checkpoint_path and not dry_run:
+                _save_checkpoint(checkpoint_path, {"last_id": after, **totals})
+
+            elapsed = time.monotonic() - started
+            log(
+                f"{prefix}{totals['scanned']} user(s) scanned, {totals['changed']} changed, "
+                f"{totals['granted']} achievement(s) granted; {scanned_now / elapsed if elapsed else 0:.0f} users/s"
+            )
+
+    log(
+        f"{prefix if dry_run else 'Done: '}{totals['changed']} of {totals['scanned']} user(s) "
+        f"{'would change' if dry_run else 'updated'}, {totals['errors']} evaluation error(s), "
+        f"{time.monotonic() - started:.1f}s"
+    )
+    return {**totals, "last_id": after}
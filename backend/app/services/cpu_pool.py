@@ -0,0 +1,76 @@
+"""Process pool for CPU-bound work that would otherwise stall the gevent loop.
+
+Pure-Python work (scoredata parsing, achievement evaluation) holds the GIL, so
+under gevent it blocks every other request and websocket in the worker.
+:func:`run_cpu_bound` ships it to a small pool of spawned processes instead and
+parks only the calling greenlet while it waits.
+
+``CPU_POOL_SIZE`` sets the number of processes (``0`` runs inline, which is
+what tests and bare ``Flask`` apps get). ``CPU_POOL_MAX_PENDING`` caps how many
+calls may be submitted at once; further callers wait for a slot.
+"""
+
+import atexit
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, TypeVar
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+_executor: Optional[ProcessPoolExecutor] = None
+_slots: Optional[threading.BoundedSemaphore] = None
+_lock = threading.Lock()
+
+
+def _get_pool(size: int, max_pending: int) -> tuple[ProcessPoolExecutor, threading.BoundedSemaphore]:
+    global _executor, _slots
+    with _lock:
+        if _executor is None or _slots is None:
+            # spawn, not fork: forking a gevent-patched process copies its hub
+            _executor = ProcessPoolExecutor(
+                max_workers=size, mp_context=multiprocessing.get_context("spawn")
+            )
+            _slots = threading.BoundedSemaphore(max(max_pending, 1))
+            logger.info(f"Started CPU pool with {size} process(es), {max_pending} pending slot(s)")
+        return _executor, _slots
+
+
+def shutdown_cpu_pool() -> None:
+    """Stop the pool's processes; the next call starts a fresh pool."""
+    global _executor, _slots
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        _slots = None
+
+
+atexit.register(shutdown_cpu_pool)
+
+
+def run_cpu_bound(fn: Callable[..., _T], *args: Any) -> _T:
+    """Run ``fn(*args)`` in the CPU pool and return its result.
+
+    ``fn`` and its arguments must be picklable: a module-level function, called
+    with plain data. Exceptions raised by ``fn`` are re-raised in the caller.
+    """
+    size = int(current_app.config.get("CPU_POOL_SIZE", 0) or 0)
+    if size <= 0:
+        return fn(*args)
+
+    max_pending = int(current_app.config.get("CPU_POOL_MAX_PENDING", 0) or size * 2)
+    executor, slots = _get_pool(size, max_pending)
+    with slots:
+        try:
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool:
+            logger.error("CPU pool process died, restarting the pool")
+            shutdown_cpu_pool()
+            raise
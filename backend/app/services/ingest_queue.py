@@ -0,0 +1,262 @@
+"""Durable Redis queue of scoredata ingest jobs.
+
+Uploads enqueue a job here and return immediately; ``flask ingest-worker``
+processes consume it in their own processes, so ingest no longer competes
+with request serving and survives a web restart.
+
+Layout (all keys share the ``ingest:`` prefix):
+
+* ``ingest:queue``           LIST of pending job ids (LPUSH in, BLMOVE out)
+* ``ingest:processing``      LIST of job ids claimed by a worker
+* ``ingest:dead``            LIST of job ids that exhausted their retries
+* ``ingest:job:{id}``        HASH of job metadata (user_id, status, attempts, ...)
+* ``ingest:payload:{id}``    STRING holding the parsed scoredata as JSON
+"""
+
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, UTC
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "ingest:queue"
+PROCESSING_KEY = "ingest:processing"
+DEAD_KEY = "ingest:dead"
+JOB_KEY = "ingest:job:{job_id}"
+PAYLOAD_KEY = "ingest:payload:{job_id}"
+
+MAX_ATTEMPTS = 3
+JOB_TTL_SECONDS = 7 * 24 * 60 * 60
+STALE_AFTER_SECONDS = 30 * 60
+HEARTBEAT_INTERVAL_SECONDS = 60
+
+JOB_STATES = {"queue": QUEUE_KEY, "processing": PROCESSING_KEY, "dead": DEAD_KEY}
+
+
+def _decode(value: Any) -> Any:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def _now() -> str:
+    return datetime.now(UTC).isoformat()
+
+
+def enqueue_ingest_job(
+    redis_client: Any, user_id: str, result: Dict[str, Any], upload_digest: str = ""
+) -> str:
+    """Persist ``result`` and queue it for ingest; returns the new job id."""
+    job_id = uuid.uuid4().hex
+    job_key = JOB_KEY.format(job_id=job_id)
+    payload_key = PAYLOAD_KEY.format(job_id=job_id)
+
+    pipe = redis_client.pipeline()
+    pipe.set(payload_key, json.dumps(result), ex=JOB_TTL_SECONDS)
+    pipe.hset(job_key, mapping={
+        "id": job_id,
+        "user_id": user_id,
+        "upload_digest": upload_digest,
+        "status": "queued",
+        "attempts": 0,
+        "total_songs": len(result.get("songs", [])),
+        "created_at": _now(),
+        "claimed_at": "",
+        "claimed_ts": 0,
+        "finished_at": "",
+        "error": "",
+    })
+    pipe.expire(job_key, JOB_TTL_SECONDS)
+    pipe.lpush(QUEUE_KEY, job_id)
+    pipe.execute()
+    return job_id
+
+
+def get_ingest_job(redis_client: Any, job_id: str) -> Optional[Dict[str, Any]]:
+    """Return the decoded metadata hash of ``job_id``, or ``None`` if unknown."""
+    raw = redis_client.hgetall(JOB_KEY.format(job_id=job_id))
+    if not raw:
+        return None
+    job = {_decode(k): _decode(v) for k, v in raw.items()}
+    job["attempts"] = int(job.get("attempts", 0))
+    return job
+
+
+def list_ingest_jobs(redis_client: Any, state: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """Return up to ``limit`` jobs currently in ``state`` (queue/processing/dead)."""
+    job_ids = redis_client.lrange(JOB_STATES[state], 0, limit - 1)
+    jobs = []
+    for job_id in job_ids:
+        job = get_ingest_job(redis_client, _decode(job_id))
+        if job:
+            jobs.append(job)
+    return jobs
+
+
+def queue_counts(redis_client: Any) -> Dict[str, int]:
+    """Length of each job list."""
+    return {state: int(redis_client.llen(key)) for state, key in JOB_STATES.items()}
+
+
+def claim_next_job(redis_client: Any, timeout: int = 5) -> Optional[str]:
+    """Atomically move the oldest queued job onto the processing list."""
+    job_id = redis_client.blmove(QUEUE_KEY, PROCESSING_KEY, timeout, "RIGHT", "LEFT")
+    if job_id is None:
+        return None
+    job_id = _decode(job_id)
+    pipe = redis_client.pipeline()
+    pipe.hset(JOB_KEY.format(job_id=job_id), mapping={
+        "status": "processing",
+        "claimed_at": _now(),
+        "claimed_ts": time.time(),
+    })
+    pipe.hincrby(JOB_KEY.format(job_id=job_id), "attempts", 1)
+    pipe.execute()
+    return job_id
+
+
+def heartbeat_job(redis_client: Any, job_id: str) -> None:
+    """Mark ``job_id`` as still being worked on, so it is not requeued as stale."""
+    redis_client.hset(JOB_KEY.format(job_id=job_id), "claimed_ts", time.time())
+
+
+def load_job_payload(redis_client: Any, job_id: str) -> Optional[Dict[str, Any]]:
+    raw = redis_client.get(PAYLOAD_KEY.format(job_id=job_id))
+    return json.loads(raw) if raw else None
+
+
+def complete_job(redis_client: Any, job_id: str) -> None:
+    """Mark ``job_id`` done and drop its payload."""
+    pipe = redis_client.pipeline()
+    pipe.lrem(PROCESSING_KEY, 0, job_id)
+    pipe.hset(JOB_KEY.format(job_id=job_id), mapping={"status": "completed", "finished_at": _now()})
+    pipe.delete(PAYLOAD_KEY.format(job_id=job_id))
+    pipe.execute()
+
+
+def fail_job(redis_client: Any, job_id: str, error: str, max_attempts: int = MAX_ATTEMPTS) -> bool:
+    """Requeue ``job_id`` for another attempt, or park it on the dead list.
+
+    Returns ``True`` if the job will be retried.
+    """
+    job = get_ingest_job(redis_client, job_id) or {}
+    retry = job.get("attempts", 0) < max_attempts
+
+    pipe = redis_client.pipeline()
+    pipe.lrem(PROCESSING_KEY, 0, job_id)
+    pipe.hset(JOB_KEY.format(job_id=job_id), mapping={
+        "status": "queued" if retry else "dead",
+        "error": error,
+        "finished_at": "" if retry else _now(),
+    })
+    pipe.lpush(QUEUE_KEY if retry else DEAD_KEY, job_id)
+    pipe.execute()
+    return retry
+
+
+def retry_dead_job(redis_client: Any, job_id: str) -> bool:
+    """Move a dead job back onto the queue with a fresh attempt budget."""
+    if not redis_client.lrem(DEAD_KEY, 0, job_id):
+        return False
+    if redis_client.get(PAYLOAD_KEY.format(job_id=job_id)) is None:
+        redis_client.hset(JOB_KEY.format(job_id=job_id), "error", "payload expired")
+        redis_client.lpush(DEAD_KEY, job_id)
+        return False
+    pipe = redis_client.pipeline()
+    pipe.hset(JOB_KEY.format(job_id=job_id), mapping={"status": "queued", "attempts": 0, "error": ""})
+    pipe.lpush(QUEUE_KEY, job_id)
+    pipe.execute()
+    return True
+
+
+def requeue_stale_jobs(redis_client: Any, stale_after: float = STALE_AFTER_SECONDS) -> List[str]:
+    """Return jobs claimed by a worker that died mid-ingest to the queue."""
+    requeued = []
+    cutoff = time.time() - stale_after
+    for raw_id in redis_client.lrange(PROCESSING_KEY, 0, -1):
+        job_id = _decode(raw_id)
+        job = get_ingest_job(redis_client, job_id)
+        if job and float(job.get("claimed_ts") or 0) > cutoff:
+            continue
+        if redis_client.lrem(PROCESSING_KEY, 0, job_id):
+            if job is None:
+                continue
+            redis_client.hset(JOB_KEY.format(job_id=job_id), "status", "queued")
+            redis_client.rpush(QUEUE_KEY, job_id)
+            requeued.append(job_id)
+    return requeued
+
+
+def _heartbeat(redis_client: Any, job_id: str) -> Callable[[], None]:
+    last_beat = time.monotonic()
+
+    def heartbeat() -> None:
+        nonlocal last_beat
+        if time.monotonic() - last_beat >= HEARTBEAT_INTERVAL_SECONDS:
+            heartbeat_job(redis_client, job_id)
+            last_beat = time.monotonic()
+
+    return heartbeat
+
+
+def run_worker(
+    redis_client: Any,
+    handler: Callable[[Dict[str, Any], str, Optional[str], Callable[[], None]], bool],
+    on_dead: Callable[[str, str], None],
+    *,
+    poll_timeout: int = 5,
+    stale_after: float = STALE_AFTER_SECONDS,
+    max_jobs: Optional[int] = None,
+    log: Callable[[str], None] = logger.info,
+) -> int:
+    """Consume ingest jobs until ``max_jobs`` have run (forever if ``None``).
+
+    ``handler(result, user_id, upload_digest, heartbeat)`` runs each job and returns whether
+    it succeeded; ``False`` or an exception counts as a failed attempt. The handler calls
+    ``heartbeat()`` as it makes progress, which keeps a long job from being requeued as stale
+    (at most one write every ``HEARTBEAT_INTERVAL_SECONDS``). ``on_dead(user_id, error)`` is
+    called once a job exhausts its retries. Returns the number of jobs handled.
+    """
+    handled = 0
+    for job_id in requeue_stale_jobs(redis_client, stale_after):
+        log(f"Requeued stale ingest job {job_id}")
+
+    while max_jobs is None or handled < max_jobs:
+        job_id = claim_next_job(redis_client, poll_timeout)
+        if job_id is None:
+            if max_jobs is not None:
+                break
+            requeue_stale_jobs(redis_client, stale_after)
+            continue
+
+        handled += 1
+        job = get_ingest_job(redis_client, job_id)
+        payload = load_job_payload(redis_client, job_id)
+        if job is None or payload is None:
+            log(f"Ingest job {job_id} has no payload, dropping it")
+            redis_client.lrem(PROCESSING_KEY, 0, job_id)
+            continue
+
+        user_id = job["user_id"]
+        started = time.monotonic()
+        log(f"Ingest job {job_id} for user {user_id} started (attempt {job['attempts']})")
+        error = None
+        try:
+            if not handler(payload, user_id, job.get("upload_digest") or None, _heartbeat(redis_client, job_id)):
+                error = "score processing failed"
+        except Exception as e:
+            logger.error(f"Ingest job {job_id} failed: {str(e)}", exc_info=True)
+            error = str(e)
+        if error is not None:
+            if fail_job(redis_client, job_id, error):
+                log(f"Ingest job {job_id} requeued for retry")
+            else:
+                log(f"Ingest job {job_id} moved to the dead list")
+                on_dead(user_id, error)
+            continue
+
+        complete_job(redis_client, job_id)
+        log(f"Ingest job {job_id} completed in {time.monotonic() - started:.1f}s")
+
+    return handled
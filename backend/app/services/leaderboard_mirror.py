@@ -0,0 +1,264 @@
+"""Redis sorted-set mirror of song leaderboards.
+
+Each song with entries has a sorted set ``leaderboard:{md5}`` holding one
+member per user, and a hash ``leaderboard:{md5}:entries`` holding each user's
+entry. All members share the score 0, so Redis orders them by member bytes;
+the member is a fixed-width encoding of the ``leaderboard_entries`` sort key
+(``rank_bucket``, ``rank_primary``, ``rank_secondary``, ``rank_posted`` and
+``user_id``, all descending) followed by the user id, so ``ZRANK`` is the
+user's rank in Postgres and ``ZRANGE`` a slice in rank order, both O(log n).
+A double score cannot carry score, speed and posted time exactly, which is why
+the key lives in the member.
+
+A sorted set exists only once the song's whole leaderboard has been written
+to it, either by the leaderboard writer or by :func:`rebuild_leaderboard_mirror`.
+Readers return ``None`` for songs that are not mirrored so callers can fall
+back to Postgres. Mirror writes never raise: a failed write is logged and
+the mirror is repaired by the next full write or rebuild.
+"""
+
+import json
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, cast
+
+from ..types import LeaderboardEntry, LeaderboardScore, LeaderboardUpdate
+from ..utils.leaderboard import leaderboard_sort_key
+from .leaderboard_store import fetch_leaderboards
+from .song_fetcher import SONG_FETCH_CONCURRENCY
+from .supabase_service import Row, rows
+
+MIRROR_KEY = "leaderboard:{md5}"
+MIRROR_ENTRIES_KEY = "leaderboard:{md5}:entries"
+MIRROR_REBUILD_BATCH_SIZE = 200
+
+_FIELD_MAX = 10 ** 12 - 1
+_POSTED_MAX = 10 ** 17 - 1
+_ENTRY_FIELDS = ("username", "score", "percent", "is_fc", "speed", "play_count", "posted")
+
+logger = logging.getLogger(__name__)
+
+
+def _decode(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _field(value: float) -> int:
+    return min(max(int(value), 0), _FIELD_MAX)
+
+
+def _posted_field(posted: Optional[str]) -> int:
+    """Microseconds since the epoch; no posted date sorts last, as ``rank_posted`` is then -Infinity."""
+    if not posted:
+        return _POSTED_MAX
+    try:
+        micros = int(datetime.fromisoformat(posted).timestamp() * 1_000_000)
+    except ValueError:
+        return _POSTED_MAX
+    return min(max(micros, 0), _POSTED_MAX - 1)
+
+
+def _descending(text: str) -> str:
+    """``text`` encoded so that ascending member order is descending ``text`` order."""
+    # each code point inverted at a fixed width; "~" sorts after every digit,
+    # so a longer id comes before its own prefix
+    return "".join(f"{0x10FFFF - ord(char):06x}" for char in text) + "~"
+
+
+def mirror_member(entry: LeaderboardEntry) -> str:
+    """The sorted-set member for ``entry``; members sort best entry first."""
+    bucket, primary, secondary, _ = leaderboard_sort_key(entry)
+    user_id = str(entry["user_id"])
+    return (
+        f"{1 - int(bucket)}"
+        f"{_FIELD_MAX - _field(primary):012d}"
+        f"{_FIELD_MAX - _field(secondary):012d}"
+        f"{_posted_field(entry.get('posted')):017d}"
+        f"{_descending(user_id)}"
+        f":{user_id}"
+    )
+
+
+def _stored(entry: LeaderboardEntry, member: str) -> str:
+    return json.dumps({"member": member, **{field: entry.get(field) for field in _ENTRY_FIELDS}})
+
+
+def _write_leaderboard(pipe: Any, md5: str, entries: Sequence[LeaderboardEntry]) -> None:
+    key, entries_key = MIRROR_KEY.format(md5=md5), MIRROR_ENTRIES_KEY.format(md5=md5)
+    pipe.delete(key, entries_key)
+    if not entries:
+        return
+    members = {str(entry["user_id"]): mirror_member(entry) for entry in entries}
+    pipe.zadd(key, {member: 0 for member in members.values()})
+    pipe.hset(entries_key, mapping={
+        str(entry["user_id"]): _stored(entry, members[str(entry["user_id"])]) for entry in entries
+    })
+
+
+def mirror_leaderboards(redis_client: Any, leaderboards: Dict[str, Sequence[LeaderboardEntry]]) -> bool:
+    """Replace the mirrors of the given songs' leaderboards, keyed by md5."""
+    if not leaderboards:
+        return True
+    try:
+        pipe = redis_client.pipeline()
+        for md5, entries in leaderboards.items():
+            _write_leaderboard(pipe, md5, entries)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not mirror {len(leaderboards)} leaderboard(s): {e}")
+        return False
+    return True
+
+
+def mirror_leaderboard_updates(redis_client: Any, updates: Iterable[LeaderboardUpdate]) -> None:
+    """Mirror leaderboards written by ``push_leaderboard_updates``."""
+    mirror_leaderboards(redis_client, {update["md5"]: update["leaderboard"] for update in updates})
+
+
+def mirror_entry(redis_client: Any, md5: str, entry: LeaderboardEntry) -> bool:
+    """Put ``entry`` in place of its user's entry on a mirrored leaderboard.
+
+    Songs that are not mirrored are left alone, since one entry on its own
+    would pass for the whole leaderboard.
+    """
+    key, entries_key = MIRROR_KEY.format(md5=md5), MIRROR_ENTRIES_KEY.format(md5=md5)
+    user_id = str(entry["user_id"])
+    try:
+        if not redis_client.exists(key):
+            return False
+        previous = redis_client.hget(entries_key, user_id)
+        member = mirror_member(entry)
+        pipe = redis_client.pipeline()
+        if previous:
+            pipe.zrem(key, json.loads(previous)["member"])
+        pipe.zadd(key, {member: 0})
+        pipe.hset(entries_key, user_id, _stored(entry, member))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not mirror leaderboard entry for {user_id} on {md5}: {e}")
+        return False
+    return True
+
+
+def forget_leaderboard(redis_client: Any, md5: str) -> bool:
+    """Drop the mirror of a song's leaderboard, e.g. once the song is deleted."""
+    try:
+        redis_client.delete(MIRROR_KEY.format(md5=md5), MIRROR_ENTRIES_KEY.format(md5=md5))
+    except Exception as e:
+        logger.warning(f"Could not drop the leaderboard mirror of {md5}: {e}")
+        return False
+    return True
+
+
+def mirror_merged_scores(
+    redis_client: Any, user_id: str, username: str, scores: Sequence[LeaderboardScore], merged: Sequence[Row]
+) -> None:
+    """Mirror the scores ``merge_leaderboard_scores`` reports as having changed a leaderboard."""
+    by_md5 = {score["md5"]: score for score in scores}
+    for row in merged:
+        score = by_md5.get(row["md5"])
+        if score is None or not row.get("updated"):
+            continue
+        entry: LeaderboardEntry = {
+            "user_id": str(user_id),
+            "username": username,
+            "score": score["score"],
+            "percent": score["percent"],
+            "is_fc": score["is_fc"],
+            "speed": score["speed"],
+            "play_count": score["play_count"],
+            "posted": score["posted"],
+        }
+        mirror_entry(redis_client, row["md5"], entry)
+
+
+def _entries_at(redis_client: Any, md5: str, members: List[Any], first_rank: int) -> List[LeaderboardEntry]:
+    user_ids = [_decode(member).rsplit(":", 1)[1] for member in members]
+    if not user_ids:
+        return []
+    stored = redis_client.hmget(MIRROR_ENTRIES_KEY.format(md5=md5), user_ids)
+    entries: List[LeaderboardEntry] = []
+    for rank, (user_id, raw) in enumerate(zip(user_ids, stored), first_rank):
+        data = json.loads(raw) if raw else {}
+        data.pop("member", None)
+        entries.append(cast(LeaderboardEntry, {"user_id": user_id, **data, "rank": rank}))
+    return entries
+
+
+def mirrored_size(redis_client: Any, md5: str) -> Optional[int]:
+    """Number of entries on a mirrored leaderboard, ``None`` if it isn't mirrored."""
+    size = int(redis_client.zcard(MIRROR_KEY.format(md5=md5)))
+    return size or None
+
+
+def get_mirrored_rank(redis_client: Any, md5: str, user_id: str) -> Optional[int]:
+    """``user_id``'s rank on a mirrored leaderboard, ``None`` if it has no entry there."""
+    raw = redis_client.hget(MIRROR_ENTRIES_KEY.format(md5=md5), str(user_id))
+    if not raw:
+        return None
+    index = redis_client.zrank(MIRROR_KEY.format(md5=md5), json.loads(raw)["member"])
+    return None if index is None else int(index) + 1
+
+
+def get_mirrored_page(redis_client: Any, md5: str, offset: int, limit: int) -> Optional[List[LeaderboardEntry]]:
+    """``limit`` entries from rank ``offset + 1``, ``None`` if the song isn't mirrored."""
+    if mirrored_size(redis_client, md5) is None:
+        return None
+    if limit <= 0:
+        return []
+    members = redis_client.zrange(MIRROR_KEY.format(md5=md5), offset, offset + limit - 1)
+    return _entries_at(redis_client, md5, members, offset + 1)
+
+
+def get_mirrored_around(
+    redis_client: Any, md5: str, user_id: str, radius: int
+) -> Optional[List[LeaderboardEntry]]:
+    """``user_id``'s entry and up to ``radius`` either side, ``None`` if the song isn't mirrored."""
+    if mirrored_size(redis_client, md5) is None:
+        return None
+    rank = get_mirrored_rank(redis_client, md5, user_id)
+    if rank is None:
+        return []
+    start = max(rank - 1 - radius, 0)
+    members = redis_client.zrange(MIRROR_KEY.format(md5=md5), start, rank - 1 + radius)
+    return _entries_at(redis_client, md5, members, start + 1)
+
+
+def _scored_md5s(supabase: Any, page_size: int) -> List[str]:
+    md5s: List[str] = []
+    start = 0
+    while True:
+        page = rows(
+            supabase.table("songs_new").select("md5").gt("scores_count", 0)
+            .order("md5").range(start, start + page_size - 1).execute().data
+        )
+        md5s.extend(row["md5"] for row in page)
+        if len(page) < page_size:
+            return md5s
+        start += page_size
+
+
+def rebuild_leaderboard_mirror(
+    redis_client: Any,
+    supabase: Any,
+    md5s: Optional[Sequence[str]] = None,
+    *,
+    batch_size: int = MIRROR_REBUILD_BATCH_SIZE,
+    concurrency: int = SONG_FETCH_CONCURRENCY,
+    log: Callable[[str], None] = print,
+) -> int:
+    """Rewrite the mirror of ``md5s`` (default: every song with scores) from Postgres.
+
+    Returns the number of songs mirrored.
+    """
+    if md5s is None:
+        md5s = _scored_md5s(supabase, 1000)
+    mirrored = 0
+    for start in range(0, len(md5s), batch_size):
+        batch = list(md5s[start:start + batch_size])
+        leaderboards = fetch_leaderboards(supabase, batch, concurrency=concurrency)
+        if not mirror_leaderboards(redis_client, {md5: leaderboards.get(md5, []) for md5 in batch}):
+            raise RuntimeError(f"Could not write mirror for songs {start + 1}-{start + len(batch)}")
+        mirrored += sum(1 for md5 in batch if leaderboards.get(md5))
+        log(f"Mirrored songs {start + 1}-{start + len(batch)} of {len(md5s)}")
+    return mirrored
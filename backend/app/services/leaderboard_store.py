@@ -0,0 +1,85 @@
+"""Reads of the normalized ``leaderboard_entries`` table (migration 008).
+
+Leaderboards used to be a JSONB array on ``songs_new.leaderboard``; they are now
+one row per (song, user), ranked by the ``leaderboard_ranked`` view. These
+accessors return entries in the old :class:`LeaderboardEntry` shape so the
+merge code and API responses are unchanged.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..types import LeaderboardEntry
+from .song_fetcher import SONG_FETCH_CONCURRENCY, fetch_rows_by_md5
+from .supabase_service import Row, rows
+
+LEADERBOARD_COLUMNS = "md5,user_id,username,score,percent,is_fc,speed,play_count,posted,rank"
+LEADERBOARD_BATCH_SIZE = 50
+LEADERBOARD_PAGE_SIZE = 1000
+
+
+def to_leaderboard_entry(row: Row) -> LeaderboardEntry:
+    """A ``leaderboard_ranked`` row as a leaderboard entry."""
+    return {
+        "user_id": str(row["user_id"]),
+        "username": row.get("username") or "",
+        "score": row["score"],
+        "percent": row["percent"],
+        "is_fc": row["is_fc"],
+        "speed": row["speed"],
+        "play_count": row["play_count"],
+        "posted": row.get("posted") or "",
+        "rank": row.get("rank"),
+    }
+
+
+def get_song_leaderboard_size(supabase: Any, song_id: str) -> Optional[Tuple[str, int]]:
+    """The md5 and entry count (``scores_count``) of the song with id ``song_id``."""
+    found = rows(supabase.table("songs_new").select("md5,scores_count").eq("id", song_id).execute().data)
+    if not found:
+        return None
+    return found[0]["md5"], found[0].get("scores_count") or 0
+
+
+def get_leaderboard_page(supabase: Any, md5: str, offset: int, limit: int) -> List[LeaderboardEntry]:
+    """``limit`` entries of one song's leaderboard starting after the first ``offset``."""
+    params = {"p_md5": md5, "p_offset": offset, "p_limit": limit}
+    result = supabase.rpc("leaderboard_page", params).execute()
+    return [to_leaderboard_entry(row) for row in rows(result.data)]
+
+
+def get_leaderboard_around(supabase: Any, md5: str, user_id: str, radius: int) -> List[LeaderboardEntry]:
+    """``user_id``'s entry and up to ``radius`` entries either side of it.
+
+    Empty when the user has no entry on the song.
+    """
+    params = {"p_md5": md5, "p_user_id": user_id, "p_radius": radius}
+    result = supabase.rpc("leaderboard_around", params).execute()
+    return [to_leaderboard_entry(row) for row in rows(result.data)]
+
+
+def get_song_leaderboard(supabase: Any, md5: str) -> List[LeaderboardEntry]:
+    """One song's leaderboard in rank order."""
+    return fetch_leaderboards(supabase, [md5], concurrency=1).get(md5, [])
+
+
+def fetch_leaderboards(
+    supabase: Any,
+    md5s: Sequence[str],
+    *,
+    concurrency: int = SONG_FETCH_CONCURRENCY,
+) -> Dict[str, List[LeaderboardEntry]]:
+    """Leaderboards for ``md5s`` in rank order, keyed by md5.
+
+    Songs without entries are left out.
+    """
+    fetched = fetch_rows_by_md5(
+        supabase, "leaderboard_ranked", md5s, LEADERBOARD_COLUMNS,
+        batch_size=LEADERBOARD_BATCH_SIZE,
+        concurrency=concurrency,
+        order=("md5", "rank"),
+        page_size=LEADERBOARD_PAGE_SIZE,
+    )
+    leaderboards: Dict[str, List[LeaderboardEntry]] = {}
+    for row in fetched:
+        leaderboards.setdefault(row["md5"], []).append(to_leaderboard_entry(row))
+    return leaderboards
@@ -0,0 +1,95 @@
+"""Reads of the precomputed ``player_standings`` table (migration 010).
+
+Standings are rebuilt from ``users`` whenever ``update_elo_rankings`` advances
+its watermark, so every read here is a range or point lookup on the table's
+keys rather than a scan and sort of ``users``.
+"""
+
+from typing import Any, List, Optional
+
+from ..types import PlayerStanding, RankingChange
+from .supabase_service import Row, rows
+
+STANDING_BOARDS = ("elo", "total_score", "total_fcs", "avg_percent")
+STANDING_COLUMNS = "user_id,username,avatar,value,rank,position,total"
+RANKING_CHANGE_COLUMNS = "id,user_id,username,old_elo,new_elo,old_rank,new_rank,changed_at"
+
+
+def to_player_standing(row: Row) -> PlayerStanding:
+    """A ``player_standings`` row as returned by the API."""
+    return {
+        "user_id": str(row["user_id"]),
+        "username": row.get("username") or "",
+        "avatar": row.get("avatar"),
+        "value": row["value"],
+        "rank": row["rank"],
+        "position": row["position"],
+    }
+
+
+def _positions(supabase: Any, board: str, first: int, last: int) -> List[Row]:
+    return rows(
+        supabase.table("player_standings").select(STANDING_COLUMNS)
+        .eq("board", board).gte("position", first).lte("position", last)
+        .order("position").execute().data
+    )
+
+
+def get_standings_page(supabase: Any, board: str, offset: int, limit: int) -> tuple[List[PlayerStanding], int]:
+    """``limit`` standings on ``board`` after the first ``offset``, and the board's size."""
+    found = _positions(supabase, board, offset + 1, offset + limit) if limit > 0 else []
+    if not found:
+        # past the end (or an empty page); the first row still carries the size
+        first = _positions(supabase, board, 1, 1)
+        return [], first[0]["total"] if first else 0
+    return [to_player_standing(row) for row in found], found[0]["total"]
+
+
+def get_player_standing(supabase: Any, board: str, user_id: str) -> Optional[Row]:
+    """``user_id``'s row on ``board``, if they are ranked there."""
+    found = rows(
+        supabase.table("player_standings").select(STANDING_COLUMNS)
+        .eq("board", board).eq("user_id", user_id).execute().data
+    )
+    return found[0] if found else None
+
+
+def get_standings_around(
+    supabase: Any, board: str, user_id: str, radius: int
+) -> Optional[tuple[PlayerStanding, List[PlayerStanding], int]]:
+    """``user_id``'s standing, the standings up to ``radius`` either side, and the board's size.
+
+    ``None`` when the user isn't ranked on ``board``.
+    """
+    me = get_player_standing(supabase, board, user_id)
+    if me is None:
+        return None
+    position = me["position"]
+    nearby = _positions(supabase, board, max(position - radius, 1), position + radius)
+    return to_player_standing(me), [to_player_standing(row) for row in nearby], me["total"]
+
+
+def get_ranking_changes(supabase: Any, since: Optional[int], limit: int) -> List[RankingChange]:
+    """ELO board changes in feed order (oldest first).
+
+    With ``since`` these are the first ``limit`` changes after that cursor;
+    without it, the latest ``limit`` changes.
+    """
+    query = supabase.table("ranking_changes").select(RANKING_CHANGE_COLUMNS)
+    if since is not None:
+        found = rows(query.gt("id", since).order("id").limit(limit).execute().data)
+    else:
+        found = rows(query.order("id", desc=True).limit(limit).execute().data)[::-1]
+    return [
+        {
+            "id": row["id"],
+            "user_id": str(row["user_id"]),
+            "username": row.get("username") or "",
+            "old_elo": row.get("old_elo"),
+            "new_elo": row.get("new_elo"),
+            "old_rank": row.get("old_rank"),
+            "new_rank": row.get("new_rank"),
+            "changed_at": row["changed_at"],
+        }
+        for row in found
+    ]
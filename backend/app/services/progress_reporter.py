@@ -0,0 +1,113 @@
+"""Coalesced progress reporting for score processing.
+
+Ingest used to write ``processing_status:{user_id}`` and emit a socket event
+once per song, which for a large library is tens of thousands of Redis
+round-trips and websocket frames. :class:`ProgressReporter` only sends an
+update once progress has moved by ``min_delta`` percent or ``min_interval``
+seconds have passed since the last one, writing the status hash with a single
+HSET. The last update of a stage is always sent, either when it reaches 100%
+or on :meth:`ProgressReporter.flush`.
+"""
+
+import time
+from typing import Any, Callable, Dict, Optional
+
+PROCESSING_STATUS_KEY = "processing_status:{user_id}"
+
+DEFAULT_MIN_INTERVAL = 0.5
+DEFAULT_MIN_DELTA = 1.0
+
+
+def write_processing_status(
+    redis_client: Any, user_id: str, status: str, progress: float, processed: int, total: int
+) -> None:
+    """Write the user's processing status hash in one HSET."""
+    redis_client.hset(PROCESSING_STATUS_KEY.format(user_id=user_id), mapping={
+        "status": status,
+        "progress": progress,
+        "processed": processed,
+        "total": total,
+    })
+
+
+class ProgressReporter:
+    """Throttles progress updates for one user's score processing run.
+
+    ``emit(event, payload, to=user_id)`` is called for socket events, so
+    ``socketio.emit`` can be passed directly. ``on_update()``, if given, is
+    called after each update that is sent.
+    """
+
+    def __init__(
+        self,
+        redis_client: Any,
+        emit: Callable[..., Any],
+        user_id: str,
+        *,
+        min_interval: float = DEFAULT_MIN_INTERVAL,
+        min_delta: float = DEFAULT_MIN_DELTA,
+        clock: Callable[[], float] = time.monotonic,
+        on_update: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.redis = redis_client
+        self.emit = emit
+        self.user_id = user_id
+        self.min_interval = min_interval
+        self.min_delta = min_delta
+        self.clock = clock
+        self.on_update = on_update
+        self._stage: Optional[str] = None
+        self._sent_progress: Optional[float] = None
+        self._sent_at = 0.0
+        self._pending: Optional[Dict[str, Any]] = None
+
+    def songs(self, processed: int, total: int) -> None:
+        """Report per-song scoring progress (status hash and socket event)."""
+        progress = (processed / total) * 100 if total else 100.0
+        self._report("songs", progress, {
+            "event": "score_processing_progress",
+            "payload": {"progress": progress, "processed": processed, "total": total},
+            "status": ("in_progress", progress, processed, total),
+        })
+
+    def leaderboards(self, pushed: int, total: int) -> None:
+        """Report leaderboard push progress (socket event only)."""
+        progress = (pushed / total) * 100 if total else 100.0
+        self._report("leaderboards", progress, {
+            "event": "score_processing_updating_progress",
+            "payload": {"message": f"Updating leaderboards {pushed} / {total}", "progress": progress},
+            "status": None,
+        })
+
+    def flush(self) -> None:
+        """Send the latest update that was held back by the throttle."""
+        if self._pending is not None:
+            self._send(self._pending)
+
+    def _report(self, stage: str, progress: float, update: Dict[str, Any]) -> None:
+        if stage != self._stage:
+            self.flush()
+            self._stage = stage
+            self._sent_progress = None
+
+        update["progress"] = progress
+        now = self.clock()
+        last = self._sent_progress
+        if last is None or (progress != last and (
+            progress >= 100
+            or progress - last >= self.min_delta
+            or now - self._sent_at >= self.min_interval
+        )):
+            self._send(update)
+        elif progress != last:
+            self._pending = update
+
+    def _send(self, update: Dict[str, Any]) -> None:
+        if update["status"] is not None:
+            write_processing_status(self.redis, self.user_id, *update["status"])
+        self.emit(update["event"], update["payload"], to=self.user_id)
+        self._sent_progress = update["progress"]
+        self._sent_at = self.clock()
+        self._pending = None
+        if self.on_update is not None:
+            self.on_update()
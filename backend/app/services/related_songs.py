@@ -0,0 +1,127 @@
+"""Related songs for a song page: same album, artist, genre or charter.
+
+All requested sets come from one ``get_related_songs`` RPC call, each capped
+at ``RELATED_SONGS_LIMIT`` rows. With the song catalog in use, sets are kept
+per relation (``("genre", "Rock")``, ``("charter", ("a", "b"))``) and dropped
+when the catalog syncs a change to a song in them: a song whose
+``last_update`` moved is checked against the album, artist, genre and
+charters it had before and has after, so only the sets it was or is part of
+are refetched.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
+
+from flask import current_app
+
+from .song_catalog import song_catalog
+from .supabase_service import Row, rows
+
+RELATED_SONGS_LIMIT = 200
+RELATED_CACHE_SIZE = 2048
+RELATIONS = ("album", "artist", "genre", "charter")
+
+RelatedKey = Tuple[str, Any]
+
+
+def related_key(relation: str, value: str) -> RelatedKey:
+    """Cache key for one relation; ``charter`` takes a comma-separated list of names."""
+    if relation == "charter":
+        return relation, tuple(sorted({name for name in value.split(",") if name}))
+    return relation, value
+
+
+class RelatedSongsCache:
+    """Related song sets by :func:`related_key`, LRU-bounded."""
+
+    def __init__(self, size: int = RELATED_CACHE_SIZE) -> None:
+        self.size = size
+        # bumped by every invalidation, so a fetch that raced one isn't stored
+        self.generation = 0
+        self._sets: "OrderedDict[RelatedKey, List[Row]]" = OrderedDict()
+        self._by_charter: Dict[str, Set[RelatedKey]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: RelatedKey) -> Optional[List[Row]]:
+        with self._lock:
+            songs = self._sets.get(key)
+            if songs is not None:
+                self._sets.move_to_end(key)
+            return songs
+
+    def put(self, key: RelatedKey, songs: List[Row], generation: int) -> None:
+        """Store ``songs`` unless the cache was invalidated after ``generation`` was read."""
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._sets[key] = songs
+            self._sets.move_to_end(key)
+            if key[0] == "charter":
+                for name in key[1]:
+                    self._by_charter.setdefault(name, set()).add(key)
+            while len(self._sets) > self.size:
+                self._drop(next(iter(self._sets)))
+
+    def _drop(self, key: RelatedKey) -> None:
+        if self._sets.pop(key, None) is not None and key[0] == "charter":
+            for name in key[1]:
+                keys = self._by_charter.get(name)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._by_charter[name]
+
+    def song_changed(self, before: Optional[Row], after: Optional[Row]) -> None:
+        """Drop every set ``before`` was in or ``after`` belongs to."""
+        with self._lock:
+            self.generation += 1
+            if not self._sets:
+                return
+            for song in (before, after):
+                if song is None:
+                    continue
+                for relation in ("album", "artist", "genre"):
+                    self._drop((relation, song.get(relation)))
+                for name in song.get("charter_refs") or []:
+                    for key in list(self._by_charter.get(name, ())):
+                        self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._sets.clear()
+            self._by_charter.clear()
+
+
+related_songs_cache = RelatedSongsCache()
+song_catalog.listeners.append(related_songs_cache.song_changed)
+
+
+def fetch_related_songs(supabase: Any, criteria: Mapping[str, str]) -> Dict[str, List[Row]]:
+    """``{"<relation>_songs": [...]}`` for every relation, empty unless in ``criteria``."""
+    use_cache = bool(current_app.config.get("SONG_CATALOG_CACHE")) and song_catalog.ensure_fresh()
+    related: Dict[str, List[Row]] = {f"{relation}_songs": [] for relation in RELATIONS}
+    missing: Dict[str, RelatedKey] = {}
+    for relation, value in criteria.items():
+        key = related_key(relation, value)
+        cached = related_songs_cache.get(key) if use_cache else None
+        if cached is None:
+            missing[relation] = key
+        else:
+            related[f"{relation}_songs"] = cached
+    if not missing:
+        return related
+
+    generation = related_songs_cache.generation
+    params: Dict[str, Any] = {f"p_{relation}": key[1] for relation, key in missing.items() if relation != "charter"}
+    if "charter" in missing:
+        params["p_charters"] = list(missing["charter"][1])
+    params["p_limit"] = RELATED_SONGS_LIMIT
+    fetched = supabase.rpc("get_related_songs", params).execute().data or {}
+    for relation, key in missing.items():
+        songs = rows(fetched.get(f"{relation}_songs") or [])
+        related[f"{relation}_songs"] = songs
+        if use_cache:
+            related_songs_cache.put(key, songs, generation)
+    return related
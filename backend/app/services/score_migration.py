@@ -1,9 +1,11 @@
 import logging
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, List, Optional
 
 from ..types import LeaderboardEntry, LeaderboardUpdate
 from ..utils.leaderboard_writer import LEADERBOARD_CHUNK_SIZE, push_leaderboard_updates
 from ..utils.score_processing import merge_unknown_scores
+from .leaderboard_store import fetch_leaderboards
+from .song_fetcher import SONG_FETCH_CONCURRENCY, fetch_songs_by_md5
 from .supabase_service import rows
 
 logger = logging.getLogger(__name__)
@@ -13,7 +15,9 @@ def promote_unknown_scores(
     supabase: Any,
     *,
     dry_run: bool = True,
+    concurrency: int = SONG_FETCH_CONCURRENCY,
     log: Callable[[str], None] = lambda _msg: None,
+    on_leaderboards_written: Optional[Callable[[List[LeaderboardUpdate]], None]] = None,
 ) -> Dict[str, Any]:
     """Promote unknown scores whose songs now exist in ``songs_new``."""
     prefix = "[dry-run] " if dry_run else ""
@@ -59,22 +63,15 @@ def promote_unknown_scores(
                 dict.fromkeys(s["identifier"] for s in unknown if "identifier" in s)
             )
 
-            songs_dict: Dict[str, Any] = {}
-            for i in range(0, len(identifiers), 500):
-                batch = identifiers[i:i + 500]
-                fetched = rows(
-                    supabase.table("songs_new")
-                    .select("md5,name,artist,charter_refs,leaderboard")
-                    .in_("md5", batch)
-                    .execute()
-                    .data
-                )
-                for song in fetched:
-                    songs_dict[song["md5"]] = song
+            songs_dict: Dict[str, Any] = fetch_songs_by_md5(
+                supabase, identifiers, concurrency=concurrency
+            )
 
+            unseen = [md5 for md5 in songs_dict if md5 not in song_leaderboards]
+            fetched_leaderboards = fetch_leaderboards(supabase, unseen, concurrency=concurrency)
+            for md5 in unseen:
+                song_leaderboards[md5] = fetched_leaderboards.get(md5, [])
             for md5, song in songs_dict.items():
-                if md5 not in song_leaderboards:
-                    song_leaderboards[md5] = song.get("leaderboard") or []
                 song["leaderboard"] = song_leaderboards[md5]
 
             newly_known, remaining_unknown, lb_updates = merge_unknown_scores(
@@ -136,7 +133,8 @@ def promote_unknown_scores(
             for md5, meta in touched_songs.items()
         ]
         failed = push_leaderboard_updates(
-            supabase, updates, LEADERBOARD_CHUNK_SIZE, logger
+            supabase, updates, LEADERBOARD_CHUNK_SIZE, logger,
+            on_written=on_leaderboards_written,
         )
         for update in failed:
             message = f"leaderboard {update['name']} ({update['md5']}): write failed"
@@ -0,0 +1,123 @@
+"""Filtered, sorted, keyset-paginated pages of ``songs_new``.
+
+A page is ``ORDER BY <sort> [DESC], id [DESC]`` over the rows whose sort value
+is set, followed by the rows where it is NULL, by id. The cursor handed to
+clients is the last row's ``(sort value, id)``. Each sort column has a
+``(column, id)`` index (migration 016), and a continued page is bounded by
+``<sort> >= value`` (``<=`` descending) as well as the exact keyset filter,
+so Postgres starts the index scan at the cursor instead of at the first row.
+The NULL rows are a second query over the same index, run only once the
+non-NULL rows run out.
+
+Filters are applied to the rows the scan reaches. Without filters, or with
+filters that most songs pass, a page reads about ``limit`` index entries at
+any depth; a selective filter (one artist) may instead be planned on that
+filter's own index followed by a sort of its matches.
+"""
+
+import base64
+import json
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .supabase_service import Row, rows
+
+# filter name -> songs_new column; charter matches inside charter_refs (GIN)
+BROWSE_FILTER_COLUMNS = {
+    "name": "name",
+    "artist": "artist",
+    "album": "album",
+    "genre": "genre",
+    "charter": "charter_refs",
+}
+
+# columns a page can be sorted by; each has a (column, id) index
+BROWSE_SORT_COLUMNS = frozenset({
+    "name", "artist", "album", "year", "genre", "song_length", "last_update", "scores_count", "md5",
+})
+
+Cursor = Tuple[Any, int]
+
+
+def encode_cursor(row: Row, sort: str) -> str:
+    payload = json.dumps([row.get(sort), row["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """``(sort value, id)`` from :func:`encode_cursor`; ``ValueError`` if malformed."""
+    try:
+        value, song_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(song_id, int) or isinstance(value, (list, dict)):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return value, song_id
+
+
+def _quote(value: Any) -> str:
+    """``value`` as a PostgREST filter operand, safe inside ``or=(...)``."""
+    text = json.dumps(value) if isinstance(value, bool) else str(value)
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _like_pattern(value: str) -> str:
+    """An ``ilike`` pattern matching ``value`` anywhere, with its own ``%``/``_`` taken literally."""
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _filtered(query: Any, filters: Mapping[str, str]) -> Any:
+    for name, value in filters.items():
+        column = BROWSE_FILTER_COLUMNS[name]
+        if name == "name":
+            query = query.ilike(column, _like_pattern(value))
+        elif name == "charter":
+            query = query.contains(column, [value])
+        else:
+            query = query.eq(column, value)
+    return query
+
+
+def _after(sort: str, descending: bool, cursor: Cursor) -> str:
+    """``or`` filter for the rows after a non-NULL ``cursor`` in ``sort`` order."""
+    value, song_id = cursor
+    op = "lt" if descending else "gt"
+    return f"{sort}.{op}.{_quote(value)},and({sort}.eq.{_quote(value)},id.{op}.{song_id})"
+
+
+def browse_songs(
+    supabase: Any,
+    columns: str,
+    filters: Mapping[str, str],
+    sort: str,
+    descending: bool,
+    limit: int,
+    after: Optional[Cursor] = None,
+) -> Tuple[List[Row], Optional[str]]:
+    """One page of songs matching ``filters`` and the cursor of the next page, if any.
+
+    ``name`` matches case-insensitively anywhere in the name, ``charter`` any
+    song crediting that charter, the other filters exactly.
+    """
+    page: List[Dict[str, Any]] = []
+    if after is None or after[0] is not None:
+        query = _filtered(supabase.table("songs_new").select(columns), filters).not_.is_(sort, "null")
+        if after is not None:
+            bound = query.lte if descending else query.gte
+            query = bound(sort, after[0]).or_(_after(sort, descending, after))
+        page = rows(
+            query.order(sort, desc=descending).order("id", desc=descending).limit(limit + 1).execute().data
+        )
+
+    if len(page) <= limit:
+        query = _filtered(supabase.table("songs_new").select(columns), filters).is_(sort, "null")
+        if after is not None and after[0] is None:
+            query = query.lt("id", after[1]) if descending else query.gt("id", after[1])
+        page += rows(
+            query.order("id", desc=descending).limit(limit + 1 - len(page)).execute().data
+        )
+
+    if len(page) <= limit:
+        return page, None
+    page = page[:limit]
+    return page, encode_cursor(page[-1], sort)
@@ -0,0 +1,191 @@
+"""The song list, held in memory and kept current from ``get_song_list`` deltas.
+
+The first use loads the whole list through the ``get_song_list`` RPC. After
+that, at most every ``SONG_CATALOG_REFRESH_SECONDS``, the catalog asks for
+the songs updated and deleted since the ``server_time`` of its last sync, so a
+refresh moves only what changed. While one request syncs, others read the
+current copy.
+
+The catalog answers ``/api/songs`` itself: the full list is encoded once per
+change into a :class:`SongListSnapshot`, and a delta is cut from memory for
+any ``since`` at or after the initial load. Tombstones are kept with the
+``server_time`` of the sync that reported them; a delta includes every
+tombstone that may be newer than its ``since``. ``listeners`` hear about each
+song a sync changes, so caches built from songs can drop only what changed.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import datetime, UTC
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import requests
+from flask import current_app
+
+from ..utils.song_search import SongSearchIndex
+from .supabase_service import Row
+
+SONG_LIST_TIMEOUT = (5, 120)
+DEFAULT_REFRESH_SECONDS = 60.0
+
+logger = logging.getLogger(__name__)
+
+session = requests.Session()
+
+
+def request_song_list(since: Optional[str] = None, *, stream: bool = False) -> requests.Response:
+    """POST the ``get_song_list`` RPC; the full list, or the delta since ``since``."""
+    body: Dict[str, Any] = {}
+    if since is not None:
+        body["since"] = since
+
+    url = f"{current_app.config['SUPABASE_URL']}/rest/v1/rpc/get_song_list"
+    key = current_app.config["SUPABASE_SERVICE_KEY"]
+    headers = {
+        "apikey": key,
+        "Authorization": f"Bearer {key}",
+        "Content-Type": "application/json",
+    }
+    return session.post(url, json=body, headers=headers, stream=stream, timeout=SONG_LIST_TIMEOUT)
+
+
+def parse_timestamp(value: str) -> datetime:
+    """An ISO-8601 timestamp, read as UTC when it carries no offset."""
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=UTC)
+
+
+class SongListSnapshot(NamedTuple):
+    """The encoded full song list at one catalog version."""
+    version: int
+    server_time: str
+    array: bytes      # legacy bare JSON array
+    envelope: bytes   # ``{"server_time", "songs", "deleted"}``
+    array_etag: str
+    envelope_etag: str
+
+
+class SongCatalog:
+    """Songs by id, with a search index over them."""
+
+    def __init__(self) -> None:
+        self.index = SongSearchIndex()
+        self.cursor: Optional[str] = None
+        # the first full load; older ``since`` cursors can't be answered from memory
+        self.loaded_at: Optional[datetime] = None
+        self.synced_at = 0.0
+        # bumped whenever a song or tombstone changes
+        self.version = 0
+        self._updated: Dict[Any, datetime] = {}
+        self._tombstones: List[Tuple[datetime, Dict[str, Any]]] = []
+        self._snapshot: Optional[SongListSnapshot] = None
+        self._lock = threading.Lock()
+        # called with (previous row, new row) for each song a sync changes; None when absent
+        self.listeners: List[Callable[[Optional[Row], Optional[Row]], None]] = []
+
+    @property
+    def songs(self) -> Dict[Any, Row]:
+        return self.index.songs
+
+    @property
+    def loaded(self) -> bool:
+        return self.cursor is not None
+
+    def apply(self, envelope: Dict[str, Any]) -> None:
+        """Apply a ``get_song_list`` envelope: tombstones, then new and updated songs."""
+        server_time = envelope["server_time"]
+        reported_at = parse_timestamp(server_time)
+        deleted = envelope.get("deleted") or []
+        songs = envelope.get("songs") or []
+        for tombstone in deleted:
+            self._notify(self.songs.get(tombstone.get("id")), None)
+            self.index.remove(tombstone.get("id"))
+            self._updated.pop(tombstone.get("id"), None)
+            self._tombstones.append((reported_at, tombstone))
+        for song in songs:
+            self._notify(self.songs.get(song["id"]), song)
+            self.index.upsert(song)
+            last_update = song.get("last_update")
+            self._updated[song["id"]] = parse_timestamp(last_update) if last_update else reported_at
+        if deleted or songs:
+            self.version += 1
+        if self.loaded_at is None:
+            self.loaded_at = reported_at
+        self.cursor = server_time
+
+    def _notify(self, before: Optional[Row], after: Optional[Row]) -> None:
+        if before is None and after is None:
+            return
+        for listener in self.listeners:
+            listener(before, after)
+
+    def sync(self) -> None:
+        """Fetch and apply the changes since the last sync (everything, the first time)."""
+        resp = request_song_list(self.cursor)
+        if resp.status_code != 200:
+            raise RuntimeError(f"get_song_list RPC failed: {resp.status_code} {resp.text[:500]}")
+        self.apply(resp.json())
+        self.synced_at = time.monotonic()
+
+    def ensure_fresh(self) -> bool:
+        """Sync if the catalog is older than the refresh interval; whether it is usable.
+
+        A failed refresh is logged and the stale copy kept.
+        """
+        max_age = current_app.config.get("SONG_CATALOG_REFRESH_SECONDS", DEFAULT_REFRESH_SECONDS)
+        if self.loaded and time.monotonic() - self.synced_at < max_age:
+            return True
+        # only the first load makes callers wait; later refreshes happen in one request
+        if not self._lock.acquire(blocking=not self.loaded):
+            return True
+        try:
+            if not self.loaded or time.monotonic() - self.synced_at >= max_age:
+                self.sync()
+        except (requests.RequestException, RuntimeError, ValueError) as e:
+            logger.error(f"Song catalog sync failed: {e}")
+            if self.loaded:
+                # retry after another interval instead of on every request
+                self.synced_at = time.monotonic()
+        finally:
+            self._lock.release()
+        return self.loaded
+
+    def expire(self) -> None:
+        """Sync on the next use, e.g. after this process changed a song."""
+        self.synced_at = 0.0
+
+    def snapshot(self) -> SongListSnapshot:
+        """The full song list, encoded once per catalog version."""
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.version != self.version:
+            assert self.cursor is not None
+            array = json.dumps(list(self.songs.values()), separators=(",", ":")).encode()
+            envelope = b"".join((
+                b'{"server_time":', json.dumps(self.cursor).encode(),
+                b',"songs":', array, b',"deleted":[]}',
+            ))
+            snapshot = self._snapshot = SongListSnapshot(
+                self.version,
+                self.cursor,
+                array,
+                envelope,
+                hashlib.sha256(array).hexdigest()[:32],
+                hashlib.sha256(envelope).hexdigest()[:32],
+            )
+        return snapshot
+
+    def delta(self, since: datetime) -> Optional[Dict[str, Any]]:
+        """The ``get_song_list`` envelope for ``since``, or ``None`` if it predates the catalog."""
+        if self.loaded_at is None or since < self.loaded_at:
+            return None
+        return {
+            "server_time": self.cursor,
+            "songs": [self.songs[song_id] for song_id, updated in self._updated.items() if updated >= since],
+            "deleted": [tombstone for reported_at, tombstone in self._tombstones if reported_at >= since],
+        }
+
+
+song_catalog = SongCatalog()
@@ -0,0 +1,151 @@
+"""Encoded ``songs_extra.song_data`` payloads for ``/api/songs/<md5>/extra``.
+
+``song_data`` is large and only changes when ``populate_songs_new_table``
+rewrites a song, so each one is encoded and gzipped once and kept in an
+in-process LRU bounded by bytes (``SONG_EXTRA_CACHE_BYTES``). With Redis
+configured the gzipped body is shared there too, next to a small ETag key.
+Each hit checks only the ETag key in Redis, so a rewrite is seen by every
+worker: :func:`invalidate_song_extras` deletes both keys, and the next
+request reloads the song from the database.
+
+Without Redis nothing outside the process can reach its cache; workers pick
+up rewritten songs when they restart.
+"""
+
+import gzip
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+from flask import current_app
+
+from ..extensions import redis
+from ..utils.payloads import Payload, encode_payload
+from .supabase_service import rows
+
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+SONG_EXTRA_KEY = "song_extra:{md5}"
+SONG_EXTRA_ETAG_KEY = "song_extra_etag:{md5}"
+SONG_EXTRA_TTL = 7 * 24 * 60 * 60
+
+logger = logging.getLogger(__name__)
+
+
+def _size(payload: Payload) -> int:
+    return len(payload.body) + len(payload.gzipped)
+
+
+class SongExtraCache:
+    """Payloads by md5, least recently used dropped first once over ``max_bytes``."""
+
+    def __init__(self) -> None:
+        self.bytes = 0
+        self._payloads: "OrderedDict[str, Payload]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    def get(self, md5: str) -> Optional[Payload]:
+        with self._lock:
+            payload = self._payloads.get(md5)
+            if payload is not None:
+                self._payloads.move_to_end(md5)
+            return payload
+
+    def put(self, md5: str, payload: Payload, max_bytes: int) -> None:
+        with self._lock:
+            self._discard(md5)
+            if _size(payload) > max_bytes:
+                return
+            self._payloads[md5] = payload
+            self.bytes += _size(payload)
+            while self.bytes > max_bytes:
+                _, evicted = self._payloads.popitem(last=False)
+                self.bytes -= _size(evicted)
+
+    def _discard(self, md5: str) -> None:
+        payload = self._payloads.pop(md5, None)
+        if payload is not None:
+            self.bytes -= _size(payload)
+
+    def discard(self, md5: str) -> None:
+        with self._lock:
+            self._discard(md5)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._payloads.clear()
+            self.bytes = 0
+
+
+song_extra_cache = SongExtraCache()
+
+
+def _shared() -> Optional[Any]:
+    return redis if current_app.config.get("REDIS_URL") else None
+
+
+def _from_shared(shared: Any, md5: str, local: Optional[Payload]) -> Optional[Payload]:
+    """The shared payload for ``md5``, reusing ``local`` while its ETag is current."""
+    try:
+        etag = shared.get(SONG_EXTRA_ETAG_KEY.format(md5=md5))
+        if etag is None:
+            return None
+        etag = etag.decode() if isinstance(etag, bytes) else etag
+        if local is not None and local.etag == etag:
+            return local
+        gzipped = shared.get(SONG_EXTRA_KEY.format(md5=md5))
+    except Exception as e:
+        logger.warning(f"Could not read song extra {md5} from Redis: {e}")
+        return None
+    if gzipped is None:
+        return None
+    payload = Payload(gzip.decompress(gzipped), gzipped, etag)
+    song_extra_cache.put(md5, payload, current_app.config.get("SONG_EXTRA_CACHE_BYTES", DEFAULT_CACHE_BYTES))
+    return payload
+
+
+def get_song_extra_payload(supabase: Any, md5: str) -> Optional[Payload]:
+    """The encoded ``song_data`` of ``md5``, or ``None`` if there is none."""
+    local = song_extra_cache.get(md5)
+    shared = _shared()
+    if shared is None:
+        if local is not None:
+            return local
+    else:
+        payload = _from_shared(shared, md5, local)
+        if payload is not None:
+            return payload
+
+    found = rows(supabase.table("songs_extra").select("song_data").eq("md5", md5).execute().data)
+    if not found:
+        return None
+    payload = encode_payload(json.dumps(found[0]["song_data"], separators=(",", ":")).encode())
+    song_extra_cache.put(md5, payload, current_app.config.get("SONG_EXTRA_CACHE_BYTES", DEFAULT_CACHE_BYTES))
+    if shared is not None:
+        try:
+            pipe = shared.pipeline()
+            pipe.set(SONG_EXTRA_KEY.format(md5=md5), payload.gzipped, ex=SONG_EXTRA_TTL)
+            pipe.set(SONG_EXTRA_ETAG_KEY.format(md5=md5), payload.etag, ex=SONG_EXTRA_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not store song extra {md5} in Redis: {e}")
+    return payload
+
+
+def invalidate_song_extras(md5s: Iterable[str]) -> None:
+    """Forget the payloads of rewritten songs, here and (with Redis) in every worker."""
+    md5s = list(md5s)
+    for md5 in md5s:
+        song_extra_cache.discard(md5)
+    shared = _shared()
+    if shared is None or not md5s:
+        return
+    keys = [key.format(md5=md5) for md5 in md5s for key in (SONG_EXTRA_ETAG_KEY, SONG_EXTRA_KEY)]
+    try:
+        shared.delete(*keys)
+    except Exception as e:
+        logger.warning(f"Could not invalidate {len(md5s)} song extra(s) in Redis: {e}")
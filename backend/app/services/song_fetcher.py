@@ -0,0 +1,100 @@
+"""Concurrent lookups by md5.
+
+Ingest and unknown-score promotion look up song rows (and their leaderboard
+entries) in batches of identifiers, one ``in_("md5", batch)`` query per
+batch. Each batch is a full round-trip to Supabase, so
+:func:`fetch_rows_by_md5` runs up to ``concurrency`` of them at once and
+merges the rows. Under the gevent worker the pool threads are greenlets, so
+this overlaps network waits without adding real threads.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .supabase_service import Row, rows
+
+logger = logging.getLogger(__name__)
+
+SONG_BATCH_SIZE = 500
+SONG_FETCH_CONCURRENCY = 4
+SONG_INFO_COLUMNS = "md5,name,artist,charter_refs"
+
+
+def fetch_rows_by_md5(
+    supabase: Any,
+    table: str,
+    md5s: Sequence[Any],
+    columns: str,
+    *,
+    key: str = "md5",
+    batch_size: int = SONG_BATCH_SIZE,
+    concurrency: int = SONG_FETCH_CONCURRENCY,
+    order: Sequence[str] = (),
+    page_size: Optional[int] = None,
+    on_batch: Optional[Callable[[int, int, float], None]] = None,
+) -> List[Row]:
+    """Select ``columns`` from ``table`` for every md5 in ``md5s``, batch by batch.
+
+    Batches run up to ``concurrency`` at a time and their rows come back in
+    batch order. With ``page_size`` each batch is read in ``range()`` pages
+    (ordered by ``order``), for tables with several rows per md5 that can
+    exceed PostgREST's row limit. ``on_batch(start, count, seconds)`` is called
+    as each batch finishes, with the batch's offset into ``md5s``, its size,
+    and how long it took. If any batch fails its exception is raised once the
+    others have finished. ``key`` names the column ``md5s`` are matched
+    against, e.g. ``"id"`` to look songs up by id instead.
+    """
+    batches = [list(md5s[i:i + batch_size]) for i in range(0, len(md5s), batch_size)]
+    if not batches:
+        return []
+
+    def fetch(index: int) -> List[Row]:
+        batch = batches[index]
+        started = time.monotonic()
+        fetched: List[Row] = []
+        while True:
+            query = supabase.table(table).select(columns).in_(key, batch)
+            for column in order:
+                query = query.order(column)
+            if page_size is not None:
+                query = query.range(len(fetched), len(fetched) + page_size - 1)
+            page = rows(query.execute().data)
+            fetched.extend(page)
+            if page_size is None or len(page) < page_size:
+                break
+        elapsed = time.monotonic() - started
+        logger.debug(f"Fetched {len(fetched)} {table} row(s) for {len(batch)} {key}(s) in {elapsed:.2f}s")
+        if on_batch:
+            on_batch(index * batch_size, len(batch), elapsed)
+        return fetched
+
+    workers = max(1, min(concurrency, len(batches)))
+    if workers == 1:
+        results = [fetch(index) for index in range(len(batches))]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(fetch, range(len(batches))))
+
+    return [row for fetched in results for row in fetched]
+
+
+def fetch_songs_by_md5(
+    supabase: Any,
+    md5s: Sequence[str],
+    columns: str = SONG_INFO_COLUMNS,
+    *,
+    batch_size: int = SONG_BATCH_SIZE,
+    concurrency: int = SONG_FETCH_CONCURRENCY,
+    on_batch: Optional[Callable[[int, int, float], None]] = None,
+) -> Dict[str, Row]:
+    """Fetch ``songs_new`` rows for ``md5s``, keyed by md5.
+
+    See :func:`fetch_rows_by_md5` for batching and ``on_batch``.
+    """
+    fetched = fetch_rows_by_md5(
+        supabase, "songs_new", md5s, columns,
+        batch_size=batch_size, concurrency=concurrency, on_batch=on_batch,
+    )
+    return {song["md5"]: song for song in fetched}
@@ -0,0 +1,124 @@
+"""Song rows looked up by id or md5, with a short-lived row cache.
+
+``/api/songs-by-ids`` is called by the bot and the site with heavily
+overlapping sets of songs (a charter's songs, a user's recent plays).
+:func:`lookup_songs` answers what it can from rows fetched in the last
+``SONG_ROW_CACHE_SECONDS`` and fetches the rest with
+:func:`~.song_fetcher.fetch_rows_by_md5`, by id or by md5. Each row is cached under both its id and its
+md5, so a later request by either key is a hit.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from flask import current_app
+
+from .song_fetcher import SONG_BATCH_SIZE, SONG_FETCH_CONCURRENCY, fetch_rows_by_md5
+from .supabase_service import Row
+
+DEFAULT_ROW_CACHE_SECONDS = 30.0
+ROW_CACHE_SIZE = 20_000
+
+SongKey = Tuple[str, Union[int, str]]
+
+
+def song_key(identifier: Any) -> SongKey:
+    """``("id", n)`` or ``("md5", s)`` for a requested identifier.
+
+    Ints and all-digit strings are ids (the bot sends ids as strings); any
+    other string is an md5. Raises ``ValueError`` for anything else.
+    """
+    if isinstance(identifier, int) and not isinstance(identifier, bool):
+        return "id", identifier
+    if isinstance(identifier, str) and identifier:
+        # an md5 is 32 hex digits, so a digits-only string can be either; ids are far shorter
+        if identifier.isdigit() and len(identifier) < 32:
+            return "id", int(identifier)
+        return "md5", identifier
+    raise ValueError(f"Invalid song identifier: {identifier!r}")
+
+
+def _row_keys(row: Row) -> List[SongKey]:
+    """The keys ``row`` is cached under: its id and its md5, where present."""
+    return [(column, row[column]) for column in ("id", "md5") if row.get(column) is not None]
+
+
+class SongRowCache:
+    """Rows by ``("id", id)`` and ``("md5", md5)``, each kept for a fixed time, LRU-bounded."""
+
+    def __init__(self, size: int = ROW_CACHE_SIZE) -> None:
+        self.size = size
+        self._rows: "OrderedDict[SongKey, Tuple[float, Row]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: SongKey) -> Optional[Row]:
+        with self._lock:
+            entry = self._rows.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._rows[key]
+                return None
+            self._rows.move_to_end(key)
+            return entry[1]
+
+    def put(self, row: Row, ttl: float) -> None:
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            for key in _row_keys(row):
+                self._rows[key] = (expires_at, row)
+                self._rows.move_to_end(key)
+            while len(self._rows) > self.size:
+                self._rows.popitem(last=False)
+
+    def forget(self, song_id: int) -> None:
+        """Drop a song (by id, and its md5 with it), e.g. after an admin edit."""
+        with self._lock:
+            entry = self._rows.pop(("id", song_id), None)
+            if entry is not None:
+                for key in _row_keys(entry[1]):
+                    self._rows.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows.clear()
+
+
+song_rows = SongRowCache()
+
+
+def lookup_songs(
+    supabase: Any,
+    keys: Sequence[SongKey],
+    columns: str,
+    *,
+    batch_size: int = SONG_BATCH_SIZE,
+    concurrency: int = SONG_FETCH_CONCURRENCY,
+) -> Dict[SongKey, Row]:
+    """The ``songs_new`` row for each of ``keys`` that exists; missing keys are absent.
+
+    ``columns`` must include ``id`` and ``md5``, and be the same for every
+    caller, since cached rows are shared.
+    """
+    ttl = current_app.config.get("SONG_ROW_CACHE_SECONDS", DEFAULT_ROW_CACHE_SECONDS)
+    found: Dict[SongKey, Row] = {}
+    wanted: Dict[str, List[Any]] = {"id": [], "md5": []}
+    for key in dict.fromkeys(keys):
+        row = song_rows.get(key) if ttl > 0 else None
+        if row is not None:
+            found[key] = row
+        else:
+            wanted[key[0]].append(key[1])
+
+    for column, values in wanted.items():
+        fetched = fetch_rows_by_md5(
+            supabase, "songs_new", values, columns,
+            key=column, batch_size=batch_size, concurrency=concurrency,
+        )
+        for row in fetched:
+            found[(column, row[column])] = row
+            if ttl > 0:
+                song_rows.put(row, ttl)
+    return found
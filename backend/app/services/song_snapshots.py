@@ -0,0 +1,106 @@
+"""Pre-compressed blobs of the song list snapshot.
+
+The full song list is the largest response the API sends, and Flask-Compress
+would recompress it for every request. Instead each encoded snapshot
+(:class:`app.services.song_catalog.SongListSnapshot`) is compressed once per
+content ETag and encoding, in the CPU pool, and kept in process. With Redis
+configured the blobs are also shared there, so other workers and restarts
+reuse them instead of compressing again. A new snapshot version gets a new
+ETag, and the previous version's blobs are dropped from the process.
+"""
+
+import gzip
+import logging
+import sys
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import brotli
+from flask import Request, Response, current_app
+
+from ..extensions import redis
+from .cpu_pool import run_cpu_bound
+
+if sys.version_info >= (3, 14):
+    from compression import zstd
+else:
+    from backports import zstd
+
+# best first when a client accepts several at the same quality
+SNAPSHOT_ENCODINGS = ("zstd", "br", "gzip")
+SNAPSHOT_KEY = "song_snapshot:{etag}:{encoding}"
+SNAPSHOT_TTL = 24 * 60 * 60
+
+logger = logging.getLogger(__name__)
+
+
+def compress_snapshot(body: bytes, encoding: str) -> bytes:
+    """``body`` compressed with ``encoding``; levels picked for seconds, not minutes, on ~25 MB."""
+    if encoding == "zstd":
+        return zstd.compress(body, 12)
+    if encoding == "br":
+        return brotli.compress(body, quality=9)
+    if encoding == "gzip":
+        return gzip.compress(body, 9)
+    raise ValueError(f"Unsupported snapshot encoding: {encoding}")
+
+
+class SnapshotBlobs:
+    """Compressed forms of the current snapshot bodies, by (kind, encoding)."""
+
+    def __init__(self) -> None:
+        self._blobs: Dict[Tuple[str, str], Tuple[str, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def _shared(self) -> Optional[Any]:
+        return redis if current_app.config.get("REDIS_URL") else None
+
+    def get(self, kind: str, etag: str, body: bytes, encoding: str) -> bytes:
+        """``body`` (a snapshot ``kind`` with content ``etag``) compressed with ``encoding``."""
+        cached = self._blobs.get((kind, encoding))
+        if cached is not None and cached[0] == etag:
+            return cached[1]
+
+        with self._lock:
+            cached = self._blobs.get((kind, encoding))
+            if cached is not None and cached[0] == etag:
+                return cached[1]
+
+            shared = self._shared()
+            key = SNAPSHOT_KEY.format(etag=etag, encoding=encoding)
+            blob = None
+            if shared is not None:
+                try:
+                    blob = shared.get(key)
+                except Exception as e:
+                    logger.warning(f"Could not read song snapshot {key}: {e}")
+            if blob is None:
+                blob = run_cpu_bound(compress_snapshot, body, encoding)
+                if shared is not None:
+                    try:
+                        shared.set(key, blob, ex=SNAPSHOT_TTL)
+                    except Exception as e:
+                        logger.warning(f"Could not store song snapshot {key}: {e}")
+
+            self._blobs[(kind, encoding)] = (etag, blob)
+            return blob
+
+
+snapshot_blobs = SnapshotBlobs()
+
+
+def snapshot_response(request: Request, kind: str, etag: str, body: bytes) -> Response:
+    """The snapshot ``body`` in the client's preferred encoding, or 304 if it has it already."""
+    encoding = request.accept_encodings.best_match(SNAPSHOT_ENCODINGS)
+    # each encoding is a separate representation with its own strong tag
+    tag = f"{etag}.{encoding}" if encoding else etag
+    if request.if_none_match.contains(tag):
+        response = Response(status=304)
+    elif encoding:
+        response = Response(snapshot_blobs.get(kind, etag, body, encoding), mimetype="application/json")
+        response.headers["Content-Encoding"] = encoding
+    else:
+        response = Response(body, mimetype="application/json")
+    response.set_etag(tag)
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
@@ -0,0 +1,49 @@
+"""Per-user record of the last scoredata.bin that was fully processed.
+
+Players often re-upload the same file; when its SHA-256 matches the digest
+recorded here the upload endpoint answers from the stored summary without
+parsing the file or touching Supabase.
+"""
+
+import hashlib
+import json
+from datetime import datetime, UTC
+from typing import Any, Dict, Optional
+
+UPLOAD_DIGEST_KEY = "scoredata_digest:{user_id}"
+UPLOAD_DIGEST_TTL_SECONDS = 30 * 24 * 60 * 60
+
+
+def scoredata_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def get_processed_upload(redis_client: Any, user_id: str, digest: str) -> Optional[Dict[str, Any]]:
+    """Summary of the last processed upload if its digest is ``digest``."""
+    raw = redis_client.get(UPLOAD_DIGEST_KEY.format(user_id=user_id))
+    if not raw:
+        return None
+    record = json.loads(raw)
+    if record.get("digest") != digest:
+        return None
+    return record.get("summary") or {}
+
+
+def record_processed_upload(
+    redis_client: Any, user_id: str, digest: str, summary: Dict[str, Any]
+) -> None:
+    """Remember ``digest`` as the user's last fully processed upload."""
+    record = {
+        "digest": digest,
+        "summary": {**summary, "processed_at": datetime.now(UTC).isoformat()},
+    }
+    redis_client.set(
+        UPLOAD_DIGEST_KEY.format(user_id=user_id),
+        json.dumps(record),
+        ex=UPLOAD_DIGEST_TTL_SECONDS,
+    )
+
+
+def forget_processed_upload(redis_client: Any, user_id: str) -> None:
+    """Drop the record so the next upload is processed even if identical."""
+    redis_client.delete(UPLOAD_DIGEST_KEY.format(user_id=user_id))
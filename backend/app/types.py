@@ -57,6 +57,16 @@ class LeaderboardUpdate(TypedDict):
     leaderboard: List[LeaderboardEntry]
     last_update: str
 
+class LeaderboardScore(TypedDict):
+    """A user's score for one song, merged server-side by ``merge_leaderboard_scores``."""
+    md5: str
+    score: int
+    percent: float
+    is_fc: bool
+    speed: int
+    play_count: int
+    posted: str
+
 
 class _AchievementCore(TypedDict):
     """Fields present on every achievement definition."""
@@ -85,6 +95,19 @@ class AchievementDef(_AchievementCore, total=False):
     recharts_charter_refs: List[str]
 
 
+class AchievementCounters(TypedDict):
+    """Per-user running counts behind incremental achievement checks (``users.achievement_counters``).
+
+    ``counts`` maps each counting achievement (charter, remix, recharts) to
+    the number of scores that count towards it.
+    """
+    version: str
+    scores: int
+    fcs: int
+    counts: Dict[str, int]
+    evaluated_at: str
+
+
 class AchievementError(TypedDict):
     """Entry of an achievement that failed to evaluate."""
     id: str
@@ -109,6 +132,31 @@ class EloHistoryEntry(TypedDict):
     timestamp: str
 
 
+class PlayerStanding(TypedDict):
+    """A user's place on one ``player_standings`` board (``/api/rankings``)."""
+    user_id: str
+    username: str
+    avatar: Optional[str]
+    value: float
+    rank: int
+    position: int
+
+
+class RankingChange(TypedDict):
+    """A move on the ELO board, from ``ranking_changes`` (``/api/rankings/recent-changes``).
+
+    ``old_*`` is ``None`` for a user new to the board, ``new_*`` for one who left it.
+    """
+    id: int
+    user_id: str
+    username: str
+    old_elo: Optional[float]
+    new_elo: Optional[float]
+    old_rank: Optional[int]
+    new_rank: Optional[int]
+    changed_at: str
+
+
 class UserStats(TypedDict):
     """Aggregate of a user's scores (``users.stats``)."""
     total_scores: int
@@ -129,4 +177,5 @@ class UserRow(TypedDict, total=False):
     scores: List[ScoreEntry]
     unknown_scores: List[ScoreEntry]
     achievements: Dict[str, str]
+    achievement_counters: Optional[AchievementCounters]  # NULL until first evaluated, or after an outside scores write
     last_login: str
@@ -0,0 +1,73 @@
+"""Achievement definitions serialized once, for the achievement endpoints.
+
+The definitions only change with a deploy, so the catalog is encoded (and
+gzipped) a single time and served as bytes under a strong ETag. A user's view
+of it differs only in the ``achieved``/``timestamp`` pair appended to each
+definition: those payloads are spliced together from pre-encoded definition
+fragments and kept in a small LRU keyed by a hash of the user's achievements,
+so users with the same achievements (most commonly none) share one payload.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Mapping, Optional
+
+from .achievement_processor import AchievementProcessor, achievement_processor
+from .payloads import Payload, encode_payload
+
+USER_PAYLOAD_CACHE_SIZE = 512
+
+
+def achievements_key(achievements: Mapping[str, str]) -> str:
+    """Stable hash of a user's ``achievements`` map."""
+    encoded = json.dumps(achievements, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()[:32]
+
+
+class AchievementCatalog:
+    """The processor's definitions as a shared payload plus per-user overlays."""
+
+    def __init__(self, processor: AchievementProcessor, cache_size: int = USER_PAYLOAD_CACHE_SIZE) -> None:
+        definitions = processor.serializable_achievements()
+        self.ids: List[str] = [d["id"] for d in definitions]
+        encoded = [json.dumps(d, separators=(",", ":")) for d in definitions]
+        self.payload = encode_payload(f'{{"achievements":[{",".join(encoded)}]}}'.encode())
+        # each definition with its closing brace removed, ready for the user's fields
+        self._fragments = [e[:-1] for e in encoded]
+        self._not_achieved = [f'{f},"achieved":false,"timestamp":null}}' for f in self._fragments]
+        self._cache_size = cache_size
+        self._user_payloads: "OrderedDict[str, Payload]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def achieved(self, achievements: Optional[Mapping[str, str]]) -> Dict[str, str]:
+        """The user's achievements that are in the catalog."""
+        achievements = achievements or {}
+        return {i: achievements[i] for i in self.ids if i in achievements}
+
+    def user_payload(self, achievements: Optional[Mapping[str, str]]) -> Payload:
+        """The catalog with each definition's ``achieved`` and ``timestamp`` for one user."""
+        achieved = self.achieved(achievements)
+        key = achievements_key(achieved)
+        with self._lock:
+            cached = self._user_payloads.get(key)
+            if cached is not None:
+                self._user_payloads.move_to_end(key)
+                return cached
+
+        parts = [
+            f'{fragment},"achieved":true,"timestamp":{json.dumps(achieved[i])}}}' if i in achieved else not_achieved
+            for i, fragment, not_achieved in zip(self.ids, self._fragments, self._not_achieved)
+        ]
+        payload = encode_payload(f'{{"achievements":[{",".join(parts)}]}}'.encode())
+
+        with self._lock:
+            self._user_payloads[key] = payload
+            self._user_payloads.move_to_end(key)
+            while len(self._user_payloads) > self._cache_size:
+                self._user_payloads.popitem(last=False)
+        return payload
+
+
+achievement_catalog = AchievementCatalog(achievement_processor)
@@ -0,0 +1,149 @@
+"""Per-user score index that achievement checks read instead of the score list.
+
+Each view is built in one pass over the user's scores the first time an
+achievement needs it and then shared by every achievement of that family, so
+a check is a dict lookup or a count over a handful of precomputed values
+rather than a rescan of every score. Views reproduce the semantics of the
+per-score loops they replace, including which malformed inputs raise.
+"""
+
+from collections import Counter
+from functools import cached_property
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+# (highest percent, any FC) over a song's scores
+SongBest = Tuple[float, bool]
+# (previous, current) version of one score; ``None`` on the side it is absent from
+ScoreChange = Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+# the score fields any achievement check reads
+ACHIEVEMENT_SCORE_FIELDS = ("identifier", "score", "percent", "is_fc", "speed", "artist", "song_name", "charter_refs")
+
+
+def achievement_view(score: Dict[str, Any]) -> Dict[str, Any]:
+    """A detached copy of the fields of ``score`` that achievements read."""
+    view = {field: score[field] for field in ACHIEVEMENT_SCORE_FIELDS if field in score}
+    if isinstance(view.get("charter_refs"), list):
+        view["charter_refs"] = list(view["charter_refs"])
+    return view
+
+
+def score_changes(before: Iterable[Dict[str, Any]], after: Iterable[Dict[str, Any]]) -> List[ScoreChange]:
+    """Scores added, removed or changed between two score lists, matched by identifier."""
+    previous = {score.get("identifier"): achievement_view(score) for score in before}
+    changes: List[ScoreChange] = []
+    for score in after:
+        view = achievement_view(score)
+        old = previous.pop(score.get("identifier"), None)
+        if old != view:
+            changes.append((old, view))
+    changes.extend((old, None) for old in previous.values())
+    return changes
+
+
+class ScoreIndex:
+    """Lazily built lookups over one user's ``scores``."""
+
+    def __init__(self, user_data: Dict[str, Any]) -> None:
+        self.scores: List[Dict[str, Any]] = user_data.get("scores", [])
+        self.stats: Dict[str, Any] = user_data.get("stats") or {}
+        self._charter_counts: Dict[FrozenSet[str], int] = {}
+        self._remix_counts: Dict[Tuple[str, ...], int] = {}
+        self._rechart_counts: Dict[FrozenSet[str], int] = {}
+
+    @cached_property
+    def song_best(self) -> Dict[Any, SongBest]:
+        """md5 -> (highest percent, any FC)."""
+        best: Dict[Any, SongBest] = {}
+        for score in self.scores:
+            md5 = score.get("identifier")
+            percent = score.get("percent", 0)
+            is_fc = bool(score.get("is_fc", False))
+            if md5 in best:
+                top, fc = best[md5]
+                best[md5] = (percent if percent > top else top, fc or is_fc)
+            else:
+                best[md5] = (percent, is_fc)
+        return best
+
+    def best_for(self, md5s: Iterable[Any]) -> Tuple[float, bool] | None:
+        """(highest percent, any FC) across ``md5s``, ``None`` if none were played."""
+        found = [self.song_best[md5] for md5 in md5s if md5 in self.song_best]
+        if not found:
+            return None
+        top, fc = found[0]
+        for percent, is_fc in found[1:]:
+            if percent > top:
+                top = percent
+            fc = fc or is_fc
+        return top, fc
+
+    @cached_property
+    def charter_ref_sets(self) -> List[FrozenSet[str]]:
+        """Lowercased charter refs of each score that has any."""
+        return [
+            frozenset(charter.lower() for charter in refs)
+            for refs in (score.get("charter_refs") for score in self.scores)
+            if refs
+        ]
+
+    @cached_property
+    def charter_ref_counts(self) -> Counter[str]:
+        """Lowercased charter ref -> number of scores crediting it."""
+        counts: Counter[str] = Counter()
+        for refs in self.charter_ref_sets:
+            counts.update(refs)
+        return counts
+
+    def charter_count(self, charters: Sequence[str]) -> int:
+        """Number of scores crediting any of ``charters`` (case-insensitive)."""
+        wanted = frozenset(charter.lower() for charter in charters)
+        if len(wanted) == 1:
+            return self.charter_ref_counts[next(iter(wanted))]
+        if wanted not in self._charter_counts:
+            self._charter_counts[wanted] = sum(1 for refs in self.charter_ref_sets if refs & wanted)
+        return self._charter_counts[wanted]
+
+    def rechart_count(self, official_charters: Sequence[str]) -> int:
+        """Number of scores crediting both an official charter and someone else."""
+        official = frozenset(charter.lower() for charter in official_charters)
+        if official not in self._rechart_counts:
+            self._rechart_counts[official] = sum(
+                1 for refs in self.charter_ref_sets if refs & official and refs - official
+            )
+        return self._rechart_counts[official]
+
+    @cached_property
+    def artists(self) -> List[str]:
+        """Each score's lowercased artist."""
+        return [(score.get("artist") or "").lower() for score in self.scores]
+
+    def remix_count(self, remix_artists: Sequence[str]) -> int:
+        """Number of scores whose artist contains any of ``remix_artists``."""
+        key = tuple(remix_artists)
+        if key not in self._remix_counts:
+            needles = [artist.lower() for artist in remix_artists]
+            self._remix_counts[key] = sum(
+                1 for artist in self.artists if any(needle in artist for needle in needles)
+            )
+        return self._remix_counts[key]
+
+    @cached_property
+    def has_fc(self) -> bool:
+        return any(score.get("is_fc", False) for score in self.scores)
+
+    @cached_property
+    def fc_count(self) -> int:
+        return sum(1 for score in self.scores if score.get("is_fc", False))
+
+    @cached_property
+    def score_values(self) -> FrozenSet[Any]:
+        return frozenset(score.get("score") for score in self.scores)
+
+    @cached_property
+    def has_album(self) -> bool:
+        return any("album" in (score.get("song_name") or "").lower() for score in self.scores)
+
+    @cached_property
+    def has_discography(self) -> bool:
+        return any("Discography" in (score.get("song_name") or "") for score in self.scores)
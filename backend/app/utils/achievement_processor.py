@@ -2,13 +2,15 @@
 # AchievementDef is a deliberately heterogeneous total=False TypedDict; check
 # functions subscript family-specific keys by invariant (missing key == a
 # malformed definition and should raise).
+import hashlib
 import json
 import logging
 from datetime import datetime, UTC
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
-from ..types import AchievementDef, AchievementError
+from ..types import AchievementCounters, AchievementDef, AchievementError
+from .achievement_index import ScoreChange, ScoreIndex
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +48,7 @@ class AchievementProcessor:
         self.achievements: List[AchievementDef] = []
         self.achievement_songs: Dict[str, Any] = self._load_achievement_songs()
         self._initialize_achievements()
+        self._compile_incremental()
 
     def _load_achievement_songs(self) -> Dict[str, Any]:
         """Load achievement song definitions from JSON file"""
@@ -288,175 +291,64 @@ class AchievementProcessor:
                 "requires_fc": rank == 4
             })
     
-    def _check_first_score(self, user_data: Any, _achievement_def: AchievementDef) -> bool:
+    def _check_first_score(self, index: ScoreIndex, _achievement_def: AchievementDef) -> bool:
         """Check if user has at least one score"""
-        if isinstance(user_data, list):
-            user_data = user_data[0] if user_data else {}
-            
-        return len(user_data.get("scores", [])) > 0
+        return len(index.scores) > 0
     
-    def _check_total_score(self, user_data: Any, achievement_def: AchievementDef) -> bool:
+    def _check_total_score(self, index: ScoreIndex, achievement_def: AchievementDef) -> bool:
         """Check if user's total score meets threshold"""
-        if isinstance(user_data, list):
-            user_data = user_data[0] if user_data else {}
-
-        total_score = (user_data.get("stats") or {}).get("total_score", 0)
-        return total_score >= achievement_def["threshold"]
+        return index.stats.get("total_score", 0) >= achievement_def["threshold"]
     
-    def _check_first_fc(self, user_data: Any, _achievement_def: AchievementDef) -> bool:
+    def _check_first_fc(self, index: ScoreIndex, _achievement_def: AchievementDef) -> bool:
         """Check if user has at least one FC"""
-        if isinstance(user_data, list):
-            user_data = user_data[0] if user_data else {}
-            
-        scores = user_data.get("scores", [])
-        for score in scores:
-            if score.get("is_fc", False):
-                return True
-        return False
+        return index.has_fc
     
-    def _check_total_fcs(self, user_data: Any, achievement_def: AchievementDef) -> bool:
+    def _check_total_fcs(self, index: ScoreIndex, achievement_def: AchievementDef) -> bool:
         """Check if user's FC count meets threshold"""
-        if isinstance(user_data, list):
-            user_data = user_data[0] if user_data else {}
-            
-        total_fcs = (user_data.get("stats") or {}).get("total_fcs", 0)
-        return total_fcs >= achievement_def["threshold"]
+        return index.stats.get("total_fcs", 0) >= achievement_def["threshold"]
     
-    def _check_charter_count(self, user_data: Any, achievement_def: AchievementDef) -> bool:
+    def _check_charter_count(self, index: ScoreIndex, achievement_def: AchievementDef) -> bool:
         """Check if user has played enough charts from specified charters using charter_refs"""
-        if isinstance(user_data, list):
-            user_data = user_data[0] if user_data else {}
-            
-        charter_refs = achievement_def["charter_refs"]
-        charter_refs_lower = [charter.lower() for charter in charter_refs]
-        threshold = achievement_def["threshold"]
-        
-        count = 0
-        scores = user_data.get("scores", [])
-        
-        for score in scores:
-            score_charter_refs = score.get("charter_refs", [])
-            if not score_charter_refs:
-                continue
-                
-            score_charter_refs_lower = [charter.lower() for charter in score_charter_refs]
-            has_match = any(charter_lower in score_charter_refs_lower for charter_lower in charter_refs_lower)
-            
-            if has_match:
-                count += 1
-        
-        return count >= threshold
+        return index.charter_count(achievement_def["charter_refs"]) >= achievement_def["threshold"]
     
-    def _check_remix_count(self, user_data: Any, achievement_def: AchievementDef) -> bool:
+    def _check_remix_count(self, index: ScoreIndex, achievement_def: AchievementDef) -> bool:
         """Check if user has played enough remix charts"""
-        if isinstance(user_data, list):
-            user_data = user_data[0] if user_data else {}
-
-        remix_artists = achievement_def["remix_artists"]
-        threshold = achievement_def["threshold"]
-        
-        count = 0
-        scores = user_data.get("scores", [])
-        for score in scores:
-            artist = (score.get("artist") or "").lower()
-            if any(remix_artist.lower() in artist for remix_artist in remix_artists):
-                count += 1
-        
-        return count >= threshold
+        return index.remix_count(achievement_def["remix_artists"]) >= achievement_def["threshold"]
     
-    def _check_recharts_count(self, user_data: Any, achievement_def: AchievementDef) -> bool:
-        """Check if user has played enough recharts from official games"""
-        if isinstance(user_data, list):
-            user_data = user_data[0] if user_data else {}
-            
-        recharts_charter_refs = achievement_def["recharts_charter_refs"]
-        recharts_charter_refs_lower = [charter.lower() for charter in recharts_charter_refs]
-        threshold = achievement_def["threshold"]
-        
-        count = 0
-        scores = user_data.get("scores", [])
-        
-        for score in scores:
-            score_charter_refs = score.get("charter_refs")
-            if not score_charter_refs:
-                continue
+    def _check_recharts_count(self, index: ScoreIndex, achievement_def: AchievementDef) -> bool:
+        """Check if user has played enough recharts from official games
 
-            score_charter_refs_lower = [charter.lower() for charter in score_charter_refs]
-
-            # Check if at least one charter ref is in the official recharts list
-            # AND at least one charter ref is not in that list (meaning it's a rechart)
-            has_official_charter = any(charter_lower in recharts_charter_refs_lower for charter_lower in score_charter_refs_lower)
-            has_community_charter = any(charter_lower not in recharts_charter_refs_lower for charter_lower in score_charter_refs_lower)
-            
-            if has_official_charter and has_community_charter:
-                count += 1
-        
-        return count >= threshold
+        a rechart credits at least one official charter and at least one other
+        """
+        return index.rechart_count(achievement_def["recharts_charter_refs"]) >= achievement_def["threshold"]
     
-    def _check_funny_number(self, user_data: Any, achievement_def: AchievementDef) -> bool:
+    def _check_funny_number(self, index: ScoreIndex, achievement_def: AchievementDef) -> bool:
         """Check if user has a score of exactly 69,420"""
-        if isinstance(user_data, list):
-            user_data = user_data[0] if user_data else {}
-            
-        target_score = achievement_def.get("score", 69420)
-        scores = user_data.get("scores", [])
-        for score in scores:
-            if score.get("score") == target_score:
-                return True
-        return False
+        return achievement_def.get("score", 69420) in index.score_values
     
-    def _check_album(self, user_data: Any, _achievement_def: AchievementDef) -> bool:
+    def _check_album(self, index: ScoreIndex, _achievement_def: AchievementDef) -> bool:
         """Check if user has played an album chart"""
-        if isinstance(user_data, list):
-            user_data = user_data[0] if user_data else {}
-            
-        scores = user_data.get("scores", [])
-        for score in scores:
-            song_name: str = score.get("song_name") or ""
-            if song_name.lower().find("album") != -1:
-                return True
-        
-        return False
+        return index.has_album
     
-    def _check_discography(self, user_data: Any, _achievement_def: AchievementDef) -> bool:
+    def _check_discography(self, index: ScoreIndex, _achievement_def: AchievementDef) -> bool:
         """Check if user has played a discography chart"""
-        if isinstance(user_data, list):
-            user_data = user_data[0] if user_data else {}
-            
-        scores = user_data.get("scores", [])
-        for score in scores:
-            song_name = score.get("song_name") or ""
-            if "Discography" in song_name:
-                return True
-        
-        return False
+        return index.has_discography
     
-    def _check_song_achievement(self, user_data: Any, achievement_def: AchievementDef) -> bool:
+    def _check_song_achievement(self, index: ScoreIndex, achievement_def: AchievementDef) -> bool:
         """Check if user has achieved a specific threshold on a song"""
-        if isinstance(user_data, list):
-            user_data = user_data[0] if user_data else {}
-            
-        scores = user_data.get("scores", [])
         song_md5s = achievement_def["song_md5"]
         
         if not isinstance(song_md5s, list):
             song_md5s = [song_md5s]
         
-        best_score = None
-        for score in scores:
-            if score.get("identifier") in song_md5s:
-                if (best_score is None or 
-                    (achievement_def["requires_fc"] and score.get("is_fc", False)) or
-                    (not achievement_def["requires_fc"] and score.get("percent", 0) > best_score.get("percent", 0))):
-                    best_score = score
-        
-        if best_score:
-            if achievement_def["requires_fc"] and best_score.get("is_fc", False):
-                return True
-            elif not achievement_def["requires_fc"] and best_score.get("percent", 0) >= achievement_def["threshold"]:
-                return True
-            
-        return False
+        best = index.best_for(song_md5s)
+        if best is None:
+            return False
+
+        percent, is_fc = best
+        if achievement_def["requires_fc"]:
+            return is_fc
+        return percent >= achievement_def["threshold"]
     
     def serializable_achievements(self) -> List[Dict[str, Any]]:
         """Return achievement definitions as JSON-serializable dicts.
@@ -511,24 +403,34 @@ class AchievementProcessor:
                 - Dict: Maps achievement ID to timestamp of achievement
                 - List[Dict]: List of errors encountered during processing, each with 'id' and 'error'
         """
-        user_achievements = {}
-        achievement_errors = []
-        current_time = datetime.now(UTC).isoformat()
-        
         if isinstance(user_data, list):
             user_data = user_data[0] if user_data else {}
-        
+
+        index = ScoreIndex(user_data)
+        return self._evaluate(user_data, self.achievements, lambda a: a["check_function"](index, a))
+
+    def _evaluate(
+        self,
+        user_data: Dict[str, Any],
+        candidates: Sequence[AchievementDef],
+        check: Callable[[AchievementDef], bool],
+    ) -> Tuple[Dict[str, str], List[AchievementError]]:
+        """Keep the user's earned achievements and ``check`` the unearned ``candidates``."""
+        current_time = datetime.now(UTC).isoformat()
         existing_achievements = user_data.get("achievements", {}) or {}
-        
-        for achievement_def in self.achievements:
+        user_achievements = {
+            a["id"]: existing_achievements[a["id"]]
+            for a in self.achievements if a["id"] in existing_achievements
+        }
+        achievement_errors: List[AchievementError] = []
+
+        for achievement_def in candidates:
             achievement_id = achievement_def["id"]
-            if achievement_id in existing_achievements:
-                user_achievements[achievement_id] = existing_achievements[achievement_id]
+            if achievement_id in user_achievements:
                 continue
-            
+
             try:
-                check_function = achievement_def["check_function"]
-                if check_function(user_data, achievement_def):
+                if check(achievement_def):
                     user_achievements[achievement_id] = current_time
             except Exception as e:
                 logger.error(f"Error processing achievement '{achievement_id}' for user {user_data.get('id', 'unknown')}: {str(e)}", exc_info=True)
@@ -537,7 +439,141 @@ class AchievementProcessor:
                     "name": achievement_def.get("name", "Unknown Achievement"),
                     "error": "Failed to evaluate this achievement"
                 })
-    
+
         return user_achievements, achievement_errors
 
-achievement_processor = AchievementProcessor() 
\ No newline at end of file
+    def _compile_incremental(self) -> None:
+        """Index the definitions for :meth:`process_achievements_incremental`."""
+        self._counted: Dict[Any, Callable[[ScoreIndex, AchievementDef], int]] = {
+            self._check_charter_count: lambda index, a: index.charter_count(a["charter_refs"]),
+            self._check_remix_count: lambda index, a: index.remix_count(a["remix_artists"]),
+            self._check_recharts_count: lambda index, a: index.rechart_count(a["recharts_charter_refs"]),
+        }
+        self._song_achievements: Dict[str, List[AchievementDef]] = {}
+        self._general_achievements: List[AchievementDef] = []
+        for achievement in self.achievements:
+            if achievement["check_function"] == self._check_song_achievement:
+                md5s = achievement["song_md5"]
+                for md5 in md5s if isinstance(md5s, list) else [md5s]:
+                    self._song_achievements.setdefault(md5, []).append(achievement)
+            else:
+                self._general_achievements.append(achievement)
+
+        # counters (and "not yet earned" results) from other definitions can't be reused
+        self.counters_version = hashlib.sha256(
+            json.dumps(self.serializable_achievements(), sort_keys=True, default=str).encode()
+        ).hexdigest()[:16]
+
+    def achievement_counters(self, index: ScoreIndex) -> AchievementCounters:
+        """Counters for the scores in ``index``, to persist alongside the achievements."""
+        return {
+            "version": self.counters_version,
+            "scores": len(index.scores),
+            "fcs": index.fc_count,
+            "counts": {
+                a["id"]: count(index, a)
+                for a in self._general_achievements
+                for check, count in self._counted.items() if a["check_function"] == check
+            },
+            "evaluated_at": datetime.now(UTC).isoformat(),
+        }
+
+    def _advance_counters(
+        self, counters: AchievementCounters, changes: Sequence[ScoreChange], num_scores: int
+    ) -> Optional[AchievementCounters]:
+        """``counters`` moved past ``changes``; ``None`` if they don't describe the scores before them."""
+        if counters.get("version") != self.counters_version:
+            return None
+        removed = ScoreIndex({"scores": [old for old, _ in changes if old is not None]})
+        added = ScoreIndex({"scores": [new for _, new in changes if new is not None]})
+        if counters["scores"] - len(removed.scores) + len(added.scores) != num_scores:
+            return None
+
+        counts = dict(counters["counts"])
+        for a in self._general_achievements:
+            count = self._counted.get(a["check_function"])
+            if count is not None:
+                counts[a["id"]] = counts.get(a["id"], 0) - count(removed, a) + count(added, a)
+        return {
+            "version": self.counters_version,
+            "scores": num_scores,
+            "fcs": counters["fcs"] - removed.fc_count + added.fc_count,
+            "counts": counts,
+            "evaluated_at": datetime.now(UTC).isoformat(),
+        }
+
+    def process_achievements_incremental(
+        self,
+        user_data: Dict[str, Any],
+        changes: Sequence[ScoreChange],
+        counters: Optional[AchievementCounters],
+    ) -> Tuple[Dict[str, str], List[AchievementError], AchievementCounters]:
+        """
+        Like :meth:`process_achievements`, re-checking only what ``changes`` can affect.
+
+        Args:
+            user_data: Dict containing the user's current scores, stats and achievements
+            changes: (previous, current) versions of each score added, changed or removed
+                since ``counters`` were computed
+            counters: The user's persisted counters, or ``None``
+
+        An achievement not yet earned can only become earned through a changed
+        score: song and special achievements are checked against the changed
+        scores alone, counting achievements against the advanced counters, and
+        stats thresholds as usual. Without usable counters (missing, from other
+        definitions, or not matching the scores) this is a full evaluation.
+
+        Returns:
+            Tuple of the achievements, the errors and the counters to persist
+        """
+        advanced = self._advance_counters(counters, changes, len(user_data.get("scores", []))) if counters else None
+        if advanced is None:
+            achievements, errors = self.process_achievements(user_data)
+            return achievements, errors, self.achievement_counters(ScoreIndex(user_data))
+
+        full = ScoreIndex(user_data)
+        changed = ScoreIndex({"scores": [new for _, new in changes if new is not None]})
+        candidates = list(self._general_achievements)
+        seen = set()
+        for score in changed.scores:
+            for achievement in self._song_achievements.get(score.get("identifier", ""), []):
+                if achievement["id"] not in seen:
+                    seen.add(achievement["id"])
+                    candidates.append(achievement)
+
+        def check(a: AchievementDef) -> bool:
+            check_function = a["check_function"]
+            if check_function in self._counted:
+                return advanced["counts"].get(a["id"], 0) >= a["threshold"]
+            if check_function == self._check_first_score:
+                return advanced["scores"] > 0
+            if check_function == self._check_first_fc:
+                return advanced["fcs"] > 0
+            if check_function in (self._check_total_score, self._check_total_fcs):
+                return check_function(full, a)
+            return check_function(changed, a)
+
+        achievements, errors = self._evaluate(user_data, candidates, check)
+        return achievements, errors, advanced
+
+achievement_processor = AchievementProcessor() 
+
+
+def process_user_achievements(user_data: Any) -> Tuple[Dict[str, str], List[AchievementError]]:
+    """Module-level entry point to :meth:`AchievementProcessor.process_achievements`.
+
+    Picklable, so it can run in the CPU pool (see ``services/cpu_pool.py``).
+    """
+    return achievement_processor.process_achievements(user_data)
+
+
+def process_user_achievements_incremental(
+    user_data: Dict[str, Any],
+    changes: Sequence[ScoreChange],
+    counters: Optional[AchievementCounters],
+) -> Tuple[Dict[str, str], List[AchievementError], AchievementCounters]:
+    """Module-level entry point to :meth:`AchievementProcessor.process_achievements_incremental`.
+
+    Picklable, so it can run in the CPU pool.
+    """
+    return achievement_processor.process_achievements_incremental(user_data, changes, counters)
@@ -2,7 +2,7 @@ import os
 import base64
 import jwt
 from functools import wraps
-from typing import Callable, Concatenate, ParamSpec
+from typing import Callable, Concatenate, Optional, ParamSpec
 from flask import request, jsonify
 from ..config import Config
 from ..types import FlaskResponse
@@ -44,6 +44,28 @@ def allowed_file(filename: str) -> bool:
     """
     return "." in filename and filename.rsplit(".", 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
+def int_arg(name: str, default: Optional[int] = None) -> Optional[int]:
+    """
+    reads a non-negative integer query arg
+
+    params:
+        name (str): query arg name
+        default (int, optional): value when the arg is absent or empty
+
+    returns:
+        int: the parsed value, or ``default``
+
+    raises:
+        ValueError: the arg is not a non-negative integer
+    """
+    value = request.args.get(name)
+    if value is None or value == "":
+        return default
+    parsed = int(value)
+    if parsed < 0:
+        raise ValueError(name)
+    return parsed
+
 def token_required(f: AuthedView[P]) -> View[P]:
     """Require a valid Bearer JWT; injects user_id as the first argument."""
     @wraps(f)
@@ -1,8 +1,37 @@
+from bisect import bisect_right
 from datetime import datetime, UTC
-from typing import List
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from ..types import LeaderboardEntry
 
+SortKey = Tuple[float, ...]
+
+
+def leaderboard_sort_key(entry: LeaderboardEntry) -> SortKey:
+    """
+    the key entries are ranked by, highest first
+
+    full speed (>= 100) plays rank above slowed ones and are ordered by score,
+    then speed; slowed plays by speed, then score. ties go to the earlier post,
+    and an entry without a (valid) posted date counts as posted now.
+    """
+    speed = entry.get("speed", 0)
+    score = entry.get("score", 0)
+    posted = entry.get("posted", "")
+
+    if posted:
+        try:
+            posted_date = datetime.fromisoformat(posted)
+        except ValueError:
+            posted_date = datetime.now(UTC)
+    else:
+        posted_date = datetime.now(UTC)
+
+    if speed < 100:
+        return (0, speed, score, -posted_date.timestamp())
+    else:
+        return (1, score, speed, -posted_date.timestamp())
+
 
 def sort_and_rank_leaderboard(leaderboard: List[LeaderboardEntry]) -> List[LeaderboardEntry]:
     """
@@ -14,27 +43,76 @@ def sort_and_rank_leaderboard(leaderboard: List[LeaderboardEntry]) -> List[Leade
     returns:
         list: sorted and ranked leaderboard
     """
-    def sort_key(entry: LeaderboardEntry) -> tuple:
-        speed = entry.get("speed", 0)
-        score = entry.get("score", 0)
-        posted = entry.get("posted", "")
-
-        if posted:
-            try:
-                posted_date = datetime.fromisoformat(posted)
-            except ValueError:
-                posted_date = datetime.now(UTC)
-        else:
-            posted_date = datetime.now(UTC)
-
-        if speed < 100:
-            return (0, speed, score, -posted_date.timestamp())
-        else:
-            return (1, score, speed, -posted_date.timestamp())
-
-    sorted_leaderboard = sorted(leaderboard, key=sort_key, reverse=True)
+    sorted_leaderboard = sorted(leaderboard, key=leaderboard_sort_key, reverse=True)
 
     for i, entry in enumerate(sorted_leaderboard, 1):
         entry["rank"] = i
 
     return sorted_leaderboard
+
+
+def _is_ranked(entries: List[LeaderboardEntry]) -> bool:
+    return all(entry.get("rank") == i for i, entry in enumerate(entries, 1))
+
+
+class RankedLeaderboard:
+    """
+    a leaderboard kept in rank order for incremental updates
+
+    each entry's sort key is computed at most once and cached, entries are
+    placed with a binary search, and only ranks between the old and new
+    position are renumbered. a list that is already ranked 1..n in order (as
+    read from leaderboard_ranked or returned by a previous merge) is used as-is,
+    so only the O(log n) entries the search probes ever have their posted date
+    parsed. ties keep the order sort_and_rank_leaderboard gives them: a new or
+    moved entry goes after existing entries with an equal key.
+    """
+
+    def __init__(self, entries: List[LeaderboardEntry]) -> None:
+        self._keys: Dict[int, SortKey] = {}
+        if _is_ranked(entries):
+            self.entries = entries
+        else:
+            keyed = [(self._negated_key(entry), entry) for entry in entries]
+            # stable sort on the negated key == sorted(..., reverse=True) on the key
+            keyed.sort(key=lambda pair: pair[0])
+            self.entries = [entry for _, entry in keyed]
+            for i, entry in enumerate(self.entries, 1):
+                entry["rank"] = i
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[LeaderboardEntry]:
+        return iter(self.entries)
+
+    def _negated_key(self, entry: LeaderboardEntry) -> SortKey:
+        key = self._keys.get(id(entry))
+        if key is None:
+            key = tuple(-part for part in leaderboard_sort_key(entry))
+            self._keys[id(entry)] = key
+        return key
+
+    def index_of(self, user_id: str) -> Optional[int]:
+        """position of ``user_id``'s entry, found without computing any keys"""
+        return next((i for i, e in enumerate(self.entries) if e["user_id"] == user_id), None)
+
+    def upsert(self, entry: LeaderboardEntry) -> int:
+        """
+        puts ``entry`` in place of its user's current entry, if any
+
+        returns the entry's new rank
+        """
+        old_index = self.index_of(entry["user_id"])
+        if old_index is not None:
+            self._keys.pop(id(self.entries.pop(old_index)), None)
+
+        index = bisect_right(self.entries, self._negated_key(entry), key=self._negated_key)
+        self.entries.insert(index, entry)
+
+        start = index if old_index is None else min(index, old_index)
+        end = len(self.entries) - 1 if old_index is None else max(index, old_index)
+        for i in range(start, end + 1):
+            self.entries[i]["rank"] = i + 1
+
+        return index + 1
@@ -1,9 +1,9 @@
-"""Chunked writes to ``songs_new.leaderboard`` with exponential backoff."""
+"""Chunked leaderboard writes with exponential backoff."""
 
 import logging
-from typing import Any, Callable, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from ..types import LeaderboardUpdate
+from ..types import LeaderboardScore, LeaderboardUpdate
 
 LEADERBOARD_CHUNK_SIZE = 100
 STATEMENT_TIMEOUT_CODE = "57014"
@@ -25,10 +25,13 @@ def push_leaderboard_updates(
     chunk_size: int,
     logger: logging.Logger,
     on_progress: Optional[Callable[[int], None]] = None,
+    on_written: Optional[Callable[[List[LeaderboardUpdate]], None]] = None,
 ) -> List[LeaderboardUpdate]:
     """Write ``updates`` to songs_new via the bulk_update_leaderboards RPC.
 
-    Timeouts are retried in halves. Failures are non-blocking.
+    ``on_written`` is called with each chunk once it is stored (the Redis
+    mirror hooks in here). Timeouts are retried in halves. Failures are
+    non-blocking.
     """
     failed: List[LeaderboardUpdate] = []
 
@@ -52,7 +55,7 @@ def push_leaderboard_updates(
                 )
                 failed.extend(
                     push_leaderboard_updates(
-                        supabase, chunk, max(1, len(chunk) // 2), logger, on_progress
+                        supabase, chunk, max(1, len(chunk) // 2), logger, on_progress, on_written
                     )
                 )
             else:
@@ -63,7 +66,68 @@ def push_leaderboard_updates(
                 failed.extend(chunk)
             continue
 
+        if on_written:
+            on_written(chunk)
         if on_progress:
             on_progress(len(chunk))
 
     return failed
+
+
+def merge_leaderboard_scores(
+    supabase: Any,
+    user_id: str,
+    username: str,
+    scores: List[LeaderboardScore],
+    chunk_size: int,
+    logger: logging.Logger,
+    on_progress: Optional[Callable[[int], None]] = None,
+    on_merged: Optional[Callable[[List[LeaderboardScore], List[Dict[str, Any]]], None]] = None,
+) -> Tuple[Dict[str, Optional[int]], List[LeaderboardScore]]:
+    """Merge ``scores`` into their leaderboards via the merge_leaderboard_scores RPC.
+
+    Only the compact scores go over the wire; the database merges and re-ranks
+    each leaderboard. Returns ``(ranks, failed)`` where ``ranks`` maps each md5
+    known to songs_new to the user's rank after the merge. ``on_merged`` is
+    called with each stored chunk and the rows the RPC returned for it.
+    Timeouts are retried in halves. Failures are non-blocking.
+    """
+    ranks: Dict[str, Optional[int]] = {}
+    failed: List[LeaderboardScore] = []
+
+    for i in range(0, len(scores), chunk_size):
+        chunk = scores[i:i + chunk_size]
+
+        try:
+            result = supabase.rpc(
+                "merge_leaderboard_scores",
+                {"p_user_id": str(user_id), "p_username": username, "p_scores": chunk},
+            ).execute()
+        except Exception as e:
+            if is_statement_timeout(e) and len(chunk) > 1:
+                logger.warning(
+                    f"Leaderboard merge chunk of {len(chunk)} timed out, retrying in halves"
+                )
+                chunk_ranks, chunk_failed = merge_leaderboard_scores(
+                    supabase, user_id, username, chunk,
+                    max(1, len(chunk) // 2), logger, on_progress, on_merged,
+                )
+                ranks.update(chunk_ranks)
+                failed.extend(chunk_failed)
+            else:
+                logger.error(
+                    f"Error merging leaderboards for {len(chunk)} song(s): {str(e)}",
+                    exc_info=True,
+                )
+                failed.extend(chunk)
+            continue
+
+        merged = result.data or []
+        for row in merged:
+            ranks[row["md5"]] = row.get("rank")
+        if on_merged:
+            on_merged(chunk, merged)
+        if on_progress:
+            on_progress(len(chunk))
+
+    return ranks, failed
@@ -0,0 +1,40 @@
+"""Pre-encoded JSON response bodies.
+
+A :class:`Payload` is a body encoded and gzipped once, with a strong ETag, so
+endpoints serving the same bytes to many clients (the achievement catalog,
+song extras) skip serializing and compressing per request.
+"""
+
+import gzip
+import hashlib
+from typing import NamedTuple
+
+from flask import Request, Response
+
+
+class Payload(NamedTuple):
+    """An encoded JSON body with its gzipped form and strong ETag."""
+    body: bytes
+    gzipped: bytes
+    etag: str
+
+
+def encode_payload(body: bytes) -> Payload:
+    return Payload(body, gzip.compress(body, 9), hashlib.sha256(body).hexdigest()[:32])
+
+
+def send_payload(request: Request, payload: Payload) -> Response:
+    """``payload`` as a response: 304 on a matching If-None-Match, gzip when accepted."""
+    gzipped = bool(request.accept_encodings["gzip"])
+    # each encoding is its own representation, so it gets its own strong tag
+    etag = f"{payload.etag}-gz" if gzipped else payload.etag
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif gzipped:
+        response = Response(payload.gzipped, mimetype="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(payload.body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
@@ -1,8 +1,10 @@
 from datetime import datetime, UTC
-from typing import Any, Dict, List, Mapping, Optional, Tuple, cast
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, Union, cast
 
-from ..types import LeaderboardEntry, LeaderboardUpdate
-from .leaderboard import sort_and_rank_leaderboard
+from ..types import LeaderboardEntry, LeaderboardScore, LeaderboardUpdate
+from .leaderboard import RankedLeaderboard
+
+DRUMS_INSTRUMENT = 9
 
 
 def evaluate_score_update(
@@ -24,28 +26,77 @@ def evaluate_score_update(
     return False
 
 
+def score_fingerprint(score: Mapping[str, Any]) -> Tuple[Any, Any]:
+    """The ``(score, play_count)`` pair that decides whether a score changed."""
+    return score.get("score"), score.get("play_count", 0)
+
+
+def select_changed_songs(
+    songs: Iterable[Dict[str, Any]],
+    existing_known: Mapping[str, Mapping[str, Any]],
+    existing_unknown: Mapping[str, Mapping[str, Any]],
+) -> List[Dict[str, Any]]:
+    """Keep only parsed songs that need to go through the fetch/merge/push pipeline.
+
+    A song is skipped only when its drums ``(score, play_count)`` matches the
+    fingerprint stored in ``scores`` and that score has a rank. A missing rank
+    means an earlier leaderboard push failed, so the song is retried. Songs
+    stored only in ``unknown_scores`` are always kept, since their md5 may
+    have been added to ``songs_new`` since.
+    """
+    changed: List[Dict[str, Any]] = []
+    for song in songs:
+        drums = [s for s in song["scores"] if s["instrument"] == DRUMS_INSTRUMENT]
+        if not drums:
+            continue
+        stored = existing_known.get(song["identifier"])
+        if (
+            stored is not None
+            and stored.get("rank") is not None
+            and all((s["score"], song["play_count"]) == score_fingerprint(stored) for s in drums)
+        ):
+            continue
+        changed.append(song)
+    return changed
+
+
+def to_leaderboard_score(md5: str, entry: Mapping[str, Any]) -> LeaderboardScore:
+    """The compact form of a leaderboard ``entry`` sent to merge_leaderboard_scores."""
+    return {
+        "md5": md5,
+        "score": entry["score"],
+        "percent": entry["percent"],
+        "is_fc": entry["is_fc"],
+        "speed": entry["speed"],
+        "play_count": entry["play_count"],
+        "posted": entry["posted"],
+    }
+
+
 def apply_score_to_leaderboard(
-    leaderboard: List[LeaderboardEntry], entry: Mapping[str, Any], user_id: str | int
+    leaderboard: Union[List[LeaderboardEntry], RankedLeaderboard],
+    entry: Mapping[str, Any],
+    user_id: str | int,
 ) -> Tuple[List[LeaderboardEntry], bool]:
-    """Fold ``entry`` for ``user_id`` into ``leaderboard``."""
+    """Fold ``entry`` for ``user_id`` into ``leaderboard``.
+
+    The entry is placed by binary search (see :class:`RankedLeaderboard`)
+    rather than by re-sorting the whole leaderboard.
+    """
     user_id = str(user_id)
-    user_entry = next((e for e in leaderboard if e["user_id"] == user_id), None)
+    entries = leaderboard.entries if isinstance(leaderboard, RankedLeaderboard) else leaderboard
+    user_entry = next((e for e in entries if e["user_id"] == user_id), None)
 
     should_update = evaluate_score_update(entry, user_entry)
     if not should_update and user_entry is not None and user_entry.get("posted", "") == "":
         should_update = True
 
     if not should_update:
-        return leaderboard, False
-
-    if user_entry is not None:
-        try:
-            leaderboard.remove(user_entry)
-        except ValueError:
-            pass
-    leaderboard.append(cast(LeaderboardEntry, entry))
-    leaderboard = sort_and_rank_leaderboard(leaderboard)
-    return leaderboard, True
+        return entries, False
+
+    board = leaderboard if isinstance(leaderboard, RankedLeaderboard) else RankedLeaderboard(leaderboard)
+    board.upsert(cast(LeaderboardEntry, entry))
+    return board.entries, True
 
 
 def merge_unknown_scores(
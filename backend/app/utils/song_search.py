@@ -0,0 +1,183 @@
+"""In-memory inverted index for song search.
+
+Songs are indexed by the trigrams of their name, artist, album and charter
+refs, so finding the songs that contain a query term is an intersection of a
+few posting sets instead of a scan over the catalog. Terms shorter than a
+trigram are matched as token prefixes, except short ones with punctuation
+(``&``, ``/``), which are not part of any token and are matched as substrings
+of the songs the other terms found. Matches are ranked by where the terms
+hit (whole-field and prefix matches on the name first), then by popularity.
+"""
+
+import bisect
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+Song = Dict[str, Any]
+
+# searched fields and how much a hit in each counts towards the rank
+SEARCH_FIELDS = ("name", "artist", "album", "charter_refs")
+FIELD_WEIGHTS = (8, 4, 2, 1)
+# ranked results kept per query, so paging through them doesn't re-rank
+RESULT_CACHE_SIZE = 64
+
+_TOKEN = re.compile(r"\w+")
+
+
+def normalize(text: Any) -> str:
+    """Casefolded ``text`` with runs of whitespace collapsed."""
+    return " ".join(str(text).casefold().split()) if text else ""
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _field_texts(song: Song) -> Tuple[str, ...]:
+    texts = []
+    for field in SEARCH_FIELDS:
+        value = song.get(field)
+        texts.append(normalize(" ".join(v for v in value if v) if isinstance(value, list) else value))
+    return tuple(texts)
+
+
+class SongSearchIndex:
+    """Trigram and token postings over a set of songs keyed by id."""
+
+    def __init__(self) -> None:
+        self.songs: Dict[Any, Song] = {}
+        self._texts: Dict[Any, Tuple[str, ...]] = {}
+        self._grams: Dict[str, Set[Any]] = {}
+        self._tokens: Dict[str, Set[Any]] = {}
+        self._sorted_tokens: Optional[List[str]] = None
+        self._results: "OrderedDict[str, List[Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.songs)
+
+    def _keys(self, texts: Tuple[str, ...]) -> Tuple[Set[str], Set[str]]:
+        grams: Set[str] = set()
+        tokens: Set[str] = set()
+        for text in texts:
+            grams |= trigrams(text)
+            tokens.update(_TOKEN.findall(text))
+        return grams, tokens
+
+    def upsert(self, song: Song) -> None:
+        """Index ``song``, replacing any earlier version with the same id."""
+        song_id = song["id"]
+        self.remove(song_id)
+        self._results.clear()
+        texts = _field_texts(song)
+        grams, tokens = self._keys(texts)
+        for gram in grams:
+            self._grams.setdefault(gram, set()).add(song_id)
+        for token in tokens:
+            if token not in self._tokens:
+                self._tokens[token] = set()
+                self._sorted_tokens = None
+            self._tokens[token].add(song_id)
+        self.songs[song_id] = song
+        self._texts[song_id] = texts
+
+    def remove(self, song_id: Any) -> None:
+        texts = self._texts.pop(song_id, None)
+        if texts is None:
+            return
+        self._results.clear()
+        del self.songs[song_id]
+        grams, tokens = self._keys(texts)
+        for postings, keys in ((self._grams, grams), (self._tokens, tokens)):
+            for key in keys:
+                ids = postings[key]
+                ids.discard(song_id)
+                if not ids:
+                    del postings[key]
+                    if postings is self._tokens:
+                        self._sorted_tokens = None
+
+    def _prefixed(self, prefix: str) -> Set[Any]:
+        """Songs with a token starting with ``prefix``."""
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self._tokens)
+        found: Set[Any] = set()
+        i = bisect.bisect_left(self._sorted_tokens, prefix)
+        while i < len(self._sorted_tokens) and self._sorted_tokens[i].startswith(prefix):
+            found |= self._tokens[self._sorted_tokens[i]]
+            i += 1
+        return found
+
+    def _indexed(self, term: str) -> bool:
+        """Whether ``term`` can be found through the postings."""
+        return len(term) >= 3 or _TOKEN.fullmatch(term) is not None
+
+    def _candidates(self, term: str) -> Set[Any]:
+        if len(term) < 3:
+            return self._prefixed(term)
+        postings = sorted((self._grams.get(gram, set()) for gram in trigrams(term)), key=len)
+        found = set(postings[0])
+        for ids in postings[1:]:
+            if not found:
+                break
+            found &= ids
+        # trigrams can all be present without the term itself
+        return {song_id for song_id in found if any(term in text for text in self._texts[song_id])}
+
+    def _rank(self, song_id: Any, query: str, terms: Iterable[str]) -> int:
+        texts = self._texts[song_id]
+        rank = 0
+        for text, weight in zip(texts, FIELD_WEIGHTS):
+            if text == query:
+                rank += 100 * weight
+            elif text.startswith(query):
+                rank += 30 * weight
+            for term in terms:
+                if text.startswith(term) or f" {term}" in text:
+                    rank += 2 * weight
+                elif term in text:
+                    rank += weight
+        return rank
+
+    def search(self, query: str, offset: int = 0, limit: int = 50) -> Tuple[List[Song], int]:
+        """Songs matching every term of ``query``, best first, and the number of matches."""
+        query = normalize(query)
+        ranked = self._results.get(query)
+        if ranked is None:
+            ranked = self._ranked(query)
+            self._results[query] = ranked
+            if len(self._results) > RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+        else:
+            self._results.move_to_end(query)
+        return [self.songs[song_id] for song_id in ranked[offset:offset + limit]], len(ranked)
+
+    def _ranked(self, query: str) -> List[Any]:
+        terms = sorted(set(query.split()), key=len, reverse=True)
+        if not terms:
+            return []
+
+        indexed = [term for term in terms if self._indexed(term)]
+        unindexed = [term for term in terms if not self._indexed(term)]
+
+        # longest term first: it has the fewest candidates
+        matches = self._candidates(indexed[0]) if indexed else set(self.songs)
+        for term in indexed[1:]:
+            if not matches:
+                return []
+            matches = matches & self._candidates(term)
+        if unindexed:
+            matches = {
+                song_id for song_id in matches
+                if all(any(term in text for text in self._texts[song_id]) for term in unindexed)
+            }
+
+        return sorted(
+            matches,
+            key=lambda song_id: (
+                -self._rank(song_id, query, terms),
+                -(self.songs[song_id].get("scores_count") or 0),
+                self._texts[song_id][0],
+                str(song_id),
+            ),
+        )
@@ -0,0 +1,112 @@
+-- 007: merge a user's scores into songs_new.leaderboard in the database
+--
+--   merge_leaderboard_scores(user_id, username, scores)
+--     scores: jsonb array of {md5, score, percent, is_fc, speed, play_count, posted}
+--     returns one row per known md5 with the user's rank after the merge
+--
+-- Ingest used to select every changed song's full leaderboard, merge it in
+-- Python and write the whole array back through bulk_update_leaderboards.
+-- The replace rule is evaluate_score_update (higher score, or equal score and
+-- higher play count, or the stored entry has no posted date) and the ranking
+-- is sort_and_rank_leaderboard, same as 002.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION public.merge_leaderboard_scores(
+  p_user_id text, p_username text, p_scores jsonb
+) RETURNS TABLE (md5 text, rank integer, updated boolean)
+ LANGUAGE plpgsql
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+#variable_conflict use_column
+BEGIN
+  RETURN QUERY
+  WITH incoming AS (
+    SELECT DISTINCT ON (e->>'md5')
+           e->>'md5' AS md5,
+           jsonb_build_object(
+             'user_id',    p_user_id,
+             'username',   p_username,
+             'score',      e->'score',
+             'percent',    e->'percent',
+             'is_fc',      e->'is_fc',
+             'speed',      e->'speed',
+             'play_count', e->'play_count',
+             'posted',     e->'posted') AS entry
+    FROM jsonb_array_elements(p_scores) AS e
+    ORDER BY e->>'md5',
+             (e->>'score')::bigint DESC,
+             coalesce((e->>'play_count')::int, 0) DESC
+  ),
+  target AS (
+    SELECT s.id, s.md5, coalesce(s.leaderboard, '{}'::jsonb[]) AS leaderboard
+    FROM songs_new s
+    JOIN incoming i ON i.md5 = s.md5
+    FOR UPDATE OF s
+  ),
+  decided AS (
+    SELECT t.id, t.md5, t.leaderboard, i.entry,
+           ( cur.entry IS NULL
+             OR (i.entry->>'score')::bigint > (cur.entry->>'score')::bigint
+             OR ((i.entry->>'score')::bigint = (cur.entry->>'score')::bigint
+                 AND coalesce((i.entry->>'play_count')::int, 0)
+                   > coalesce((cur.entry->>'play_count')::int, 0))
+             OR coalesce(cur.entry->>'posted', '') = '' ) AS apply
+    FROM target t
+    JOIN incoming i ON i.md5 = t.md5
+    LEFT JOIN LATERAL (
+      SELECT x AS entry FROM unnest(t.leaderboard) AS x
+      WHERE x->>'user_id' = p_user_id
+      LIMIT 1
+    ) cur ON true
+  ),
+  ranked AS (
+    SELECT d.id,
+           m.entry || jsonb_build_object('rank', row_number() OVER (
+             PARTITION BY d.id
+             ORDER BY (coalesce((m.entry->>'speed')::numeric, 0) >= 100) DESC,
+                      CASE WHEN coalesce((m.entry->>'speed')::numeric, 0) >= 100
+                           THEN coalesce((m.entry->>'score')::numeric, 0)
+                           ELSE coalesce((m.entry->>'speed')::numeric, 0) END DESC,
+                      CASE WHEN coalesce((m.entry->>'speed')::numeric, 0) >= 100
+                           THEN coalesce((m.entry->>'speed')::numeric, 0)
+                           ELSE coalesce((m.entry->>'score')::numeric, 0) END DESC,
+                      nullif(m.entry->>'posted', '')::timestamptz ASC NULLS LAST
+           )) AS entry
+    FROM decided d
+    CROSS JOIN LATERAL (
+      SELECT x AS entry FROM unnest(d.leaderboard) AS x
+      WHERE x->>'user_id' IS DISTINCT FROM p_user_id
+      UNION ALL
+      SELECT d.entry
+    ) m
+    WHERE d.apply
+  ),
+  rebuilt AS (
+    SELECT id, array_agg(entry ORDER BY (entry->>'rank')::int) AS leaderboard
+    FROM ranked
+    GROUP BY id
+  ),
+  written AS (
+    UPDATE songs_new s
+    SET leaderboard = r.leaderboard,
+        last_update = now()
+    FROM rebuilt r
+    WHERE s.id = r.id
+    RETURNING s.id, s.leaderboard
+  )
+  SELECT d.md5,
+         (SELECT (x->>'rank')::int
+            FROM unnest(coalesce(w.leaderboard, d.leaderboard)) AS x
+           WHERE x->>'user_id' = p_user_id
+           LIMIT 1),
+         w.id IS NOT NULL
+  FROM decided d
+  LEFT JOIN written w ON w.id = d.id;
+END;
+$function$;
+
+REVOKE EXECUTE ON FUNCTION public.merge_leaderboard_scores(text, text, jsonb)
+  FROM public, anon, authenticated;
+
+COMMIT;
@@ -0,0 +1,371 @@
+-- 008: normalized leaderboards
+--
+--   leaderboard_entries         one row per (song, user), replaces songs_new.leaderboard
+--   leaderboard_entries_rank_idx matches sort_and_rank_leaderboard, all columns DESC
+--   leaderboard_ranked          entries with their rank (row_number over the index order)
+--   song_leaderboards           compatibility: the old jsonb[] shape per song
+--   leaderboard_rank()          a user's rank from one index range count
+--   merge_leaderboard_scores()  (007) now upserts one row per improved score
+--   bulk_update_leaderboards()  now replaces a song's entries instead of the array
+--
+-- The rank_* columns are kept by set_leaderboard_entry_sort_key() so that the
+-- ranking order is a plain descending row comparison:
+--   speed >= 100: (1, score, speed, -posted)
+--   speed <  100: (0, speed, score, -posted)
+-- An entry without a posted date sorts after every dated one, as in Python
+-- where it falls back to now().
+--
+-- songs_new.leaderboard is left in place, frozen at this migration.
+--
+-- Apply this before deploying the code that ships with it: every ingest and
+-- /api/leaderboard read goes through leaderboard_ranked, whether or not
+-- LEADERBOARD_MERGE_RPC is set.
+
+BEGIN;
+SET LOCAL statement_timeout = '600s';
+
+CREATE TABLE IF NOT EXISTS public.leaderboard_entries (
+  md5            text             NOT NULL REFERENCES songs_new (md5) ON DELETE CASCADE,
+  user_id        text             NOT NULL,
+  username       text,
+  score          bigint           NOT NULL DEFAULT 0,
+  percent        double precision,
+  is_fc          boolean          NOT NULL DEFAULT false,
+  speed          integer          NOT NULL DEFAULT 0,
+  play_count     integer          NOT NULL DEFAULT 0,
+  posted         timestamptz,
+  rank_bucket    smallint         NOT NULL,
+  rank_primary   bigint           NOT NULL,
+  rank_secondary bigint           NOT NULL,
+  rank_posted    double precision NOT NULL,
+  PRIMARY KEY (md5, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS leaderboard_entries_rank_idx
+  ON leaderboard_entries (md5, rank_bucket DESC, rank_primary DESC, rank_secondary DESC, rank_posted DESC);
+CREATE INDEX IF NOT EXISTS leaderboard_entries_user_idx
+  ON leaderboard_entries (user_id);
+
+ALTER TABLE leaderboard_entries ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION public.set_leaderboard_entry_sort_key()
+ RETURNS trigger
+ LANGUAGE plpgsql
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+BEGIN
+    NEW.rank_bucket    := CASE WHEN NEW.speed >= 100 THEN 1 ELSE 0 END;
+    NEW.rank_primary   := CASE WHEN NEW.speed >= 100 THEN NEW.score ELSE NEW.speed END;
+    NEW.rank_secondary := CASE WHEN NEW.speed >= 100 THEN NEW.speed ELSE NEW.score END;
+    NEW.rank_posted    := coalesce(-extract(epoch FROM NEW.posted)::double precision,
+                                   '-Infinity'::double precision);
+    RETURN NEW;
+END;
+$function$;
+
+DROP TRIGGER IF EXISTS leaderboard_entry_sort_key_trigger ON leaderboard_entries;
+CREATE TRIGGER leaderboard_entry_sort_key_trigger
+  BEFORE INSERT OR UPDATE OF score, speed, posted ON leaderboard_entries
+  FOR EACH ROW EXECUTE FUNCTION set_leaderboard_entry_sort_key();
+
+
+-- backfill from the jsonb arrays
+INSERT INTO leaderboard_entries (md5, user_id, username, score, percent, is_fc, speed, play_count, posted)
+SELECT DISTINCT ON (sn.md5, e->>'user_id')
+       sn.md5,
+       e->>'user_id',
+       e->>'username',
+       coalesce((e->>'score')::bigint, 0),
+       (e->>'percent')::double precision,
+       coalesce((e->>'is_fc')::boolean, false),
+       coalesce((e->>'speed')::numeric, 0)::int,
+       coalesce((e->>'play_count')::int, 0),
+       nullif(e->>'posted', '')::timestamptz
+FROM songs_new sn, unnest(sn.leaderboard) AS e
+WHERE sn.leaderboard IS NOT NULL
+  AND e->>'user_id' IS NOT NULL
+ORDER BY sn.md5, e->>'user_id', (e->>'score')::bigint DESC
+ON CONFLICT (md5, user_id) DO NOTHING;
+
+ANALYZE leaderboard_entries;
+
+
+CREATE OR REPLACE VIEW public.leaderboard_ranked AS
+SELECT md5, user_id, username, score, percent, is_fc, speed, play_count, posted,
+       row_number() OVER (
+         PARTITION BY md5
+         ORDER BY rank_bucket DESC, rank_primary DESC, rank_secondary DESC, rank_posted DESC
+       )::int AS rank
+FROM leaderboard_entries;
+
+CREATE OR REPLACE VIEW public.song_leaderboards AS
+SELECT md5,
+       array_agg(jsonb_build_object(
+         'user_id',    user_id,
+         'username',   username,
+         'score',      score,
+         'percent',    percent,
+         'is_fc',      is_fc,
+         'speed',      speed,
+         'play_count', play_count,
+         'posted',     coalesce(to_char(posted AT TIME ZONE 'UTC',
+                                        'YYYY-MM-DD"T"HH24:MI:SS.US"+00:00"'), ''),
+         'rank',       rank) ORDER BY rank) AS leaderboard,
+       count(*)::int AS scores_count
+FROM leaderboard_ranked
+GROUP BY md5;
+
+
+CREATE OR REPLACE FUNCTION public.leaderboard_rank(p_md5 text, p_user_id text)
+ RETURNS integer
+ LANGUAGE sql
+ STABLE
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+  SELECT (
+    SELECT count(*) + 1
+    FROM leaderboard_entries o
+    WHERE o.md5 = me.md5
+      AND (o.rank_bucket, o.rank_primary, o.rank_secondary, o.rank_posted)
+        > (me.rank_bucket, me.rank_primary, me.rank_secondary, me.rank_posted)
+  )::int
+  FROM leaderboard_entries me
+  WHERE me.md5 = p_md5 AND me.user_id = p_user_id;
+$function$;
+
+
+-- users.scores ranks and songs_new.scores_count follow the entries
+CREATE OR REPLACE FUNCTION public.sync_leaderboard_songs(p_md5s text[])
+ RETURNS void
+ LANGUAGE plpgsql
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+BEGIN
+  UPDATE songs_new s
+  SET scores_count = c.n
+  FROM (
+    SELECT t.md5, (SELECT count(*) FROM leaderboard_entries e WHERE e.md5 = t.md5)::int AS n
+    FROM unnest(p_md5s) AS t(md5)
+  ) c
+  WHERE s.md5 = c.md5
+    AND s.scores_count IS DISTINCT FROM c.n;
+
+  -- only users whose stored rank on a touched song actually moved
+  WITH new_ranks AS (
+    SELECT r.md5, r.user_id, r.rank
+    FROM leaderboard_ranked r
+    WHERE r.md5 = ANY(p_md5s)
+  ),
+  stale AS (
+    SELECT DISTINCT u.id
+    FROM users u
+    CROSS JOIN LATERAL unnest(u.scores) AS s(score)
+    LEFT JOIN new_ranks nr ON nr.md5 = s.score->>'identifier' AND nr.user_id = u.id::text
+    WHERE u.scores IS NOT NULL
+      AND s.score->>'identifier' = ANY(p_md5s)
+      AND (s.score->>'rank')::int IS DISTINCT FROM nr.rank
+  )
+  UPDATE users u
+  SET scores = (
+    SELECT array_agg(
+             CASE WHEN s.score->>'identifier' = ANY(p_md5s)
+                  THEN s.score || jsonb_build_object('rank', nr.rank)
+                  ELSE s.score
+             END
+             ORDER BY s.ord)
+    FROM unnest(u.scores) WITH ORDINALITY AS s(score, ord)
+    LEFT JOIN new_ranks nr ON nr.md5 = s.score->>'identifier' AND nr.user_id = u.id::text
+  )
+  FROM stale
+  WHERE u.id = stale.id;
+END;
+$function$;
+
+CREATE OR REPLACE FUNCTION public.sync_leaderboard_entries_inserted()
+ RETURNS trigger
+ LANGUAGE plpgsql
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+BEGIN
+  PERFORM sync_leaderboard_songs(ARRAY(SELECT DISTINCT md5 FROM changed));
+  RETURN NULL;
+END;
+$function$;
+
+CREATE OR REPLACE FUNCTION public.sync_leaderboard_entries_updated()
+ RETURNS trigger
+ LANGUAGE plpgsql
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+BEGIN
+  PERFORM sync_leaderboard_songs(ARRAY(
+    SELECT n.md5
+    FROM changed n
+    JOIN old_rows o ON o.md5 = n.md5 AND o.user_id = n.user_id
+    WHERE (n.rank_bucket, n.rank_primary, n.rank_secondary, n.rank_posted)
+          IS DISTINCT FROM (o.rank_bucket, o.rank_primary, o.rank_secondary, o.rank_posted)
+    GROUP BY n.md5
+  ));
+  RETURN NULL;
+END;
+$function$;
+
+CREATE OR REPLACE FUNCTION public.sync_leaderboard_entries_deleted()
+ RETURNS trigger
+ LANGUAGE plpgsql
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+BEGIN
+  PERFORM sync_leaderboard_songs(ARRAY(SELECT DISTINCT md5 FROM old_rows));
+  RETURN NULL;
+END;
+$function$;
+
+DROP TRIGGER IF EXISTS leaderboard_entries_insert_sync ON leaderboard_entries;
+CREATE TRIGGER leaderboard_entries_insert_sync
+  AFTER INSERT ON leaderboard_entries
+  REFERENCING NEW TABLE AS changed
+  FOR EACH STATEMENT EXECUTE FUNCTION sync_leaderboard_entries_inserted();
+
+DROP TRIGGER IF EXISTS leaderboard_entries_update_sync ON leaderboard_entries;
+CREATE TRIGGER leaderboard_entries_update_sync
+  AFTER UPDATE ON leaderboard_entries
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS changed
+  FOR EACH STATEMENT EXECUTE FUNCTION sync_leaderboard_entries_updated();
+
+DROP TRIGGER IF EXISTS leaderboard_entries_delete_sync ON leaderboard_entries;
+CREATE TRIGGER leaderboard_entries_delete_sync
+  AFTER DELETE ON leaderboard_entries
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION sync_leaderboard_entries_deleted();
+
+
+-- the array is no longer maintained, so neither are its triggers
+DROP TRIGGER IF EXISTS update_user_scores_rank_trigger ON songs_new;
+DROP TRIGGER IF EXISTS scores_count_trigger ON songs_new;
+COMMENT ON COLUMN songs_new.leaderboard IS
+  'Frozen at migration 008. Read leaderboard_entries / leaderboard_ranked / song_leaderboards.';
+
+
+CREATE OR REPLACE FUNCTION public.merge_leaderboard_scores(
+  p_user_id text, p_username text, p_scores jsonb
+) RETURNS TABLE (md5 text, rank integer, updated boolean)
+ LANGUAGE plpgsql
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+#variable_conflict use_column
+DECLARE
+  written_md5s text[];
+BEGIN
+  -- the write is its own statement: rows from a data-modifying CTE are
+  -- invisible to the rest of that statement, leaderboard_rank() included
+  WITH incoming AS (
+    SELECT DISTINCT ON (e->>'md5')
+           e->>'md5'                             AS md5,
+           (e->>'score')::bigint                 AS score,
+           (e->>'percent')::double precision     AS percent,
+           coalesce((e->>'is_fc')::boolean, false) AS is_fc,
+           coalesce((e->>'speed')::numeric, 0)::int AS speed,
+           coalesce((e->>'play_count')::int, 0)  AS play_count,
+           nullif(e->>'posted', '')::timestamptz AS posted
+    FROM jsonb_array_elements(p_scores) AS e
+    WHERE EXISTS (SELECT 1 FROM songs_new s WHERE s.md5 = e->>'md5')
+    ORDER BY e->>'md5',
+             (e->>'score')::bigint DESC,
+             coalesce((e->>'play_count')::int, 0) DESC
+  ),
+  written AS (
+    INSERT INTO leaderboard_entries AS le
+      (md5, user_id, username, score, percent, is_fc, speed, play_count, posted)
+    SELECT i.md5, p_user_id, p_username, i.score, i.percent, i.is_fc, i.speed, i.play_count, i.posted
+    FROM incoming i
+    ON CONFLICT (md5, user_id) DO UPDATE
+      SET username   = EXCLUDED.username,
+          score      = EXCLUDED.score,
+          percent    = EXCLUDED.percent,
+          is_fc      = EXCLUDED.is_fc,
+          speed      = EXCLUDED.speed,
+          play_count = EXCLUDED.play_count,
+          posted     = EXCLUDED.posted
+      WHERE EXCLUDED.score > le.score
+         OR (EXCLUDED.score = le.score AND EXCLUDED.play_count > le.play_count)
+         OR le.posted IS NULL
+    RETURNING le.md5
+  )
+  SELECT coalesce(array_agg(w.md5), '{}') INTO written_md5s FROM written w;
+
+  UPDATE songs_new s
+  SET last_update = now()
+  WHERE s.md5 = ANY (written_md5s);
+
+  -- a later statement, so the ranks include this merge
+  RETURN QUERY
+  SELECT i.md5,
+         leaderboard_rank(i.md5, p_user_id),
+         i.md5 = ANY (written_md5s)
+  FROM (
+    SELECT DISTINCT e->>'md5' AS md5
+    FROM jsonb_array_elements(p_scores) AS e
+    WHERE EXISTS (SELECT 1 FROM songs_new s WHERE s.md5 = e->>'md5')
+  ) i;
+END;
+$function$;
+
+
+CREATE OR REPLACE FUNCTION public.bulk_update_leaderboards(updates jsonb)
+ RETURNS void
+ LANGUAGE plpgsql
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+BEGIN
+  CREATE TEMP TABLE incoming_entries ON COMMIT DROP AS
+  SELECT v.md5,
+         e->>'user_id'                              AS user_id,
+         e->>'username'                             AS username,
+         coalesce((e->>'score')::bigint, 0)         AS score,
+         (e->>'percent')::double precision          AS percent,
+         coalesce((e->>'is_fc')::boolean, false)    AS is_fc,
+         coalesce((e->>'speed')::numeric, 0)::int   AS speed,
+         coalesce((e->>'play_count')::int, 0)       AS play_count,
+         nullif(e->>'posted', '')::timestamptz      AS posted
+  FROM jsonb_to_recordset(updates) AS v(md5 text, leaderboard jsonb, last_update timestamptz)
+  CROSS JOIN LATERAL jsonb_array_elements(v.leaderboard) AS e
+  WHERE EXISTS (SELECT 1 FROM songs_new s WHERE s.md5 = v.md5);
+
+  DELETE FROM leaderboard_entries le
+  USING (SELECT DISTINCT md5 FROM incoming_entries) t
+  WHERE le.md5 = t.md5
+    AND NOT EXISTS (
+      SELECT 1 FROM incoming_entries i WHERE i.md5 = le.md5 AND i.user_id = le.user_id);
+
+  INSERT INTO leaderboard_entries AS le
+    (md5, user_id, username, score, percent, is_fc, speed, play_count, posted)
+  SELECT DISTINCT ON (md5, user_id)
+         md5, user_id, username, score, percent, is_fc, speed, play_count, posted
+  FROM incoming_entries
+  ORDER BY md5, user_id, score DESC
+  ON CONFLICT (md5, user_id) DO UPDATE
+    SET username   = EXCLUDED.username,
+        score      = EXCLUDED.score,
+        percent    = EXCLUDED.percent,
+        is_fc      = EXCLUDED.is_fc,
+        speed      = EXCLUDED.speed,
+        play_count = EXCLUDED.play_count,
+        posted     = EXCLUDED.posted
+    WHERE (le.username, le.score, le.percent, le.is_fc, le.speed, le.play_count, le.posted)
+          IS DISTINCT FROM
+          (EXCLUDED.username, EXCLUDED.score, EXCLUDED.percent, EXCLUDED.is_fc,
+           EXCLUDED.speed, EXCLUDED.play_count, EXCLUDED.posted);
+
+  UPDATE songs_new s
+  SET last_update = v.last_update
+  FROM jsonb_to_recordset(updates) AS v(md5 text, last_update timestamptz)
+  WHERE s.md5 = v.md5;
+
+  DROP TABLE incoming_entries;
+END;
+$function$;
+
+REVOKE EXECUTE ON FUNCTION public.sync_leaderboard_songs(text[]) FROM public, anon, authenticated;
+
+COMMIT;
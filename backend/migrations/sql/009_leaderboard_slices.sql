@@ -0,0 +1,117 @@
+-- 009: leaderboard slices
+--
+--   leaderboard_page(md5, offset, limit)       one page in rank order
+--   leaderboard_around(md5, user_id, radius)   a user's entry and up to radius on each side
+--
+-- Both walk leaderboard_entries_rank_idx and return only the requested rows,
+-- with ranks, so a response is the same size however many players a song has.
+-- user_id becomes the last tie-break so that entries with identical keys
+-- still have distinct, stable ranks and keyset neighbours.
+
+BEGIN;
+
+DROP INDEX IF EXISTS leaderboard_entries_rank_idx;
+CREATE INDEX leaderboard_entries_rank_idx
+  ON leaderboard_entries (md5, rank_bucket DESC, rank_primary DESC, rank_secondary DESC, rank_posted DESC, user_id DESC);
+
+CREATE OR REPLACE VIEW public.leaderboard_ranked AS
+SELECT md5, user_id, username, score, percent, is_fc, speed, play_count, posted,
+       row_number() OVER (
+         PARTITION BY md5
+         ORDER BY rank_bucket DESC, rank_primary DESC, rank_secondary DESC, rank_posted DESC, user_id DESC
+       )::int AS rank
+FROM leaderboard_entries;
+
+CREATE OR REPLACE FUNCTION public.leaderboard_rank(p_md5 text, p_user_id text)
+ RETURNS integer
+ LANGUAGE sql
+ STABLE
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+  SELECT (
+    SELECT count(*) + 1
+    FROM leaderboard_entries o
+    WHERE o.md5 = me.md5
+      AND (o.rank_bucket, o.rank_primary, o.rank_secondary, o.rank_posted, o.user_id)
+        > (me.rank_bucket, me.rank_primary, me.rank_secondary, me.rank_posted, me.user_id)
+  )::int
+  FROM leaderboard_entries me
+  WHERE me.md5 = p_md5 AND me.user_id = p_user_id;
+$function$;
+
+CREATE OR REPLACE FUNCTION public.leaderboard_page(p_md5 text, p_offset integer, p_limit integer)
+ RETURNS SETOF leaderboard_ranked
+ LANGUAGE sql
+ STABLE
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+  SELECT page.md5, page.user_id, page.username, page.score, page.percent, page.is_fc,
+         page.speed, page.play_count, page.posted,
+         (greatest(p_offset, 0) + row_number() OVER (
+           ORDER BY page.rank_bucket DESC, page.rank_primary DESC, page.rank_secondary DESC,
+                    page.rank_posted DESC, page.user_id DESC))::int AS rank
+  FROM (
+    SELECT e.*
+    FROM leaderboard_entries e
+    WHERE e.md5 = p_md5
+    ORDER BY e.rank_bucket DESC, e.rank_primary DESC, e.rank_secondary DESC,
+             e.rank_posted DESC, e.user_id DESC
+    OFFSET greatest(p_offset, 0)
+    LIMIT greatest(p_limit, 0)
+  ) page
+  ORDER BY rank;
+$function$;
+
+CREATE OR REPLACE FUNCTION public.leaderboard_around(p_md5 text, p_user_id text, p_radius integer)
+ RETURNS SETOF leaderboard_ranked
+ LANGUAGE sql
+ STABLE
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+  WITH me AS (
+    SELECT e.*, leaderboard_rank(e.md5, e.user_id) AS my_rank
+    FROM leaderboard_entries e
+    WHERE e.md5 = p_md5 AND e.user_id = p_user_id
+  ),
+  above AS (
+    SELECT o.*, (me.my_rank - row_number() OVER (
+             ORDER BY o.rank_bucket, o.rank_primary, o.rank_secondary, o.rank_posted, o.user_id))::int AS rank
+    FROM me
+    CROSS JOIN LATERAL (
+      SELECT x.*
+      FROM leaderboard_entries x
+      WHERE x.md5 = me.md5
+        AND (x.rank_bucket, x.rank_primary, x.rank_secondary, x.rank_posted, x.user_id)
+          > (me.rank_bucket, me.rank_primary, me.rank_secondary, me.rank_posted, me.user_id)
+      ORDER BY x.rank_bucket, x.rank_primary, x.rank_secondary, x.rank_posted, x.user_id
+      LIMIT greatest(p_radius, 0)
+    ) o
+  ),
+  below AS (
+    SELECT o.*, (me.my_rank + row_number() OVER (
+             ORDER BY o.rank_bucket DESC, o.rank_primary DESC, o.rank_secondary DESC,
+                      o.rank_posted DESC, o.user_id DESC))::int AS rank
+    FROM me
+    CROSS JOIN LATERAL (
+      SELECT x.*
+      FROM leaderboard_entries x
+      WHERE x.md5 = me.md5
+        AND (x.rank_bucket, x.rank_primary, x.rank_secondary, x.rank_posted, x.user_id)
+          < (me.rank_bucket, me.rank_primary, me.rank_secondary, me.rank_posted, me.user_id)
+      ORDER BY x.rank_bucket DESC, x.rank_primary DESC, x.rank_secondary DESC,
+               x.rank_posted DESC, x.user_id DESC
+      LIMIT greatest(p_radius, 0)
+    ) o
+  )
+  SELECT md5, user_id, username, score, percent, is_fc, speed, play_count, posted, rank
+  FROM (
+    SELECT md5, user_id, username, score, percent, is_fc, speed, play_count, posted, rank FROM above
+    UNION ALL
+    SELECT md5, user_id, username, score, percent, is_fc, speed, play_count, posted, my_rank FROM me
+    UNION ALL
+    SELECT md5, user_id, username, score, percent, is_fc, speed, play_count, posted, rank FROM below
+  ) slice
+  ORDER BY rank;
+$function$;
+
+COMMIT;
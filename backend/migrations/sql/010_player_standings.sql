@@ -0,0 +1,81 @@
+-- 010: precomputed player standings
+--
+--   player_standings             one row per (board, user), refreshed hourly
+--   refresh_player_standings()   rebuilds every board from users
+--   job_watermarks trigger       refreshes once update_elo_rankings advances its watermark
+--
+-- Boards: elo, total_score, total_fcs, avg_percent. rank follows RANK() (ties
+-- share a rank, as in users.stats.rank); position is a unique 1..total order
+-- used for paging and neighbours, so a page or a user's surroundings is one
+-- range read on the primary key.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS player_standings (
+  board        text NOT NULL,
+  position     integer NOT NULL,
+  rank         integer NOT NULL,
+  total        integer NOT NULL,
+  user_id      text NOT NULL,
+  username     text,
+  avatar       text,
+  value        double precision NOT NULL,
+  refreshed_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (board, position)
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS player_standings_user_idx ON player_standings (board, user_id);
+
+CREATE OR REPLACE FUNCTION public.refresh_player_standings()
+ RETURNS void
+ LANGUAGE plpgsql
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+BEGIN
+    DELETE FROM player_standings;
+
+    INSERT INTO player_standings (board, position, rank, total, user_id, username, avatar, value)
+    SELECT v.board,
+           row_number() OVER (PARTITION BY v.board ORDER BY v.value DESC, v.user_id)::int,
+           rank() OVER (PARTITION BY v.board ORDER BY v.value DESC)::int,
+           count(*) OVER (PARTITION BY v.board)::int,
+           v.user_id, v.username, v.avatar, v.value
+    FROM (
+      SELECT 'elo' AS board, u.id::text AS user_id, u.username, u.avatar, u.elo::float AS value
+      FROM users u
+      WHERE u.elo IS NOT NULL
+      UNION ALL
+      SELECT s.board, u.id::text, u.username, u.avatar, s.value
+      FROM users u
+      CROSS JOIN LATERAL (VALUES
+        ('total_score', (u.stats->>'total_score')::float),
+        ('total_fcs',   (u.stats->>'total_fcs')::float),
+        ('avg_percent', (u.stats->>'avg_percent')::float)
+      ) AS s(board, value)
+      WHERE coalesce((u.stats->>'total_scores')::int, 0) > 0
+        AND s.value IS NOT NULL
+    ) v;
+END;
+$function$;
+
+CREATE OR REPLACE FUNCTION public.refresh_player_standings_after_elo()
+ RETURNS trigger
+ LANGUAGE plpgsql
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+BEGIN
+    PERFORM refresh_player_standings();
+    RETURN NULL;
+END;
+$function$;
+
+DROP TRIGGER IF EXISTS refresh_player_standings_after_elo ON job_watermarks;
+CREATE TRIGGER refresh_player_standings_after_elo
+  AFTER UPDATE OF ran_at ON job_watermarks
+  FOR EACH ROW
+  WHEN (NEW.job_name = 'elo_rankings')
+  EXECUTE FUNCTION refresh_player_standings_after_elo();
+
+SELECT refresh_player_standings();
+
+COMMIT;
@@ -0,0 +1,57 @@
+-- 011: ranking change feed
+--
+--   ranking_changes                  append-only log of ELO / ELO-rank deltas, 30 days kept
+--   refresh_player_standings_after_elo()  now diffs the elo board around each refresh
+--
+-- Each time update_elo_rankings advances its watermark the elo board is
+-- snapshotted, rebuilt, and every user whose elo or rank moved gets one row.
+-- The bigserial id is the feed cursor, so polling is an index range read
+-- instead of a diff over elo_history.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS ranking_changes (
+  id         bigserial PRIMARY KEY,
+  user_id    text NOT NULL,
+  username   text,
+  old_elo    double precision,
+  new_elo    double precision,
+  old_rank   integer,
+  new_rank   integer,
+  changed_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ranking_changes_changed_at_idx ON ranking_changes (changed_at);
+
+CREATE OR REPLACE FUNCTION public.refresh_player_standings_after_elo()
+ RETURNS trigger
+ LANGUAGE plpgsql
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+BEGIN
+    DROP TABLE IF EXISTS prev_elo_standings;
+
+    CREATE TEMPORARY TABLE prev_elo_standings ON COMMIT DROP AS
+    SELECT user_id, username, rank, value
+    FROM player_standings
+    WHERE board = 'elo';
+
+    PERFORM refresh_player_standings();
+
+    INSERT INTO ranking_changes (user_id, username, old_elo, new_elo, old_rank, new_rank)
+    SELECT coalesce(n.user_id, p.user_id),
+           coalesce(n.username, p.username),
+           p.value, n.value, p.rank, n.rank
+    FROM (SELECT user_id, username, rank, value FROM player_standings WHERE board = 'elo') n
+    FULL JOIN prev_elo_standings p ON p.user_id = n.user_id
+    WHERE n.rank IS DISTINCT FROM p.rank
+       OR n.value IS DISTINCT FROM p.value
+    ORDER BY n.rank NULLS LAST, p.rank;
+
+    DELETE FROM ranking_changes WHERE changed_at < now() - interval '30 days';
+
+    RETURN NULL;
+END;
+$function$;
+
+COMMIT;
@@ -0,0 +1,59 @@
+-- 012: incremental achievement counters
+--
+--   users.achievement_counters          running counts behind incremental achievement checks
+--   achievement_score_fields()          the part of a scores array that achievements read
+--   invalidate_achievement_counters()   clears the counters when scores change behind their back
+--
+-- process_and_save_scores re-checks only the achievements its changed scores
+-- can affect, advancing the counters it read with the scores. Any other writer
+-- of users.scores (score promotion, manual fixes) leaves the counters stale,
+-- so the trigger drops them and the next upload falls back to a full
+-- evaluation. Rank refreshes only rewrite each score's rank, which no
+-- achievement reads, so they keep the counters: sync_leaderboard_songs runs
+-- with dmbot.rank_sync on, and the trigger skips its updates without
+-- comparing the arrays, since it fires for every leaderboard merge.
+
+BEGIN;
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS achievement_counters jsonb;
+
+CREATE OR REPLACE FUNCTION public.achievement_score_fields(p_scores jsonb[])
+ RETURNS jsonb
+ LANGUAGE sql
+ IMMUTABLE
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+    SELECT coalesce(jsonb_agg(e - 'rank' - 'play_count' - 'posted' - 'filepath'
+                              ORDER BY e->>'identifier'), '[]'::jsonb)
+    FROM unnest(coalesce(p_scores, '{}'::jsonb[])) e
+    WHERE coalesce((e->>'speed')::numeric, 0) >= 100;
+$function$;
+
+CREATE OR REPLACE FUNCTION public.invalidate_achievement_counters()
+ RETURNS trigger
+ LANGUAGE plpgsql
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+BEGIN
+    -- a writer that evaluated achievements sends fresh counters (evaluated_at always differs)
+    IF NEW.achievement_counters IS NOT DISTINCT FROM OLD.achievement_counters
+       AND achievement_score_fields(NEW.scores) IS DISTINCT FROM achievement_score_fields(OLD.scores) THEN
+        NEW.achievement_counters := NULL;
+    END IF;
+    RETURN NEW;
+END;
+$function$;
+
+-- set only while the function runs, so only its own users.scores writes see it
+ALTER FUNCTION public.sync_leaderboard_songs(text[]) SET dmbot.rank_sync = 'on';
+
+DROP TRIGGER IF EXISTS invalidate_achievement_counters ON users;
+CREATE TRIGGER invalidate_achievement_counters
+  BEFORE UPDATE OF scores ON users
+  FOR EACH ROW
+  WHEN (OLD.achievement_counters IS NOT NULL
+        AND OLD.scores IS DISTINCT FROM NEW.scores
+        AND current_setting('dmbot.rank_sync', true) IS DISTINCT FROM 'on')
+  EXECUTE FUNCTION invalidate_achievement_counters();
+
+COMMIT;
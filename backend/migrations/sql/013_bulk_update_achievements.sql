@@ -0,0 +1,51 @@
+-- 013: batched achievement writes
+--
+--   achievement_scores_digest(users)   md5 of achievement_score_fields(scores), selectable as a column
+--   bulk_update_achievements()         merges achievements and sets achievement_counters for many users
+--
+-- Used by the backfill-achievements command, which re-evaluates every user
+-- against the current definitions and writes back only the users whose
+-- achievements changed. Scores are not touched, so the counters sent along
+-- survive invalidate_achievement_counters() (012).
+--
+-- A user can upload while their page is being evaluated, so the write must
+-- not replace what the upload wrote: achievements are merged into the stored
+-- ones, and the counters are only written if the user's achievement score
+-- fields still have the digest the backfill read with the page.
+
+BEGIN;
+
+-- takes the row type, so PostgREST exposes it as a computed column of users
+CREATE OR REPLACE FUNCTION public.achievement_scores_digest(u users)
+ RETURNS text
+ LANGUAGE sql
+ STABLE
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+    SELECT md5(achievement_score_fields(u.scores)::text);
+$function$;
+
+CREATE OR REPLACE FUNCTION public.bulk_update_achievements(updates jsonb)
+ RETURNS integer
+ LANGUAGE plpgsql
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+DECLARE
+  updated integer;
+BEGIN
+  UPDATE users u
+  SET achievements = coalesce(u.achievements, '{}'::jsonb) || v.achievements,
+      achievement_counters = CASE
+        WHEN achievement_scores_digest(u) = v.scores_digest THEN v.achievement_counters
+        ELSE u.achievement_counters
+      END
+  FROM jsonb_to_recordset(updates)
+    AS v(id text, achievements jsonb, achievement_counters jsonb, scores_digest text)
+  WHERE u.id::text = v.id;
+
+  GET DIAGNOSTICS updated = ROW_COUNT;
+  RETURN updated;
+END;
+$function$;
+
+COMMIT;
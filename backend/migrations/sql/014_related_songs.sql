@@ -0,0 +1,96 @@
+-- 014: related songs in one call
+--
+--   get_related_songs()   the album, artist, genre and charter sets for a song page, each capped
+--
+-- Replaces up to five PostgREST round trips (one per set plus a charters
+-- lookup) that returned every matching row. Each set is at most p_limit rows:
+-- the album in track order, the others most recently updated first, which is
+-- how the site lists them. The charter set is the songs crediting any of the
+-- known charters in p_charters. Sets whose argument is NULL come back empty.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION public.get_related_songs(
+  p_album text DEFAULT NULL,
+  p_artist text DEFAULT NULL,
+  p_genre text DEFAULT NULL,
+  p_charters text[] DEFAULT NULL,
+  p_limit integer DEFAULT 200
+)
+ RETURNS jsonb
+ LANGUAGE plpgsql
+ STABLE
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+DECLARE
+  known_charters text[];
+  result jsonb := jsonb_build_object(
+    'album_songs', '[]'::jsonb,
+    'artist_songs', '[]'::jsonb,
+    'genre_songs', '[]'::jsonb,
+    'charter_songs', '[]'::jsonb
+  );
+BEGIN
+  IF p_album IS NOT NULL THEN
+    result := result || jsonb_build_object('album_songs', (
+      SELECT coalesce(jsonb_agg(to_jsonb(r)), '[]'::jsonb) FROM (
+        SELECT id, md5, name, artist, album, track, year, genre, song_length, charter_refs,
+               scores_count, last_update, instruments, has_2x_kick, loading_phrase, playlist_path
+        FROM songs_new
+        WHERE album = p_album
+        ORDER BY track NULLS LAST, id
+        LIMIT p_limit
+      ) r
+    ));
+  END IF;
+
+  IF p_artist IS NOT NULL THEN
+    result := result || jsonb_build_object('artist_songs', (
+      SELECT coalesce(jsonb_agg(to_jsonb(r)), '[]'::jsonb) FROM (
+        SELECT id, md5, name, artist, album, track, year, genre, song_length, charter_refs,
+               scores_count, last_update, instruments, has_2x_kick, loading_phrase, playlist_path
+        FROM songs_new
+        WHERE artist = p_artist
+        ORDER BY last_update DESC NULLS LAST, id
+        LIMIT p_limit
+      ) r
+    ));
+  END IF;
+
+  IF p_genre IS NOT NULL THEN
+    result := result || jsonb_build_object('genre_songs', (
+      SELECT coalesce(jsonb_agg(to_jsonb(r)), '[]'::jsonb) FROM (
+        SELECT id, md5, name, artist, album, track, year, genre, song_length, charter_refs,
+               scores_count, last_update, instruments, has_2x_kick, loading_phrase, playlist_path
+        FROM songs_new
+        WHERE genre = p_genre
+        ORDER BY last_update DESC NULLS LAST, id
+        LIMIT p_limit
+      ) r
+    ));
+  END IF;
+
+  IF p_charters IS NOT NULL THEN
+    SELECT array_agg(DISTINCT c.name) INTO known_charters
+    FROM charters c
+    WHERE c.name = ANY (p_charters);
+
+    IF known_charters IS NOT NULL THEN
+      result := result || jsonb_build_object('charter_songs', (
+        SELECT coalesce(jsonb_agg(to_jsonb(r)), '[]'::jsonb) FROM (
+          SELECT id, md5, name, artist, album, track, year, genre, song_length, charter_refs,
+                 scores_count, last_update, instruments, has_2x_kick, loading_phrase, playlist_path
+          FROM songs_new
+          WHERE charter_refs && known_charters
+          ORDER BY last_update DESC NULLS LAST, id
+          LIMIT p_limit
+        ) r
+      ));
+    END IF;
+  END IF;
+
+  RETURN result;
+END;
+$function$;
+
+COMMIT;
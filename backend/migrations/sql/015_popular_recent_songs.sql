@@ -0,0 +1,109 @@
+-- 015: popular and recently played songs
+--
+--   songs_new_scores_count_idx   songs_new by scores_count DESC, for /api/songs/popular
+--   song_latest_plays            the latest leaderboard entry per song, for /api/songs/recent
+--   record_latest_plays()        keeps song_latest_plays current as leaderboard entries are written
+--   get_recent_songs()           the songs played most recently, optionally one per user
+--
+-- Both lists used to be built by the bot from the full song list, the recent
+-- one from songs_new.leaderboard, which is frozen since 008. song_latest_plays
+-- follows leaderboard_entries through statement triggers, so every leaderboard
+-- write (merge_leaderboard_scores, bulk_update_leaderboards) keeps it current.
+-- A song's row only moves forward in time: an entry replaced by an older one
+-- leaves the newer play in place.
+
+BEGIN;
+SET LOCAL statement_timeout = '600s';
+
+CREATE INDEX IF NOT EXISTS songs_new_scores_count_idx
+  ON songs_new (scores_count DESC NULLS LAST, id);
+
+CREATE TABLE IF NOT EXISTS public.song_latest_plays (
+  md5      text        PRIMARY KEY REFERENCES songs_new (md5) ON DELETE CASCADE,
+  user_id  text        NOT NULL,
+  username text,
+  posted   timestamptz NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS song_latest_plays_posted_idx ON song_latest_plays (posted DESC);
+
+ALTER TABLE song_latest_plays ENABLE ROW LEVEL SECURITY;
+
+INSERT INTO song_latest_plays (md5, user_id, username, posted)
+SELECT DISTINCT ON (md5) md5, user_id, username, posted
+FROM leaderboard_entries
+WHERE posted IS NOT NULL
+ORDER BY md5, posted DESC
+ON CONFLICT (md5) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION public.record_latest_plays()
+ RETURNS trigger
+ LANGUAGE plpgsql
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+BEGIN
+  INSERT INTO song_latest_plays AS l (md5, user_id, username, posted)
+  SELECT DISTINCT ON (md5) md5, user_id, username, posted
+  FROM changed
+  WHERE posted IS NOT NULL
+  ORDER BY md5, posted DESC
+  ON CONFLICT (md5) DO UPDATE
+    SET user_id = EXCLUDED.user_id,
+        username = EXCLUDED.username,
+        posted = EXCLUDED.posted
+    WHERE l.posted < EXCLUDED.posted;
+  RETURN NULL;
+END;
+$function$;
+
+-- transition tables allow one event per trigger
+DROP TRIGGER IF EXISTS leaderboard_entries_insert_latest ON leaderboard_entries;
+CREATE TRIGGER leaderboard_entries_insert_latest
+  AFTER INSERT ON leaderboard_entries
+  REFERENCING NEW TABLE AS changed
+  FOR EACH STATEMENT EXECUTE FUNCTION record_latest_plays();
+
+DROP TRIGGER IF EXISTS leaderboard_entries_update_latest ON leaderboard_entries;
+CREATE TRIGGER leaderboard_entries_update_latest
+  AFTER UPDATE ON leaderboard_entries
+  REFERENCING NEW TABLE AS changed
+  FOR EACH STATEMENT EXECUTE FUNCTION record_latest_plays();
+
+CREATE OR REPLACE FUNCTION public.get_recent_songs(p_limit integer DEFAULT 20, p_unique_users boolean DEFAULT false)
+ RETURNS jsonb
+ LANGUAGE plpgsql
+ STABLE
+ SET search_path TO 'public', 'pg_temp'
+AS $function$
+DECLARE
+  play record;
+  seen text[] := '{}';
+  songs jsonb := '[]'::jsonb;
+BEGIN
+  -- walks song_latest_plays_posted_idx newest first, stopping once the page is full
+  FOR play IN
+    SELECT l.user_id, l.username, l.posted,
+           to_jsonb(s) AS song
+    FROM song_latest_plays l
+    JOIN LATERAL (
+      SELECT id, md5, name, artist, album, track, year, genre, song_length, charter_refs,
+             scores_count, last_update, instruments, has_2x_kick, loading_phrase, playlist_path
+      FROM songs_new
+      WHERE md5 = l.md5
+    ) s ON true
+    ORDER BY l.posted DESC
+  LOOP
+    CONTINUE WHEN p_unique_users AND play.user_id = ANY (seen);
+    seen := seen || play.user_id;
+    songs := songs || jsonb_build_array(play.song || jsonb_build_object(
+      'most_recent_player', coalesce(play.username, 'Unknown Player'),
+      'most_recent_user_id', play.user_id,
+      'most_recent_date', play.posted
+    ));
+    EXIT WHEN jsonb_array_length(songs) >= p_limit;
+  END LOOP;
+  RETURN songs;
+END;
+$function$;
+
+COMMIT;
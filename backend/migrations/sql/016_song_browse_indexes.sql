@@ -0,0 +1,26 @@
+-- 016: song browse indexes
+--
+--   songs_new_browse_<column>_idx   (column, id) for every /api/songs/browse sort column
+--
+-- /api/songs/browse pages are ORDER BY <column>, id (either direction), with
+-- the rows whose column is NULL read after the others, by id. A (column, id)
+-- btree serves both directions and both parts, so a page starts at the cursor
+-- instead of sorting every matching row. name, year and song_length had no
+-- index at all; the single-column indexes on artist, album, genre and
+-- last_update and the (scores_count DESC NULLS LAST, id) index from 015 could
+-- not give the id tie-break order.
+
+BEGIN;
+SET LOCAL statement_timeout = '600s';
+
+CREATE INDEX IF NOT EXISTS songs_new_browse_name_idx         ON songs_new (name, id);
+CREATE INDEX IF NOT EXISTS songs_new_browse_artist_idx       ON songs_new (artist, id);
+CREATE INDEX IF NOT EXISTS songs_new_browse_album_idx        ON songs_new (album, id);
+CREATE INDEX IF NOT EXISTS songs_new_browse_year_idx         ON songs_new (year, id);
+CREATE INDEX IF NOT EXISTS songs_new_browse_genre_idx        ON songs_new (genre, id);
+CREATE INDEX IF NOT EXISTS songs_new_browse_song_length_idx  ON songs_new (song_length, id);
+CREATE INDEX IF NOT EXISTS songs_new_browse_last_update_idx  ON songs_new (last_update, id);
+CREATE INDEX IF NOT EXISTS songs_new_browse_scores_count_idx ON songs_new (scores_count, id);
+CREATE INDEX IF NOT EXISTS songs_new_browse_md5_idx          ON songs_new (md5, id);
+
+COMMIT;
@@ -1,4 +1,9 @@
 import os
+import threading
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import psycopg
 import pytest
 
 os.environ.setdefault("SECRET_KEY", "test")
@@ -9,6 +14,274 @@ os.environ.setdefault("DISCORD_CLIENT_ID", "test")
 os.environ.setdefault("DISCORD_CLIENT_SECRET", "test")
 os.environ.setdefault("DISCORD_REDIRECT_URI", "http://localhost/callback")
 
+
+class FakeRedis:
+    """In-memory stand-in for the redis-py calls the app makes.
+
+    Strings, hashes, lists and sorted sets are kept in ``data``; values, hash
+    fields and members are stored as bytes, like redis-py returns them by
+    default. Sorted-set scores are ignored (the app only adds score 0), so
+    members are ordered by bytes, like Redis orders equal scores. ``ttls``
+    records each key's last expiry; with ``fail`` set, pipelines raise.
+    """
+
+    def __init__(self):
+        self.data: Dict[Any, Any] = {}
+        self.ttls: Dict[Any, Optional[int]] = {}
+        self.fail = False
+
+    @staticmethod
+    def _b(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = self._b(value)
+        self.ttls[key] = ex
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def expire(self, key, seconds):
+        self.ttls[key] = seconds
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        h = self.data.setdefault(key, {})
+        if field is not None:
+            h[self._b(field)] = self._b(value)
+        for k, v in (mapping or {}).items():
+            h[self._b(k)] = self._b(v)
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(self._b(field))
+
+    def hmget(self, key, fields):
+        return [self.hget(key, field) for field in fields]
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def hincrby(self, key, field, amount):
+        h = self.data.setdefault(key, {})
+        h[self._b(field)] = self._b(int(h.get(self._b(field), b"0")) + amount)
+
+    def lpush(self, key, value):
+        self.data.setdefault(key, []).insert(0, self._b(value))
+
+    def rpush(self, key, value):
+        self.data.setdefault(key, []).append(self._b(value))
+
+    def lrange(self, key, start, end):
+        items = self.data.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    def llen(self, key):
+        return len(self.data.get(key, []))
+
+    def lrem(self, key, count, value):
+        items = self.data.get(key, [])
+        kept = [i for i in items if i != self._b(value)]
+        self.data[key] = kept
+        return len(items) - len(kept)
+
+    def blmove(self, src, dst, timeout, wherefrom, whereto):
+        items = self.data.get(src, [])
+        if not items:
+            return None
+        value = items.pop(-1 if wherefrom == "RIGHT" else 0)
+        target = self.data.setdefault(dst, [])
+        target.insert(0 if whereto == "LEFT" else len(target), value)
+        return value
+
+    def zadd(self, key, mapping):
+        self.data.setdefault(key, set()).update(self._b(member) for member in mapping)
+
+    def zrem(self, key, member):
+        self.data.get(key, set()).discard(self._b(member))
+
+    def zcard(self, key):
+        return len(self.data.get(key, ()))
+
+    def zrank(self, key, member):
+        members = sorted(self.data.get(key, ()))
+        return members.index(self._b(member)) if self._b(member) in members else None
+
+    def zrange(self, key, start, end):
+        members = sorted(self.data.get(key, ()))
+        return members[start:] if end == -1 else members[start:end + 1]
+
+
+class FakePipeline:
+    """Queues calls and runs them on ``execute()``, like a MULTI/EXEC pipeline."""
+
+    def __init__(self, redis: FakeRedis):
+        self.redis = redis
+        self.calls: List[tuple] = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        if self.redis.fail:
+            raise ConnectionError("redis down")
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class FakeQuery:
+    """A PostgREST query chain over in-memory rows.
+
+    Filters, ``order()``, ``range()`` and ``limit()`` apply as PostgREST
+    would; ``select()`` records its column list but returns whole rows.
+    """
+
+    def __init__(self, supabase: "FakeSupabase", table: str):
+        self.supabase = supabase
+        self.table = table
+        self.columns = "*"
+        self.filters: List[tuple] = []
+        self.ordering: List[tuple] = []
+        self.range_: Optional[tuple] = None
+        self.limit_: Optional[int] = None
+
+    def select(self, columns="*"):
+        self.columns = columns
+        return self
+
+    def _filter(self, op, column, value):
+        self.filters.append((op, column, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter("eq", column, value)
+
+    def in_(self, column, values):
+        return self._filter("in", column, list(values))
+
+    def gt(self, column, value):
+        return self._filter("gt", column, value)
+
+    def gte(self, column, value):
+        return self._filter("gte", column, value)
+
+    def lt(self, column, value):
+        return self._filter("lt", column, value)
+
+    def lte(self, column, value):
+        return self._filter("lte", column, value)
+
+    def order(self, column, desc=False):
+        self.ordering.append((column, desc))
+        return self
+
+    def range(self, start, end):
+        self.range_ = (start, end)
+        return self
+
+    def limit(self, count):
+        self.limit_ = count
+        return self
+
+    def matches(self, row: dict) -> bool:
+        checks = {
+            "eq": lambda a, b: a == b,
+            "in": lambda a, b: a in b,
+            "gt": lambda a, b: a > b,
+            "gte": lambda a, b: a >= b,
+            "lt": lambda a, b: a < b,
+            "lte": lambda a, b: a <= b,
+        }
+        return all(checks[op](row.get(column), value) for op, column, value in self.filters)
+
+    def values(self, op: str, column: str) -> List[Any]:
+        """The values given to every ``op`` filter on ``column``."""
+        return [value for o, c, value in self.filters if (o, c) == (op, column)]
+
+    def execute(self):
+        return self.supabase.execute(self)
+
+
+class FakeSupabase:
+    """In-memory Supabase client.
+
+    ``tables`` holds each table's rows and ``rpcs`` a handler per function,
+    called with the params. Executed queries are recorded in ``queries`` and
+    RPCs as ``(name, params)`` in ``rpc_calls``; ``on_execute(query)`` runs
+    before each query is answered, e.g. to fail or hold it.
+    """
+
+    def __init__(
+        self,
+        tables: Optional[Dict[str, List[dict]]] = None,
+        rpcs: Optional[Dict[str, Callable[[dict], Any]]] = None,
+        on_execute: Optional[Callable[[FakeQuery], None]] = None,
+    ):
+        self.tables = tables or {}
+        self.rpcs = rpcs or {}
+        self.on_execute = on_execute
+        self.queries: List[FakeQuery] = []
+        self.rpc_calls: List[tuple] = []
+        self.lock = threading.Lock()
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: dict):
+        def execute():
+            self.rpc_calls.append((name, params))
+            return SimpleNamespace(data=self.rpcs[name](params))
+        return SimpleNamespace(execute=execute)
+
+    def reads(self, table: str) -> List[FakeQuery]:
+        return [query for query in self.queries if query.table == table]
+
+    def execute(self, query: FakeQuery):
+        with self.lock:
+            self.queries.append(query)
+        if self.on_execute is not None:
+            self.on_execute(query)
+        found = [row for row in self.tables.get(query.table, []) if query.matches(row)]
+        for column, desc in reversed(query.ordering):
+            found.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        if query.range_ is not None:
+            found = found[query.range_[0]:query.range_[1] + 1]
+        if query.limit_ is not None:
+            found = found[:query.limit_]
+        return SimpleNamespace(data=found)
+
+
+@pytest.fixture
+def fake_redis() -> FakeRedis:
+    return FakeRedis()
+
+
+@pytest.fixture
+def fake_supabase() -> type[FakeSupabase]:
+    """The :class:`FakeSupabase` class, for tests that build their own clients."""
+    return FakeSupabase
+
+
 @pytest.fixture
 def jwt_secret() -> str:
-    return os.environ["JWT_SECRET"]
\ No newline at end of file
+    return os.environ["JWT_SECRET"]
+
+
+@pytest.fixture
+def db() -> Iterator[psycopg.Connection]:
+    """A connection to ``TEST_DATABASE_URL`` (migrations applied) that rolls back; skips without one."""
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    with psycopg.connect(url) as conn:
+        try:
+            yield conn
+        finally:
+            conn.rollback()
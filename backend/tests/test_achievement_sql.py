@@ -0,0 +1,45 @@
+"""bulk_update_achievements against a real database (see ``db`` in conftest)."""
+
+import json
+
+import psycopg
+
+USER_ID = "900000000000000017"
+COUNTERS = {"version": "v", "scores": 1, "fcs": 0, "counts": {}, "evaluated_at": "2026-07-01T00:00:00+00:00"}
+SCORE = {"identifier": "a" * 32, "score": 1000, "percent": 100.0, "is_fc": False, "speed": 100}
+
+
+def add_user(db: psycopg.Connection) -> str:
+    db.execute(
+        "INSERT INTO users (id, username, scores, achievements, achievement_counters)"
+        " VALUES (%s, 'backfill test', ARRAY[%s::jsonb], %s::jsonb, %s::jsonb)",
+        (USER_ID, json.dumps(SCORE), json.dumps({"upload": "t1"}), json.dumps(COUNTERS)),
+    )
+    row = db.execute("SELECT achievement_scores_digest(u) FROM users u WHERE id = %s", (USER_ID,)).fetchone()
+    assert row is not None
+    return row[0]
+
+
+def backfill(db: psycopg.Connection, digest: str) -> tuple:
+    counters = {**COUNTERS, "evaluated_at": "backfill"}
+    db.execute("SELECT bulk_update_achievements(%s::jsonb)", (json.dumps([{
+        "id": USER_ID, "achievements": {"backfill": "t2"}, "achievement_counters": counters,
+        "scores_digest": digest,
+    }]),))
+    row = db.execute(
+        "SELECT achievements, achievement_counters->>'evaluated_at' FROM users WHERE id = %s", (USER_ID,)
+    ).fetchone()
+    assert row is not None
+    return row
+
+
+def test_backfill_merges_achievements_and_writes_counters_for_unchanged_scores(db):
+    digest = add_user(db)
+
+    assert backfill(db, digest) == ({"upload": "t1", "backfill": "t2"}, "backfill")
+
+
+def test_backfill_keeps_counters_of_an_upload_that_changed_scores(db):
+    add_user(db)
+
+    assert backfill(db, "stale digest") == ({"upload": "t1", "backfill": "t2"}, COUNTERS["evaluated_at"])
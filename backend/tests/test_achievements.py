@@ -1,10 +1,16 @@
+import gzip
 import json
+import random
 from types import SimpleNamespace
+from typing import List, Optional
 
 from flask import Flask
 
 from app.api import achievements as achievements_module
 from app.api import users as users_module
+from app.types import AchievementCounters
+from app.utils.achievement_catalog import achievement_catalog
+from app.utils.achievement_index import ScoreIndex, score_changes
 from app.utils.achievement_processor import achievement_processor
 
 
@@ -71,6 +77,40 @@ def test_both_endpoints_return_identical_definitions(monkeypatch):
         assert d["timestamp"] is None
 
 
+def test_catalog_is_served_with_a_strong_etag_and_gzip(monkeypatch):
+    client = make_client(monkeypatch, {})
+
+    plain = client.get("/api/achievements")
+    etag = plain.headers["ETag"]
+    assert not etag.startswith("W/")
+    assert client.get("/api/achievements", headers={"If-None-Match": etag}).status_code == 304
+
+    zipped = client.get("/api/achievements", headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert zipped.headers["ETag"] != etag
+    assert gzip.decompress(zipped.data) == plain.data
+
+
+def test_user_achievements_overlay_is_cached_by_achievements(monkeypatch):
+    first_id, second_id = achievement_catalog.ids[:2]
+    earned = {first_id: "2026-01-01T00:00:00+00:00", "retired": "2020-01-01T00:00:00+00:00"}
+    client = make_client(monkeypatch, {"users": [{"achievements": earned}]})
+
+    response = client.get("/api/user/123/achievements")
+    defs = {d["id"]: d for d in json.loads(response.data)["achievements"]}
+    assert defs[first_id]["achieved"] is True
+    assert defs[first_id]["timestamp"] == earned[first_id]
+    assert defs[second_id]["achieved"] is False
+    assert "retired" not in defs
+
+    assert achievement_catalog.user_payload(dict(earned)) is achievement_catalog.user_payload(earned)
+    headers = {"If-None-Match": response.headers["ETag"]}
+    assert client.get("/api/user/123/achievements", headers=headers).status_code == 304
+
+    compact = json.loads(client.get("/api/user/123/achievements?view=achieved").data)
+    assert compact == {"catalog_etag": achievement_catalog.payload.etag, "achieved": {first_id: earned[first_id]}}
+
+
 def test_null_stats_produces_no_errors():
     achievements, errors = achievement_processor.process_achievements({
         "id": "u1",
@@ -106,3 +146,154 @@ def test_null_string_fields_in_scores_produce_no_errors():
     })
 
     assert errors == []
+
+
+def legacy_check(user, a):
+    """The per-score loops the indexed checks replaced, kept as the reference."""
+    scores = user.get("scores", [])
+    stats = user.get("stats") or {}
+    check = a["check_function"].__name__
+    if check == "_check_first_score":
+        return len(scores) > 0
+    if check == "_check_total_score":
+        return stats.get("total_score", 0) >= a["threshold"]
+    if check == "_check_first_fc":
+        return any(s.get("is_fc", False) for s in scores)
+    if check == "_check_total_fcs":
+        return stats.get("total_fcs", 0) >= a["threshold"]
+    if check == "_check_charter_count":
+        wanted = [c.lower() for c in a["charter_refs"]]
+        count = sum(1 for s in scores if s.get("charter_refs")
+                    and any(w in [c.lower() for c in s["charter_refs"]] for w in wanted))
+        return count >= a["threshold"]
+    if check == "_check_remix_count":
+        count = sum(1 for s in scores
+                    if any(r.lower() in (s.get("artist") or "").lower() for r in a["remix_artists"]))
+        return count >= a["threshold"]
+    if check == "_check_recharts_count":
+        official = [c.lower() for c in a["recharts_charter_refs"]]
+        count = 0
+        for s in scores:
+            if not s.get("charter_refs"):
+                continue
+            refs = [c.lower() for c in s["charter_refs"]]
+            if any(r in official for r in refs) and any(r not in official for r in refs):
+                count += 1
+        return count >= a["threshold"]
+    if check == "_check_funny_number":
+        return any(s.get("score") == a.get("score", 69420) for s in scores)
+    if check == "_check_album":
+        return any((s.get("song_name") or "").lower().find("album") != -1 for s in scores)
+    if check == "_check_discography":
+        return any("Discography" in (s.get("song_name") or "") for s in scores)
+    assert check == "_check_song_achievement"
+    md5s = a["song_md5"] if isinstance(a["song_md5"], list) else [a["song_md5"]]
+    best = None
+    for s in scores:
+        if s.get("identifier") in md5s:
+            if (best is None or (a["requires_fc"] and s.get("is_fc", False)) or
+                    (not a["requires_fc"] and s.get("percent", 0) > best.get("percent", 0))):
+                best = s
+    if best:
+        if a["requires_fc"] and best.get("is_fc", False):
+            return True
+        if not a["requires_fc"] and best.get("percent", 0) >= a["threshold"]:
+            return True
+    return False
+
+
+CHARTERS = ["Onyxite", "boo", "XANE60", "Dichotic", "rhythmassacre", "Harmonix", "Neversoft",
+            "tomato", "Jameos", "someone", "Fairwood Studios"]
+ARTISTS = ["Xane60", "Luke Holland feat. X", "Band", None, "soundhaven"]
+NAMES = ["Song", "Full Album", "The Discography", None, "album (live)"]
+
+
+def achievement_song_md5s():
+    return [
+        md5
+        for a in achievement_processor.achievements if "song_md5" in a
+        for md5 in (a["song_md5"] if isinstance(a["song_md5"], list) else [a["song_md5"]])
+    ]
+
+
+def random_score(rng, md5):
+    return {
+        "identifier": md5,
+        "score": rng.choice([69420, 1000, 250_000]),
+        "percent": rng.choice([90, 96, 97.5, 98, 99, 100]),
+        "is_fc": rng.random() < 0.3,
+        "speed": 100,
+        "artist": rng.choice(ARTISTS),
+        "song_name": rng.choice(NAMES),
+        "charter_refs": rng.sample(CHARTERS, rng.randint(0, 3)) or rng.choice([None, []]),
+    }
+
+
+def test_indexed_checks_match_the_per_score_loops():
+    rng = random.Random(14)
+    song_md5s = achievement_song_md5s()
+
+    for _ in range(40):
+        md5s = rng.sample(song_md5s, 60) + [f"other{i}" for i in range(40)]
+        scores = [random_score(rng, md5) for md5 in md5s[:rng.randint(0, len(md5s))]]
+        user = {"id": "u", "scores": scores, "achievements": {},
+                "stats": {"total_score": rng.choice([0, 20_000_000]), "total_fcs": rng.randint(0, 60)}}
+
+        earned, errors = achievement_processor.process_achievements(user)
+
+        assert errors == []
+        expected = {a["id"] for a in achievement_processor.achievements if legacy_check(user, a)}
+        assert set(earned) == expected
+
+
+def test_incremental_evaluation_matches_a_full_one():
+    rng = random.Random(15)
+    song_md5s = achievement_song_md5s()
+
+    for _ in range(40):
+        md5s = rng.sample(song_md5s, 40) + [f"other{i}" for i in range(20)]
+        before = [random_score(rng, md5) for md5 in md5s[:rng.randint(0, 30)]]
+        stats = {"total_score": 0, "total_fcs": rng.randint(0, 60)}
+        earned, _, counters = achievement_processor.process_achievements_incremental(
+            {"id": "u", "scores": before, "achievements": {}, "stats": stats}, [], None
+        )
+
+        after = [s for s in before if rng.random() < 0.7]
+        after = [random_score(rng, s["identifier"]) if rng.random() < 0.3 else s for s in after]
+        after += [random_score(rng, md5) for md5 in md5s[30:30 + rng.randint(0, 30)]]
+        user = {"id": "u", "scores": after, "achievements": earned,
+                "stats": {"total_score": rng.choice([0, 20_000_000]), "total_fcs": rng.randint(0, 60)}}
+
+        achievements, errors, advanced = achievement_processor.process_achievements_incremental(
+            user, score_changes(before, after), counters
+        )
+
+        assert errors == []
+        assert set(achievements) == set(achievement_processor.process_achievements(user)[0])
+        assert {k: achievements[k] for k in earned} == earned
+        full = achievement_processor.achievement_counters(ScoreIndex(user))
+        assert {k: v for k, v in advanced.items() if k != "evaluated_at"} == {
+            k: v for k, v in full.items() if k != "evaluated_at"
+        }
+
+
+def test_incremental_evaluation_falls_back_without_usable_counters(monkeypatch):
+    user = {"id": "u", "scores": [random_score(random.Random(0), "x")], "achievements": {}, "stats": {}}
+    full_runs = []
+    original = achievement_processor.process_achievements
+    monkeypatch.setattr(
+        achievement_processor, "process_achievements", lambda data: full_runs.append(data) or original(data)
+    )
+    changes = score_changes([], user["scores"])
+    counters = achievement_processor.achievement_counters(ScoreIndex({"scores": []}))
+
+    achievement_processor.process_achievements_incremental(user, changes, counters)
+    assert full_runs == []
+
+    stale_counters: List[Optional[AchievementCounters]] = [
+        None, AchievementCounters(counters, version="old"), AchievementCounters(counters, scores=3),
+    ]
+    for stale in stale_counters:
+        _, _, refreshed = achievement_processor.process_achievements_incremental(user, changes, stale)
+        assert refreshed["scores"] == 1
+    assert len(full_runs) == 3
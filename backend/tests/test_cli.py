@@ -1,3 +1,4 @@
+import json
 from types import SimpleNamespace
 
 from flask import Flask
@@ -14,6 +15,8 @@ class FakeQuery:
         self._range = None
         self._in = None
         self._eq = {}
+        self._gt = None
+        self._limit = None
         self._payload = None
 
     def select(self, cols):
@@ -38,6 +41,17 @@ class FakeQuery:
         self._range = (start, end)
         return self
 
+    def gt(self, col, val):
+        self._gt = (col, val)
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def order(self, *a):
+        return self
+
     def execute(self):
         if self.op == "update":
             if self.table_name == "users":
@@ -48,6 +62,11 @@ class FakeQuery:
 
         if self.table_name == "users":
             data = self.holder.users
+            if self._gt is not None:
+                col, val = self._gt
+                data = [row for row in data if row[col] > val]
+            if self._limit is not None:
+                data = data[:self._limit]
             if self._range is not None:
                 start, end = self._range
                 data = data[start:end + 1]
@@ -59,9 +78,24 @@ class FakeQuery:
 
         if self.table_name == "songs_new":
             _, wanted = self._in or ("md5", [])
-            matched = [s for s in self.holder.songs if s["md5"] in wanted]
+            matched = [
+                {k: v for k, v in s.items() if k != "leaderboard"}
+                for s in self.holder.songs if s["md5"] in wanted
+            ]
             return SimpleNamespace(data=matched)
 
+        if self.table_name == "leaderboard_ranked":
+            _, wanted = self._in or ("md5", [])
+            entries = [
+                {**entry, "md5": s["md5"], "rank": rank}
+                for s in self.holder.songs if s["md5"] in wanted
+                for rank, entry in enumerate(s.get("leaderboard") or [], 1)
+            ]
+            if self._range is not None:
+                start, end = self._range
+                entries = entries[start:end + 1]
+            return SimpleNamespace(data=entries)
+
         return SimpleNamespace(data=[])
 
 
@@ -89,7 +123,10 @@ class FakeSupabase:
     def table(self, name: str) -> FakeQuery:
         return FakeQuery(name, self.holder)
 
-    def rpc(self, name: str, params: dict) -> FakeRpc:
+    def rpc(self, name: str, params: dict):
+        if name == "bulk_update_achievements":
+            self.holder.achievement_batches.append(params["updates"])
+            return SimpleNamespace(execute=lambda: SimpleNamespace(data=len(params["updates"])))
         assert name == "bulk_update_leaderboards", name
         return FakeRpc(self.holder, params)
 
@@ -241,3 +278,73 @@ def test_promote_unknown_scores_dry_run_writes_nothing(monkeypatch):
     assert result.exit_code == 0, result.output
     assert holder.user_updates == {}
     assert holder.song_updates == {}
+
+
+def backfill_holder(user_count: int) -> SimpleNamespace:
+    """Users u00.. in id order; every even one has a score that earns first_score."""
+    return SimpleNamespace(
+        users=[
+            {
+                "id": f"u{i:02d}",
+                "scores": [unknown("a", 1000, f"u{i:02d}")] if i % 2 == 0 else [],
+                "stats": {},
+                "achievements": {},
+                "achievement_scores_digest": f"digest-u{i:02d}",
+            }
+            for i in range(user_count)
+        ],
+        achievement_batches=[],
+    )
+
+
+def run_backfill(monkeypatch, holder, *args):
+    monkeypatch.setattr(cli_module, "get_supabase", lambda: FakeSupabase(holder))
+    app = Flask(__name__)
+    cli_module.register_cli(app)
+    result = app.test_cli_runner().invoke(args=["backfill-achievements", "--workers", "0", *args])
+    assert result.exit_code == 0, result.output
+    return result
+
+
+def test_backfill_achievements_writes_only_changed_users_in_batches(monkeypatch, tmp_path):
+    holder = backfill_holder(10)
+    holder.users[2]["achievements"] = {"first_score": "2026-01-01T00:00:00+00:00"}
+    checkpoint = tmp_path / "checkpoint.json"
+
+    result = run_backfill(
+        monkeypatch, holder, "--no-dry-run", "--page-size", "4", "--batch-size", "2", "--checkpoint", str(checkpoint)
+    )
+
+    written = [update["id"] for batch in holder.achievement_batches for update in batch]
+    assert written == ["u00", "u04", "u06", "u08"]
+    # the digest read with the page guards the counters against a concurrent upload
+    assert [u["scores_digest"] for b in holder.achievement_batches for u in b] == [
+        "digest-u00", "digest-u04", "digest-u06", "digest-u08",
+    ]
+    assert max(len(batch) for batch in holder.achievement_batches) <= 2
+    assert all("first_score" in u["achievements"] for b in holder.achievement_batches for u in b)
+    assert json.loads(checkpoint.read_text())["last_id"] == "u09"
+    assert "users/s" in result.output
+
+
+def test_backfill_achievements_dry_run_writes_nothing(monkeypatch, tmp_path):
+    holder = backfill_holder(4)
+    checkpoint = tmp_path / "checkpoint.json"
+
+    result = run_backfill(monkeypatch, holder, "--checkpoint", str(checkpoint))
+
+    assert holder.achievement_batches == []
+    assert not checkpoint.exists()
+    assert "2 of 4 user(s) would change" in result.output
+
+
+def test_backfill_achievements_resumes_after_the_checkpoint(monkeypatch, tmp_path):
+    holder = backfill_holder(10)
+    checkpoint = tmp_path / "checkpoint.json"
+    checkpoint.write_text(json.dumps({"last_id": "u05", "scanned": 6, "changed": 3, "granted": 3, "errors": 0}))
+
+    run_backfill(monkeypatch, holder, "--no-dry-run", "--resume", "--checkpoint", str(checkpoint))
+
+    written = [update["id"] for batch in holder.achievement_batches for update in batch]
+    assert written == ["u06", "u08"]
+    assert json.loads(checkpoint.read_text())["scanned"] == 10
@@ -0,0 +1,47 @@
+import pytest
+from flask import Flask
+
+from app.services import cpu_pool
+from app.utils.achievement_processor import achievement_processor, process_user_achievements
+
+USER_DATA = {
+    "id": "u1",
+    "scores": [{"identifier": "a", "score": 69420, "is_fc": True, "percent": 100, "speed": 100}],
+    "unknown_scores": [],
+    "stats": {"total_score": 69420, "total_fcs": 1},
+    "achievements": {},
+}
+
+
+@pytest.fixture
+def pool_app():
+    app = Flask(__name__)
+    app.config["CPU_POOL_SIZE"] = 1
+    app.config["CPU_POOL_MAX_PENDING"] = 1
+    yield app
+    cpu_pool.shutdown_cpu_pool()
+
+
+def test_pool_size_zero_runs_inline(monkeypatch):
+    app = Flask(__name__)
+    app.config["CPU_POOL_SIZE"] = 0
+    monkeypatch.setattr(cpu_pool, "_get_pool", lambda *a: pytest.fail("pool should not start"))
+
+    with app.app_context():
+        assert cpu_pool.run_cpu_bound(sum, [1, 2, 3]) == 6
+
+
+def test_achievements_evaluated_in_pool_match_inline(pool_app):
+    with pool_app.app_context():
+        pooled, pooled_errors = cpu_pool.run_cpu_bound(process_user_achievements, USER_DATA)
+
+    inline, inline_errors = achievement_processor.process_achievements(USER_DATA)
+    assert pooled_errors == inline_errors == []
+    assert set(pooled) == set(inline)
+    assert {"first_score", "first_fc", "funny_numbers"} <= set(pooled)
+
+
+def test_pool_reraises_worker_exceptions(pool_app):
+    with pool_app.app_context():
+        with pytest.raises(ValueError):
+            cpu_pool.run_cpu_bound(int, "not a number")
@@ -0,0 +1,115 @@
+from app.services import ingest_queue
+from app.services.ingest_queue import (
+    DEAD_KEY,
+    PROCESSING_KEY,
+    QUEUE_KEY,
+    enqueue_ingest_job,
+    get_ingest_job,
+    queue_counts,
+    retry_dead_job,
+    requeue_stale_jobs,
+    run_worker,
+)
+
+
+RESULT = {"version": 20211009, "songs": [{"identifier": "a", "play_count": 1, "scores": []}]}
+
+
+def job_of(r, job_id) -> dict:
+    job = get_ingest_job(r, job_id)
+    assert job is not None
+    return job
+
+
+def test_enqueue_records_job_and_payload(fake_redis):
+    job_id = enqueue_ingest_job(fake_redis, "u1", RESULT, "abc")
+
+    job = job_of(fake_redis, job_id)
+    assert job["upload_digest"] == "abc"
+    assert job["user_id"] == "u1"
+    assert job["status"] == "queued"
+    assert job["attempts"] == 0
+    assert job["total_songs"] == "1"
+    assert queue_counts(fake_redis) == {"queue": 1, "processing": 0, "dead": 0}
+
+
+def test_worker_runs_jobs_in_fifo_order_and_cleans_up(fake_redis):
+    first = enqueue_ingest_job(fake_redis, "u1", RESULT)
+    second = enqueue_ingest_job(fake_redis, "u2", RESULT)
+    seen = []
+
+    def handler(result, user_id, digest, heartbeat):
+        seen.append((user_id, result))
+        return True
+
+    handled = run_worker(fake_redis, handler, lambda *_: None, max_jobs=5, log=lambda _msg: None)
+
+    assert handled == 2
+    assert seen == [("u1", RESULT), ("u2", RESULT)]
+    assert job_of(fake_redis, first)["status"] == "completed"
+    assert job_of(fake_redis, second)["status"] == "completed"
+    assert fake_redis.get(ingest_queue.PAYLOAD_KEY.format(job_id=first)) is None
+    assert queue_counts(fake_redis) == {"queue": 0, "processing": 0, "dead": 0}
+
+
+def test_failing_job_is_retried_then_dead_lettered(fake_redis):
+    job_id = enqueue_ingest_job(fake_redis, "u1", RESULT)
+    dead = []
+
+    def boom(result, user_id, digest, heartbeat):
+        raise RuntimeError("supabase down")
+
+    run_worker(fake_redis, boom, lambda user_id, error: dead.append((user_id, error)),
+               max_jobs=10, log=lambda _msg: None)
+
+    job = job_of(fake_redis, job_id)
+    assert job["attempts"] == ingest_queue.MAX_ATTEMPTS
+    assert job["status"] == "dead"
+    assert job["error"] == "supabase down"
+    assert dead == [("u1", "supabase down")]
+    assert fake_redis.lrange(DEAD_KEY, 0, -1) == [job_id.encode()]
+
+    assert retry_dead_job(fake_redis, job_id)
+    assert job_of(fake_redis, job_id)["attempts"] == 0
+    assert fake_redis.lrange(QUEUE_KEY, 0, -1) == [job_id.encode()]
+
+
+def test_stale_processing_job_is_requeued(fake_redis):
+    job_id = enqueue_ingest_job(fake_redis, "u1", RESULT)
+    ingest_queue.claim_next_job(fake_redis)
+    assert fake_redis.lrange(PROCESSING_KEY, 0, -1) == [job_id.encode()]
+
+    assert requeue_stale_jobs(fake_redis, stale_after=3600) == []
+    assert requeue_stale_jobs(fake_redis, stale_after=-1) == [job_id]
+    assert fake_redis.lrange(QUEUE_KEY, 0, -1) == [job_id.encode()]
+    assert job_of(fake_redis, job_id)["status"] == "queued"
+
+
+def test_unsuccessful_job_is_retried_then_dead_lettered(fake_redis):
+    job_id = enqueue_ingest_job(fake_redis, "u1", RESULT)
+    dead = []
+
+    run_worker(fake_redis, lambda *_: False, lambda user_id, error: dead.append(user_id),
+               max_jobs=10, log=lambda _msg: None)
+
+    assert job_of(fake_redis, job_id)["status"] == "dead"
+    assert job_of(fake_redis, job_id)["attempts"] == ingest_queue.MAX_ATTEMPTS
+    assert dead == ["u1"]
+
+
+def test_heartbeat_keeps_long_job_from_going_stale(fake_redis, monkeypatch):
+    job_id = enqueue_ingest_job(fake_redis, "u1", RESULT)
+    monkeypatch.setattr(ingest_queue, "HEARTBEAT_INTERVAL_SECONDS", 0)
+    requeued = []
+
+    def handler(result, user_id, digest, heartbeat):
+        # claimed long ago, but still reporting progress
+        fake_redis.hset(ingest_queue.JOB_KEY.format(job_id=job_id), "claimed_ts", 0)
+        heartbeat()
+        requeued.extend(requeue_stale_jobs(fake_redis, stale_after=3600))
+        return True
+
+    run_worker(fake_redis, handler, lambda *_: None, max_jobs=1, log=lambda _msg: None)
+
+    assert requeued == []
+    assert job_of(fake_redis, job_id)["status"] == "completed"
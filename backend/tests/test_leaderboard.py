@@ -1,4 +1,7 @@
-from app.utils.leaderboard import sort_and_rank_leaderboard
+import random
+
+from app.utils import leaderboard as leaderboard_module
+from app.utils.leaderboard import RankedLeaderboard, sort_and_rank_leaderboard
 from app.types import LeaderboardEntry
 
 
@@ -8,16 +11,16 @@ def entry(
     posted: str = "2025-01-01T00:00:00+00:00",
     user_id: str = "1",
 ) -> LeaderboardEntry:
-    return {
-        "user_id": user_id,
-        "username": f"user_{user_id}",
-        "score": score,
-        "percent": 100.0,
-        "is_fc": False,
-        "speed": speed,
-        "play_count": 1,
-        "posted": posted,
-    }
+    return LeaderboardEntry(
+        user_id=user_id,
+        username=f"user_{user_id}",
+        score=score,
+        percent=100.0,
+        is_fc=False,
+        speed=speed,
+        play_count=1,
+        posted=posted,
+    )
 
 def test_higher_score_ranks_first():
     lb = sort_and_rank_leaderboard([entry(100), entry(300), entry(200)])
@@ -56,3 +59,46 @@ def test_earlier_post_wins_score_tie():
 def test_malformed_posted_date_does_not_crash():
     lb = sort_and_rank_leaderboard([entry(500, posted="not-a-date"), entry(400)])
     assert len(lb) == 2
+
+
+def test_incremental_upserts_match_full_resort():
+    rng = random.Random(7)
+    board = RankedLeaderboard([])
+    reference = []
+    for _ in range(300):
+        e = entry(
+            rng.choice([100, 200, 300, 400]),
+            speed=rng.choice([50, 90, 100, 150]),
+            posted=rng.choice(["2025-01-01T00:00:00+00:00", "2025-06-01T00:00:00+00:00"]),
+            user_id=str(rng.randrange(40)),
+        )
+        board.upsert(LeaderboardEntry(e))
+        reference = [r for r in reference if r["user_id"] != e["user_id"]] + [LeaderboardEntry(e)]
+        reference = sort_and_rank_leaderboard(reference)
+
+        assert [(r["user_id"], r.get("rank")) for r in board] == [(r["user_id"], r.get("rank")) for r in reference]
+
+def test_ranked_input_only_computes_probed_keys(monkeypatch):
+    ranked = sort_and_rank_leaderboard([entry(1000 + i, user_id=str(i)) for i in range(1024)])
+    calls = []
+    real_key = leaderboard_module.leaderboard_sort_key
+    monkeypatch.setattr(leaderboard_module, "leaderboard_sort_key", lambda e: calls.append(e) or real_key(e))
+
+    board = RankedLeaderboard(ranked)
+    rank = board.upsert(entry(1500, user_id="new"))
+
+    assert board.entries is ranked
+    assert rank == 525  # after the 523 higher scores and the existing 1500
+    assert len(calls) <= 12
+    assert [e.get("rank") for e in board] == list(range(1, 1026))
+
+def test_moving_an_entry_only_renumbers_the_span_it_crossed():
+    board = RankedLeaderboard(sort_and_rank_leaderboard([entry(100 * i, user_id=str(i)) for i in range(1, 6)]))
+    untouched = board.entries[0]
+    untouched["rank"] = -1  # would be overwritten if renumbered
+
+    board.upsert(entry(250, user_id="1"))
+
+    assert [e["user_id"] for e in board] == ["5", "4", "3", "1", "2"]
+    assert [e.get("rank") for e in board.entries[1:]] == [2, 3, 4, 5]
+    assert untouched.get("rank") == -1
@@ -0,0 +1,159 @@
+import random
+from datetime import datetime, timedelta, UTC
+
+from app.services import leaderboard_mirror
+from app.services.leaderboard_mirror import (
+    MIRROR_KEY,
+    forget_leaderboard,
+    get_mirrored_around,
+    get_mirrored_page,
+    get_mirrored_rank,
+    mirror_entry,
+    mirror_leaderboards,
+    mirror_member,
+    mirror_merged_scores,
+    mirrored_size,
+    rebuild_leaderboard_mirror,
+)
+from app.types import LeaderboardEntry, LeaderboardScore
+from app.utils.leaderboard import leaderboard_sort_key
+
+
+START = datetime(2026, 1, 1, tzinfo=UTC)
+
+
+def entry(user_id, score, speed=100, minutes=0, username=None) -> LeaderboardEntry:
+    return LeaderboardEntry(user_id=user_id, username=username or f"user_{user_id}", score=score,
+                            percent=100.0, is_fc=False, speed=speed, play_count=1,
+                            posted=(START + timedelta(minutes=minutes)).isoformat())
+
+
+def by_member(entries):
+    return [e["user_id"] for e in sorted(entries, key=lambda e: mirror_member(e).encode())]
+
+
+def test_member_order_matches_the_database_order():
+    rng = random.Random(7)
+    entries = [
+        entry(str(i), rng.choice([0, 500, 999_999, 12_345_678]), rng.choice([50, 90, 100, 150, 200]),
+              minutes=rng.randrange(0, 100))
+        for i in range(300)
+    ]
+
+    # rank_bucket, rank_primary, rank_secondary, rank_posted, user_id, all DESC
+    expected = sorted(entries, key=lambda e: (leaderboard_sort_key(e), e["user_id"]), reverse=True)
+
+    assert by_member(entries) == [e["user_id"] for e in expected]
+
+
+def test_ties_go_to_the_higher_user_id():
+    assert by_member([entry("1", 900), entry("12", 900), entry("2", 900)]) == ["2", "12", "1"]
+
+
+def test_missing_posted_sorts_after_every_posted_tie():
+    unposted = LeaderboardEntry(entry("9", 900), posted="")
+
+    assert by_member([unposted, entry("1", 900, minutes=10 ** 7)]) == ["1", "9"]
+
+
+def test_mirrored_reads_serve_rank_pages_and_neighbours(fake_redis):
+    board = [entry(str(i), 1000 - i) for i in range(1, 21)]
+    assert mirror_leaderboards(fake_redis, {"a": board})
+
+    assert mirrored_size(fake_redis, "a") == 20
+    assert get_mirrored_rank(fake_redis, "a", "7") == 7
+    assert get_mirrored_rank(fake_redis, "a", "99") is None
+
+    page = get_mirrored_page(fake_redis, "a", 5, 3)
+    assert page is not None
+    assert [(e["user_id"], e.get("rank")) for e in page] == [("6", 6), ("7", 7), ("8", 8)]
+    assert page[0]["username"] == "user_6"
+    assert "member" not in page[0]
+
+    around = get_mirrored_around(fake_redis, "a", "2", 2)
+    assert around is not None
+    assert [e.get("rank") for e in around] == [1, 2, 3, 4]
+    assert get_mirrored_around(fake_redis, "a", "99", 2) == []
+
+
+def test_unmirrored_songs_read_as_none(fake_redis):
+
+    assert mirrored_size(fake_redis, "a") is None
+    assert get_mirrored_page(fake_redis, "a", 0, 10) is None
+    assert get_mirrored_around(fake_redis, "a", "1", 5) is None
+
+
+def test_entry_replaces_its_users_member(fake_redis):
+    mirror_leaderboards(fake_redis, {"a": [entry("1", 900), entry("2", 800)]})
+
+    assert mirror_entry(fake_redis, "a", entry("2", 950))
+
+    assert get_mirrored_rank(fake_redis, "a", "2") == 1
+    assert mirrored_size(fake_redis, "a") == 2
+    page = get_mirrored_page(fake_redis, "a", 0, 10)
+    assert page is not None
+    assert [e["score"] for e in page] == [950, 900]
+
+
+def test_entry_is_not_mirrored_on_its_own(fake_redis):
+
+    assert not mirror_entry(fake_redis, "a", entry("1", 900))
+    assert not fake_redis.exists(MIRROR_KEY.format(md5="a"))
+
+
+def test_emptied_leaderboard_drops_its_mirror(fake_redis):
+    mirror_leaderboards(fake_redis, {"a": [entry("1", 900)]})
+
+    mirror_leaderboards(fake_redis, {"a": []})
+
+    assert mirrored_size(fake_redis, "a") is None
+
+
+def test_forgotten_leaderboard_is_no_longer_mirrored(fake_redis):
+    mirror_leaderboards(fake_redis, {"a": [entry("1", 900)], "b": [entry("1", 900)]})
+
+    assert forget_leaderboard(fake_redis, "a")
+
+    assert mirrored_size(fake_redis, "a") is None
+    assert get_mirrored_rank(fake_redis, "a", "1") is None
+    assert mirrored_size(fake_redis, "b") == 1
+
+
+def test_mirror_failures_are_swallowed(fake_redis):
+    fake_redis.fail = True
+
+    assert not mirror_leaderboards(fake_redis, {"a": [entry("1", 900)]})
+
+
+def test_merged_scores_mirror_only_updated_rows(fake_redis):
+    mirror_leaderboards(fake_redis, {"a": [entry("2", 800)], "b": [entry("2", 800)]})
+    scores = [LeaderboardScore(md5=md5, score=900, percent=100.0, is_fc=True, speed=100,
+                               play_count=2, posted=START.isoformat()) for md5 in ("a", "b")]
+
+    mirror_merged_scores(fake_redis, "1", "one", scores, [
+        {"md5": "a", "rank": 1, "updated": True},
+        {"md5": "b", "rank": 2, "updated": False},
+    ])
+
+    assert get_mirrored_rank(fake_redis, "a", "1") == 1
+    page = get_mirrored_page(fake_redis, "a", 0, 1)
+    assert page is not None
+    assert page[0]["username"] == "one"
+    assert get_mirrored_rank(fake_redis, "b", "1") is None
+
+
+def test_rebuild_mirrors_songs_from_postgres(fake_redis, monkeypatch):
+    mirror_leaderboards(fake_redis, {"gone": [entry("1", 1)]})
+    boards = {"a": [entry("1", 900), entry("2", 800)]}
+    monkeypatch.setattr(
+        leaderboard_mirror, "fetch_leaderboards",
+        lambda supabase, md5s, concurrency: {md5: boards[md5] for md5 in md5s if md5 in boards},
+    )
+    logged = []
+
+    mirrored = rebuild_leaderboard_mirror(fake_redis, None, ["a", "gone"], batch_size=1, log=logged.append)
+
+    assert mirrored == 1
+    assert get_mirrored_rank(fake_redis, "a", "2") == 2
+    assert mirrored_size(fake_redis, "gone") is None
+    assert len(logged) == 2
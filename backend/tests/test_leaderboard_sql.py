@@ -0,0 +1,28 @@
+"""Checks against a real database with the migrations applied.
+
+Set ``TEST_DATABASE_URL`` to run them; every test rolls back its changes.
+"""
+
+import json
+
+import psycopg
+
+
+def merge(db: psycopg.Connection, user_id: str, md5: str, score: int):
+    scores = [{"md5": md5, "score": score, "percent": 99.0, "is_fc": False, "speed": 100,
+               "play_count": 1, "posted": "2026-07-01T00:00:00+00:00"}]
+    return db.execute(
+        "SELECT md5, rank, updated FROM merge_leaderboard_scores(%s, %s, %s::jsonb)",
+        (user_id, user_id, json.dumps(scores)),
+    ).fetchall()
+
+
+def test_merge_returns_the_rank_after_the_write(db):
+    md5 = "0" * 31 + "t"
+    db.execute("INSERT INTO songs_new (md5, name) VALUES (%s, 'Merge rank test')", (md5,))
+
+    # a first entry is ranked, not NULL
+    assert merge(db, "merge-test-a", md5, 1000) == [(md5, 1, True)]
+    # a new best moves ahead of it straight away
+    assert merge(db, "merge-test-b", md5, 2000) == [(md5, 1, True)]
+    assert merge(db, "merge-test-a", md5, 500) == [(md5, 2, False)]
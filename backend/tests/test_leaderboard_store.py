@@ -0,0 +1,172 @@
+import json
+from typing import Optional
+
+from flask import Flask
+
+from app.api import leaderboards as leaderboards_module
+from app.services import leaderboard_store
+from app.services.leaderboard_store import fetch_leaderboards
+
+
+def leaderboard_db(fake_supabase, songs=(), entries=()):
+    """``songs_new`` rows and ``leaderboard_ranked`` entries, with the two slice RPCs over the entries."""
+    def board(params):
+        return [e for e in entries if e["md5"] == params["p_md5"]]
+
+    def page(params):
+        start = params["p_offset"]
+        return board(params)[start:start + params["p_limit"]]
+
+    def around(params):
+        rows = board(params)
+        index = next((i for i, e in enumerate(rows) if e["user_id"] == params["p_user_id"]), None)
+        if index is None:
+            return []
+        radius = params["p_radius"]
+        return rows[max(index - radius, 0):index + radius + 1]
+
+    return fake_supabase(
+        {"songs_new": list(songs), "leaderboard_ranked": list(entries)},
+        rpcs={"leaderboard_page": page, "leaderboard_around": around},
+    )
+
+
+def ranked(md5, rank, user_id, posted: Optional[str] = "2026-01-01T00:00:00+00:00"):
+    return {"md5": md5, "user_id": user_id, "username": f"user_{user_id}", "score": 1000 - rank,
+            "percent": 100.0, "is_fc": False, "speed": 100, "play_count": 1,
+            "posted": posted, "rank": rank}
+
+
+def test_fetch_leaderboards_groups_entries_in_rank_order(fake_supabase):
+    supabase = leaderboard_db(fake_supabase, entries=[
+        ranked("a", 1, "1"), ranked("a", 2, "2"), ranked("b", 1, "2", posted=None),
+    ])
+
+    boards = fetch_leaderboards(supabase, ["a", "b", "c"])
+
+    assert [e["user_id"] for e in boards["a"]] == ["1", "2"]
+    assert [e.get("rank") for e in boards["a"]] == [1, 2]
+    assert boards["b"][0]["posted"] == ""
+    assert "c" not in boards
+    assert "md5" not in boards["a"][0]
+
+
+def test_fetch_leaderboards_pages_past_the_row_limit(monkeypatch, fake_supabase):
+    monkeypatch.setattr(leaderboard_store, "LEADERBOARD_PAGE_SIZE", 2)
+    supabase = leaderboard_db(fake_supabase, entries=[ranked("a", rank, str(rank)) for rank in range(1, 6)])
+
+    boards = fetch_leaderboards(supabase, ["a"])
+
+    assert [e.get("rank") for e in boards["a"]] == [1, 2, 3, 4, 5]
+    assert len(supabase.reads("leaderboard_ranked")) == 3
+
+
+def leaderboard_client(monkeypatch, supabase, mirror=False):
+    monkeypatch.setattr(leaderboards_module, "get_supabase", lambda: supabase)
+    app = Flask(__name__)
+    app.config["LEADERBOARD_MIRROR"] = mirror
+    app.register_blueprint(leaderboards_module.bp)
+    return app.test_client()
+
+
+def test_leaderboard_endpoint_reads_entries(monkeypatch, fake_supabase):
+    supabase = leaderboard_db(
+        fake_supabase,
+        songs=[{"id": "7", "md5": "a", "scores_count": 2}],
+        entries=[ranked("a", 1, "1"), ranked("a", 2, "2")],
+    )
+    client = leaderboard_client(monkeypatch, supabase)
+
+    r = client.get("/api/leaderboard/7")
+    assert r.status_code == 200
+    body = json.loads(r.data)
+    assert [e["user_id"] for e in body["leaderboard"]] == ["1", "2"]
+    assert body["total"] == 2
+    assert supabase.rpc_calls == []
+
+    assert client.get("/api/leaderboard/8").status_code == 404
+
+
+def test_leaderboard_endpoint_returns_a_page(monkeypatch, fake_supabase):
+    supabase = leaderboard_db(
+        fake_supabase,
+        songs=[{"id": "7", "md5": "a", "scores_count": 20}],
+        entries=[ranked("a", rank, str(rank)) for rank in range(1, 21)],
+    )
+    client = leaderboard_client(monkeypatch, supabase)
+
+    body = json.loads(client.get("/api/leaderboard/7?offset=5&limit=3").data)
+
+    assert [e["rank"] for e in body["leaderboard"]] == [6, 7, 8]
+    assert (body["total"], body["offset"], body["limit"]) == (20, 5, 3)
+    assert supabase.reads("leaderboard_ranked") == []
+
+    body = json.loads(client.get("/api/leaderboard/7?limit=1000").data)
+    assert body["limit"] == leaderboards_module.MAX_PAGE_LIMIT
+    assert supabase.rpc_calls[-1][1]["p_limit"] == leaderboards_module.MAX_PAGE_LIMIT
+
+
+def test_leaderboard_endpoint_returns_entries_around_a_user(monkeypatch, fake_supabase):
+    supabase = leaderboard_db(
+        fake_supabase,
+        songs=[{"id": "7", "md5": "a", "scores_count": 20}],
+        entries=[ranked("a", rank, str(rank)) for rank in range(1, 21)],
+    )
+    client = leaderboard_client(monkeypatch, supabase)
+
+    body = json.loads(client.get("/api/leaderboard/7?around=10&radius=2").data)
+    assert [e["rank"] for e in body["leaderboard"]] == [8, 9, 10, 11, 12]
+    assert body["total"] == 20
+
+    body = json.loads(client.get("/api/leaderboard/7?around=1&radius=2").data)
+    assert [e["rank"] for e in body["leaderboard"]] == [1, 2, 3]
+
+    body = json.loads(client.get("/api/leaderboard/7?around=99").data)
+    assert body["leaderboard"] == []
+
+
+def test_leaderboard_endpoint_rejects_bad_slice_args(monkeypatch, fake_supabase):
+    client = leaderboard_client(monkeypatch, leaderboard_db(fake_supabase, songs=[{"id": "7", "md5": "a"}]))
+
+    assert client.get("/api/leaderboard/7?offset=abc").status_code == 400
+    assert client.get("/api/leaderboard/7?limit=-1").status_code == 400
+    assert client.get("/api/leaderboard/7?around=1&radius=x").status_code == 400
+
+
+def test_leaderboard_slices_prefer_the_mirror(monkeypatch, fake_supabase):
+    supabase = leaderboard_db(
+        fake_supabase,
+        songs=[{"id": "7", "md5": "a", "scores_count": 20}],
+        entries=[ranked("a", rank, str(rank)) for rank in range(1, 21)],
+    )
+    mirrored = [ranked("a", 6, "6")]
+    monkeypatch.setattr(leaderboards_module, "get_mirrored_page", lambda r, md5, offset, limit: mirrored)
+    monkeypatch.setattr(leaderboards_module, "get_mirrored_around", lambda r, md5, user_id, radius: None)
+    client = leaderboard_client(monkeypatch, supabase, mirror=True)
+
+    body = json.loads(client.get("/api/leaderboard/7?offset=5&limit=1").data)
+    assert body["leaderboard"][0]["user_id"] == "6"
+    assert supabase.rpc_calls == []
+
+    body = json.loads(client.get("/api/leaderboard/7?around=4&radius=1").data)
+    assert [e["rank"] for e in body["leaderboard"]] == [3, 4, 5]
+    assert [name for name, _ in supabase.rpc_calls] == ["leaderboard_around"]
+
+
+def test_rank_endpoint(monkeypatch, fake_supabase):
+    supabase = leaderboard_db(
+        fake_supabase,
+        songs=[{"id": "7", "md5": "a", "scores_count": 3}],
+        entries=[ranked("a", rank, str(rank)) for rank in range(1, 4)],
+    )
+    client = leaderboard_client(monkeypatch, supabase)
+
+    body = json.loads(client.get("/api/leaderboard/7/rank/2").data)
+    assert (body["rank"], body["total"]) == (2, 3)
+    assert client.get("/api/leaderboard/7/rank/9").status_code == 404
+    assert client.get("/api/leaderboard/8/rank/2").status_code == 404
+
+    monkeypatch.setattr(leaderboards_module, "mirrored_size", lambda r, md5: 3)
+    monkeypatch.setattr(leaderboards_module, "get_mirrored_rank", lambda r, md5, user_id: 1)
+    client = leaderboard_client(monkeypatch, supabase, mirror=True)
+    assert json.loads(client.get("/api/leaderboard/7/rank/2").data)["rank"] == 1
@@ -0,0 +1,82 @@
+from unittest.mock import MagicMock
+
+from app.services.progress_reporter import ProgressReporter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_reporter(**kwargs):
+    redis = MagicMock()
+    emit = MagicMock()
+    clock = Clock()
+    reporter = ProgressReporter(redis, emit, "u1", clock=clock, **kwargs)
+    return reporter, redis, emit, clock
+
+
+def events(emit, name):
+    return [call.args[1] for call in emit.call_args_list if call.args[0] == name]
+
+
+def test_per_song_updates_are_coalesced_by_delta():
+    reporter, redis, emit, _ = make_reporter(min_interval=60, min_delta=10)
+
+    for processed in range(1, 1001):
+        reporter.songs(processed, 1000)
+
+    sent = events(emit, "score_processing_progress")
+    # first update, then every 10%, with the final 100% always sent
+    assert len(sent) == 11
+    assert sent[-1] == {"progress": 100.0, "processed": 1000, "total": 1000}
+    assert redis.hset.call_count == len(sent)
+
+
+def test_interval_lets_small_moves_through():
+    reporter, _, emit, clock = make_reporter(min_interval=1, min_delta=50)
+
+    reporter.songs(1, 100)
+    reporter.songs(2, 100)
+    clock.now = 2
+    reporter.songs(3, 100)
+
+    assert [e["processed"] for e in events(emit, "score_processing_progress")] == [1, 3]
+
+
+def test_flush_sends_the_held_back_update_once():
+    reporter, _, emit, _ = make_reporter(min_interval=60, min_delta=50)
+
+    reporter.songs(1, 100)
+    reporter.songs(7, 100)
+    reporter.flush()
+    reporter.flush()
+
+    assert [e["processed"] for e in events(emit, "score_processing_progress")] == [1, 7]
+
+
+def test_leaderboard_stage_emits_without_touching_redis():
+    reporter, redis, emit, _ = make_reporter(min_interval=60, min_delta=50)
+
+    reporter.songs(1, 2)
+    reporter.leaderboards(100, 300)
+    reporter.leaderboards(200, 300)
+    reporter.leaderboards(300, 300)
+
+    sent = events(emit, "score_processing_updating_progress")
+    assert [e["message"] for e in sent] == ["Updating leaderboards 100 / 300", "Updating leaderboards 300 / 300"]
+    assert sent[-1]["progress"] == 100.0
+    assert redis.hset.call_count == 1
+
+
+def test_on_update_runs_for_each_sent_update():
+    updates = MagicMock()
+    reporter, _, emit, _ = make_reporter(min_interval=60, min_delta=50, on_update=updates)
+
+    for processed in range(1, 11):
+        reporter.songs(processed, 10)
+
+    assert updates.call_count == len(events(emit, "score_processing_progress"))
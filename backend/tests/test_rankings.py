@@ -0,0 +1,94 @@
+import json
+
+from flask import Flask
+
+from app.api import rankings as rankings_module
+
+
+def rankings_db(fake_supabase, standings, changes=()):
+    return fake_supabase({"player_standings": standings, "ranking_changes": list(changes)})
+
+
+def board(name, count):
+    return [
+        {"board": name, "position": i, "rank": i, "total": count, "user_id": str(i),
+         "username": f"user_{i}", "avatar": None, "value": 2000.0 - i}
+        for i in range(1, count + 1)
+    ]
+
+
+def client_for(monkeypatch, supabase):
+    monkeypatch.setattr(rankings_module, "get_supabase", lambda: supabase)
+    app = Flask(__name__)
+    app.register_blueprint(rankings_module.bp)
+    return app.test_client()
+
+
+def test_rankings_page(monkeypatch, fake_supabase):
+    supabase = rankings_db(fake_supabase, board("elo", 30) + board("total_fcs", 3))
+    client = client_for(monkeypatch, supabase)
+
+    body = json.loads(client.get("/api/rankings?offset=10&limit=5").data)
+
+    assert [r["position"] for r in body["rankings"]] == [11, 12, 13, 14, 15]
+    assert body["total"] == 30
+    assert body["by"] == "elo"
+    assert len(supabase.queries) == 1
+
+    body = json.loads(client.get("/api/rankings?by=total_fcs").data)
+    assert [r["user_id"] for r in body["rankings"]] == ["1", "2", "3"]
+    assert body["limit"] == rankings_module.DEFAULT_PAGE_LIMIT
+
+
+def test_rankings_page_past_the_end_still_reports_the_total(monkeypatch, fake_supabase):
+    client = client_for(monkeypatch, rankings_db(fake_supabase, board("elo", 3)))
+
+    body = json.loads(client.get("/api/rankings?offset=10").data)
+
+    assert body["rankings"] == []
+    assert body["total"] == 3
+
+
+def test_nearby_rankings(monkeypatch, fake_supabase):
+    supabase = rankings_db(fake_supabase, board("elo", 30))
+    client = client_for(monkeypatch, supabase)
+
+    body = json.loads(client.get("/api/rankings/2?range=3").data)
+
+    assert body["user"]["position"] == 2
+    assert [r["position"] for r in body["rankings"]] == [1, 2, 3, 4, 5]
+    assert body["total"] == 30
+    assert len(supabase.queries) == 2
+
+    assert client.get("/api/rankings/99").status_code == 404
+
+
+def test_rankings_reject_bad_args(monkeypatch, fake_supabase):
+    client = client_for(monkeypatch, rankings_db(fake_supabase, []))
+
+    assert client.get("/api/rankings?by=charts").status_code == 400
+    assert client.get("/api/rankings?limit=x").status_code == 400
+    assert client.get("/api/rankings/1?range=-2").status_code == 400
+
+
+def change(change_id):
+    return {"id": change_id, "user_id": str(change_id), "username": None, "old_elo": 1000.0,
+            "new_elo": 1010.0, "old_rank": 3, "new_rank": 2, "changed_at": "2026-01-01T00:00:00+00:00"}
+
+
+def test_recent_changes_feed_pages_by_cursor(monkeypatch, fake_supabase):
+    client = client_for(monkeypatch, rankings_db(fake_supabase, [], [change(i) for i in range(1, 8)]))
+
+    body = json.loads(client.get("/api/rankings/recent-changes?limit=3").data)
+    assert [c["id"] for c in body["changes"]] == [5, 6, 7]
+    assert body["next_cursor"] == 7
+    assert body["changes"][0]["username"] == ""
+
+    body = json.loads(client.get("/api/rankings/recent-changes?since=2&limit=3").data)
+    assert [c["id"] for c in body["changes"]] == [3, 4, 5]
+    assert body["next_cursor"] == 5
+
+    body = json.loads(client.get("/api/rankings/recent-changes?since=7").data)
+    assert body == {"changes": [], "next_cursor": 7}
+
+    assert client.get("/api/rankings/recent-changes?since=abc").status_code == 400
@@ -0,0 +1,87 @@
+import pytest
+from flask import Flask
+
+from app.api import songs as songs_module
+from app.services import related_songs as related_module
+from app.services.related_songs import RELATED_SONGS_LIMIT, related_songs_cache
+from app.services.song_catalog import SongCatalog
+
+
+def related_rpc(params):
+    return {
+        "album_songs": [{"id": 1, "album": params.get("p_album")}] if "p_album" in params else [],
+        "genre_songs": [{"id": 2, "genre": params.get("p_genre")}] if "p_genre" in params else [],
+        "charter_songs": [{"id": 3}] if "p_charters" in params else [],
+    }
+
+
+class Related:
+    """GETs /api/related-songs; ``calls`` lists the RPC params sent."""
+
+    def __init__(self, client, supabase):
+        self.client = client
+        self.supabase = supabase
+
+    @property
+    def calls(self):
+        return [params for _, params in self.supabase.rpc_calls]
+
+    def __call__(self, **args):
+        r = self.client.get("/api/related-songs", query_string=args)
+        assert r.status_code == 200
+        return r.get_json()
+
+
+@pytest.fixture
+def related(monkeypatch, fake_supabase):
+    related_songs_cache.clear()
+    supabase = fake_supabase(rpcs={"get_related_songs": related_rpc})
+    app = Flask(__name__)
+    app.config["SONG_CATALOG_CACHE"] = True
+    app.register_blueprint(songs_module.bp)
+    monkeypatch.setattr(songs_module, "get_supabase", lambda: supabase)
+    monkeypatch.setattr(related_module.song_catalog, "ensure_fresh", lambda: True)
+    yield Related(app.test_client(), supabase)
+    related_songs_cache.clear()
+
+
+def test_requested_sets_come_from_one_capped_rpc(related):
+    body = related(album="A", genre="Rock", charter="b,a,b")
+    assert [s["id"] for s in body["album_songs"]] == [1]
+    assert body["artist_songs"] == []
+    assert related.calls == [{
+        "p_album": "A", "p_genre": "Rock", "p_charters": ["a", "b"], "p_limit": RELATED_SONGS_LIMIT,
+    }]
+
+
+def test_sets_are_cached_until_a_member_song_changes(related):
+    related(album="A", genre="Rock", charter="a,b")
+    # same charters in another order hit the same entry
+    related(album="A", genre="Rock", charter="b,a")
+    assert len(related.calls) == 1
+
+    related_songs_cache.song_changed(
+        {"id": 9, "album": "Other", "genre": "Rock", "charter_refs": ["z"]},
+        {"id": 9, "album": "Other", "genre": "Metal", "charter_refs": ["b"]},
+    )
+    related(album="A", genre="Rock", charter="a,b")
+    assert related.calls[1] == {"p_genre": "Rock", "p_charters": ["a", "b"], "p_limit": RELATED_SONGS_LIMIT}
+
+
+def test_nothing_is_cached_without_the_song_catalog(related, monkeypatch):
+    monkeypatch.setattr(related_module.song_catalog, "ensure_fresh", lambda: False)
+    related(album="A")
+    related(album="A")
+    assert len(related.calls) == 2
+
+
+def test_catalog_syncs_report_changed_songs():
+    catalog = SongCatalog()
+    changes = []
+    catalog.listeners.append(lambda before, after: changes.append((before, after)))
+    old = {"id": 1, "genre": "Rock", "last_update": "2026-07-01T00:00:00+00:00"}
+    new = {"id": 1, "genre": "Metal", "last_update": "2026-07-02T00:00:00+00:00"}
+
+    catalog.apply({"server_time": "2026-07-01T00:00:00+00:00", "songs": [old], "deleted": []})
+    catalog.apply({"server_time": "2026-07-02T00:00:00+00:00", "songs": [new], "deleted": [{"id": 1}]})
+    assert changes == [(None, old), (old, None), (None, new)]
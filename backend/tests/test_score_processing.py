@@ -4,6 +4,7 @@ from app.utils.score_processing import (
     apply_score_to_leaderboard,
     evaluate_score_update,
     merge_unknown_scores,
+    select_changed_songs,
 )
 from app.utils.achievement_processor import achievement_processor
 from app.types import LeaderboardEntry
@@ -227,6 +228,48 @@ def test_overlapping_identifier_always_removed_from_unknowns():
     assert all(u["identifier"] != "md5" for u in remaining)
 
 
+# --- select_changed_songs ----------------------------------------------------
+
+def parsed_song(identifier: str, score_value: int, play_count: int = 1, instrument: int = 9) -> dict:
+    return {
+        "identifier": identifier,
+        "play_count": play_count,
+        "scores": [{"instrument": instrument, "score": score_value, "percent": 100.0,
+                    "is_fc": False, "speed": 100}],
+    }
+
+
+def test_unchanged_ranked_known_songs_are_skipped():
+    known = {"a": {**score(100, play_count=2), "identifier": "a", "rank": 3}}
+    assert select_changed_songs([parsed_song("a", 100, 2)], known, {}) == []
+
+
+def test_unchanged_unranked_known_songs_are_retried():
+    known = {"a": {**score(100, play_count=2), "identifier": "a", "rank": None}}
+    changed = select_changed_songs([parsed_song("a", 100, 2)], known, {})
+    assert [s["identifier"] for s in changed] == ["a"]
+
+
+def test_unchanged_unknown_songs_are_kept():
+    unknown = {"b": {**score(50, play_count=1), "identifier": "b"}}
+    changed = select_changed_songs([parsed_song("b", 50, 1)], {}, unknown)
+    assert [s["identifier"] for s in changed] == ["b"]
+
+
+def test_new_score_and_new_play_count_are_changed():
+    known = {
+        "a": {**score(100, play_count=2), "identifier": "a"},
+        "b": {**score(100, play_count=2), "identifier": "b"},
+    }
+    songs = [parsed_song("a", 200, 2), parsed_song("b", 100, 3), parsed_song("c", 10)]
+    changed = select_changed_songs(songs, known, {})
+    assert [s["identifier"] for s in changed] == ["a", "b", "c"]
+
+
+def test_songs_without_drums_are_dropped():
+    assert select_changed_songs([parsed_song("a", 100, instrument=0)], {}, {}) == []
+
+
 # --- AchievementProcessor.build_client_achievement ---------------------------
 
 def test_build_client_achievement_matches_definition_shape():
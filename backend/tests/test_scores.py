@@ -4,6 +4,7 @@ from unittest.mock import MagicMock
 from flask import Flask
 
 from app.api import scores as scores_module
+from app.utils.score_processing import apply_score_to_leaderboard
 
 
 class FakeQuery:
@@ -39,6 +40,13 @@ class FakeQuery:
     def in_(self, *a):
         return self
 
+    def order(self, *a):
+        return self
+
+    def range(self, start, end):
+        self.range_ = (start, end)
+        return self
+
     def execute(self):
         if self.op == "update":
             return SimpleNamespace(data=[{"id": self.holder.user_id}])
@@ -51,7 +59,19 @@ class FakeQuery:
             return SimpleNamespace(data=projected)
         if self.table_name == "songs_new":
             self.holder.songs_new_columns.append(self.columns)
-            return SimpleNamespace(data=list(self.holder.songs_new))
+            return SimpleNamespace(data=[
+                {k: v for k, v in song.items() if k != "leaderboard"}
+                for song in self.holder.songs_new
+            ])
+        if self.table_name == "leaderboard_ranked":
+            self.holder.leaderboard_reads += 1
+            entries = [
+                {**entry, "md5": song["md5"], "rank": rank}
+                for song in self.holder.songs_new
+                for rank, entry in enumerate(song.get("leaderboard") or [], 1)
+            ]
+            start, end = getattr(self, "range_", (0, len(entries)))
+            return SimpleNamespace(data=entries[start:end + 1])
         return SimpleNamespace(data=[])
 
 
@@ -95,6 +115,27 @@ class FakeRpc:
 
             self.holder.leaderboard_chunks.append(chunk)
             self.holder.leaderboard_updates.extend(chunk)
+        if self.fn_name == "merge_leaderboard_scores":
+            # merge the same way the SQL function does, against holder.songs_new
+            chunk = self.params["p_scores"]
+            if {entry["md5"] for entry in chunk} & self.holder.rpc_fail_md5s:
+                raise FakeApiError("57014", "canceling statement due to statement timeout")
+            self.holder.merge_chunks.append(chunk)
+            user_id = self.params["p_user_id"]
+            songs = {song["md5"]: song for song in self.holder.songs_new}
+            result = []
+            for entry in chunk:
+                song = songs.get(entry["md5"])
+                if song is None:
+                    continue
+                leaderboard_entry = {k: v for k, v in entry.items() if k != "md5"}
+                leaderboard_entry.update(user_id=user_id, username=self.params["p_username"])
+                song["leaderboard"], updated = apply_score_to_leaderboard(
+                    song.get("leaderboard") or [], leaderboard_entry, user_id
+                )
+                rank = next(e["rank"] for e in song["leaderboard"] if e["user_id"] == user_id)
+                result.append({"md5": entry["md5"], "rank": rank, "updated": updated})
+            return SimpleNamespace(data=result)
         return SimpleNamespace(data=None)
 
 
@@ -162,6 +203,9 @@ def run_process(
     rpc_max_chunk=None,
     rpc_fail_md5s=None,
     rpc_error_md5s=None,
+    merge_rpc=False,
+    mirror=False,
+    achievement_counters=None,
 ):
     """Drive process_and_save_scores."""
     holder = SimpleNamespace(
@@ -172,18 +216,22 @@ def run_process(
             "unknown_scores": unknown_scores or [],
             "stats": {} if stats is None else stats,
             "achievements": {},
+            "achievement_counters": achievement_counters,
         }],
         songs_new=songs_new or [],
         songs_new_columns=[],
+        leaderboard_reads=0,
         leaderboard_updates=[],
         leaderboard_chunks=[],
         attempted_chunks=[],
+        merge_chunks=[],
         rpc_calls=[],
         rpc_max_chunk=rpc_max_chunk,
         rpc_fail_md5s=set(rpc_fail_md5s or ()),
         rpc_error_md5s=set(rpc_error_md5s or ()),
         update_data=None,
         socketio=MagicMock(),
+        mirrored=[],
     )
 
     ach_input = SimpleNamespace(scores=None, stats=None)
@@ -197,6 +245,16 @@ def run_process(
     monkeypatch.setattr(scores_module, "get_supabase", lambda: FakeSupabase(holder))
     monkeypatch.setattr(scores_module, "socketio", holder.socketio)
     monkeypatch.setattr(scores_module, "redis", MagicMock())
+    monkeypatch.setattr(
+        scores_module, "mirror_leaderboard_updates",
+        lambda redis_client, chunk: holder.mirrored.append(("updates", [u["md5"] for u in chunk])),
+    )
+    monkeypatch.setattr(
+        scores_module, "mirror_merged_scores",
+        lambda redis_client, user_id, username, chunk, merged: holder.mirrored.append(
+            ("merged", [row["md5"] for row in merged if row["updated"]])
+        ),
+    )
     monkeypatch.setattr(
         scores_module.achievement_processor,
         "process_achievements",
@@ -204,6 +262,8 @@ def run_process(
     )
 
     app = Flask(__name__)
+    app.config["LEADERBOARD_MERGE_RPC"] = merge_rpc
+    app.config["LEADERBOARD_MIRROR"] = mirror
     with app.app_context():
         scores_module.process_and_save_scores({"songs": songs or []}, "u1")
 
@@ -218,6 +278,44 @@ def completion_event(holder) -> dict:
     raise AssertionError("no score_processing_complete emit")
 
 
+def test_unchanged_songs_skip_fetch_and_leaderboard_push(monkeypatch):
+    """Re-uploading the same (score, play_count) does no song work."""
+    existing = [{**score("a", 500, 100), "rank": 1}, {**score("b", 400, 100), "rank": 1}]
+    song_rows = [{"md5": "a", "name": "A", "artist": "Bar", "leaderboard": []}]
+
+    holder, _ = run_process(
+        monkeypatch,
+        existing_scores=existing,
+        songs_new=song_rows,
+        songs=[incoming_song("a", 500), incoming_song("b", 400)],
+    )
+
+    assert holder.songs_new_columns == []
+    assert holder.rpc_calls == []
+    assert {s["identifier"] for s in holder.update_data["scores"]} == {"a", "b"}
+    assert completion_event(holder)["status"] == "completed"
+
+
+def test_only_changed_songs_reach_the_leaderboard(monkeypatch):
+    existing = [{**score("a", 500, 100), "rank": 1}, {**score("b", 400, 100), "rank": 1}]
+    song_rows = [
+        {"md5": "a", "name": "A", "artist": "Bar", "leaderboard": []},
+        {"md5": "b", "name": "B", "artist": "Bar", "leaderboard": []},
+    ]
+
+    holder, _ = run_process(
+        monkeypatch,
+        existing_scores=existing,
+        songs_new=song_rows,
+        songs=[incoming_song("a", 500), incoming_song("b", 450)],
+    )
+
+    assert [entry["md5"] for entry in holder.leaderboard_updates] == ["b"]
+    persisted = {s["identifier"]: s for s in holder.update_data["scores"]}
+    assert persisted["b"]["score"] == 450
+    assert persisted["a"]["score"] == 500
+
+
 def test_sub_100_scores_persist_but_excluded_from_achievements(monkeypatch):
     existing = [
         score("a", 500, 100),
@@ -285,8 +383,10 @@ def test_batch_song_fetch_uses_slim_columns(monkeypatch):
 
     assert holder.songs_new_columns, "expected a songs_new batch fetch"
     for cols in holder.songs_new_columns:
-        assert cols == "md5,name,artist,charter_refs,leaderboard"
+        assert cols == "md5,name,artist,charter_refs"
         assert cols != "*"
+    # leaderboards come from leaderboard_entries, not the songs_new array
+    assert holder.leaderboard_reads == 1
 
 
 def test_unknown_score_survives_when_song_still_unknown(monkeypatch):
@@ -509,9 +609,128 @@ def test_achievement_and_leaderboard_failures_are_both_reported(monkeypatch):
     assert "leaderboard" in event["message"]
 
 
+# --- merge rpc ------------------------------------------------------------------
+
+
+def test_merge_rpc_ships_compact_scores_without_leaderboards(monkeypatch):
+    rival = {"user_id": "u2", "username": "rival", "score": 900, "percent": 100.0,
+             "is_fc": True, "speed": 100, "play_count": 3, "posted": "2026-01-01T00:00:00+00:00",
+             "rank": 1}
+    song_rows = [{"md5": "a", "name": "A", "artist": "Bar", "leaderboard": [rival]}]
+
+    holder, _ = run_process(
+        monkeypatch,
+        existing_scores=[],
+        songs_new=song_rows,
+        songs=[incoming_song("a", 500)],
+        merge_rpc=True,
+    )
+
+    assert holder.songs_new_columns == ["md5,name,artist,charter_refs"]
+    assert holder.leaderboard_reads == 0
+    assert [fn for fn, _ in holder.rpc_calls] == ["merge_leaderboard_scores"]
+    _, params = holder.rpc_calls[0]
+    assert params["p_user_id"] == "u1"
+    assert params["p_username"] == "tester"
+    assert set(params["p_scores"][0]) == {
+        "md5", "score", "percent", "is_fc", "speed", "play_count", "posted"
+    }
+    persisted = {s["identifier"]: s for s in holder.update_data["scores"]}
+    assert persisted["a"]["rank"] == 2
+    assert completion_event(holder)["status"] == "completed"
+
+
+def test_merge_rpc_includes_promoted_unknown_scores(monkeypatch):
+    unknown = unknown_score("m1", 500, 100, r"C:\songs\foo\notes.chart")
+    song_row = {"md5": "m1", "name": "Foo", "artist": "Bar"}
+
+    holder, _ = run_process(
+        monkeypatch,
+        existing_scores=[],
+        unknown_scores=[unknown],
+        songs_new=[song_row],
+        merge_rpc=True,
+    )
+
+    assert [entry["md5"] for chunk in holder.merge_chunks for entry in chunk] == ["m1"]
+    persisted = {s["identifier"]: s for s in holder.update_data["scores"]}
+    assert persisted["m1"]["rank"] == 1
+    assert holder.update_data["unknown_scores"] == []
+
+
+def test_merge_rpc_failure_drops_the_rank(monkeypatch):
+    song_rows = [
+        {"md5": "good", "name": "Good", "artist": "Bar"},
+        {"md5": "bad", "name": "Bad", "artist": "Bar"},
+    ]
+
+    holder, _ = run_process(
+        monkeypatch,
+        existing_scores=[],
+        songs_new=song_rows,
+        songs=[incoming_song("good", 500), incoming_song("bad", 400)],
+        rpc_fail_md5s={"bad"},
+        merge_rpc=True,
+    )
+
+    persisted = {s["identifier"]: s for s in holder.update_data["scores"]}
+    assert persisted["good"]["rank"] == 1
+    assert persisted["bad"]["rank"] is None
+    assert completion_event(holder)["status"] == "completed_with_errors"
+
+
 # --- stats ----------------------------------------------------------------------
 
 
+def test_mirror_follows_only_written_leaderboard_chunks(monkeypatch):
+    unknowns = [unknown_score(f"m{i}", 500, 100, rf"C:\s{i}") for i in range(4)]
+    song_rows = [
+        {"md5": f"m{i}", "name": f"Song {i}", "artist": "Bar", "leaderboard": []}
+        for i in range(4)
+    ]
+
+    holder, _ = run_process(
+        monkeypatch,
+        existing_scores=[],
+        unknown_scores=unknowns,
+        songs_new=song_rows,
+        rpc_max_chunk=2,
+        rpc_fail_md5s={"m3"},
+        mirror=True,
+    )
+
+    assert holder.mirrored == [("updates", ["m0", "m1"]), ("updates", ["m2"])]
+
+
+def test_mirror_follows_merged_scores(monkeypatch):
+    rival = {"user_id": "u2", "username": "rival", "score": 900, "percent": 100.0,
+             "is_fc": True, "speed": 100, "play_count": 3, "posted": "2026-01-01T00:00:00+00:00",
+             "rank": 1}
+    song_rows = [{"md5": "a", "name": "A", "artist": "Bar", "leaderboard": [rival]}]
+
+    holder, _ = run_process(
+        monkeypatch,
+        existing_scores=[],
+        songs_new=song_rows,
+        songs=[incoming_song("a", 500)],
+        merge_rpc=True,
+        mirror=True,
+    )
+
+    assert holder.mirrored == [("merged", ["a"])]
+
+
+def test_mirror_is_untouched_when_disabled(monkeypatch):
+    song_rows = [{"md5": "a", "name": "A", "artist": "Bar", "leaderboard": []}]
+
+    holder, _ = run_process(
+        monkeypatch, existing_scores=[], songs_new=song_rows, songs=[incoming_song("a", 500)],
+    )
+
+    assert holder.leaderboard_updates
+    assert holder.mirrored == []
+
+
 def test_null_stats_does_not_reach_achievements(monkeypatch):
     """users.stats is SQL NULL until update_all_user_stats first runs."""
     holder, ach_input = run_process(
@@ -550,3 +769,38 @@ def test_recomputed_stats_still_reach_achievements(monkeypatch):
     assert ach_input.stats["total_scores"] == 2
     assert ach_input.stats["total_score"] == 600
     assert ach_input.stats["rank"] == 7
+
+
+def test_achievements_are_evaluated_incrementally_from_stored_counters(monkeypatch):
+    from app.utils.achievement_index import ScoreIndex
+
+    existing = [score("a", 500, 100), score("b", 400, 100), score("c", 300, 50)]
+    counters = scores_module.achievement_processor.achievement_counters(ScoreIndex({"scores": existing[:2]}))
+    song_rows = [{"md5": "a", "name": "A", "artist": "Bar", "leaderboard": []}]
+
+    holder, ach_input = run_process(
+        monkeypatch,
+        existing_scores=existing,
+        songs_new=song_rows,
+        songs=[incoming_song("a", 600)],
+        achievement_counters=counters,
+    )
+
+    assert ach_input.scores is None  # no full evaluation
+    assert holder.update_data["achievement_counters"]["scores"] == 2
+    assert holder.update_data["achievement_counters"]["evaluated_at"] != counters["evaluated_at"]
+
+
+def test_missing_achievement_counters_fall_back_to_a_full_evaluation(monkeypatch):
+    existing = [{**score("a", 500, 100), "rank": 1}, {**score("b", 400, 100), "rank": 1}]
+    song_rows = [{"md5": "a", "name": "A", "artist": "Bar", "leaderboard": []}]
+
+    holder, ach_input = run_process(
+        monkeypatch,
+        existing_scores=existing,
+        songs_new=song_rows,
+        songs=[incoming_song("a", 600)],
+    )
+
+    assert {s["identifier"] for s in ach_input.scores} == {"a", "b"}
+    assert holder.update_data["achievement_counters"]["scores"] == 2
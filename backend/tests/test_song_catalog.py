@@ -0,0 +1,223 @@
+import gzip
+import json
+import time
+from types import SimpleNamespace
+
+from flask import Flask
+
+from app.api import songs as songs_module
+from app.services import song_catalog as song_catalog_module
+from app.services import song_snapshots as song_snapshots_module
+from app.services.song_catalog import SongCatalog
+from app.utils.song_search import SongSearchIndex
+
+
+T1 = "2026-07-01T00:00:00+00:00"
+T2 = "2026-07-02T00:00:00+00:00"
+
+
+def song(song_id, name, artist="Artist", album="Album", charter_refs=None, scores_count=0, **extra):
+    return {"id": song_id, "md5": f"md5-{song_id}", "name": name, "artist": artist, "album": album,
+            "charter_refs": charter_refs or [], "scores_count": scores_count, **extra}
+
+
+def names(songs):
+    return [s["name"] for s in songs]
+
+
+def test_every_term_must_match_some_field():
+    index = SongSearchIndex()
+    index.upsert(song(1, "Through the Fire and Flames", "DragonForce", "Inhuman Rampage"))
+    index.upsert(song(2, "Fire", "Scooter"))
+    index.upsert(song(3, "Firestarter", "The Prodigy", charter_refs=["Harmonix"]))
+
+    assert names(index.search("fire dragon")[0]) == ["Through the Fire and Flames"]
+    assert names(index.search("prodigy harm")[0]) == ["Firestarter"]
+    assert index.search("fire metallica") == ([], 0)
+    # short terms match word prefixes
+    assert names(index.search("fi sc")[0]) == ["Fire"]
+
+
+def test_punctuation_terms_match_as_substrings():
+    index = SongSearchIndex()
+    index.upsert(song(1, "Rock & Roll", "Led Zeppelin"))
+    index.upsert(song(2, "Rock and Roll All Nite", "Kiss"))
+    index.upsert(song(3, "Highway to Hell", "AC / DC"))
+
+    assert names(index.search("rock & roll")[0]) == ["Rock & Roll"]
+    assert names(index.search("AC / DC")[0]) == ["Highway to Hell"]
+    assert names(index.search("&")[0]) == ["Rock & Roll"]
+
+
+def test_results_are_ranked_then_paginated():
+    index = SongSearchIndex()
+    index.upsert(song(1, "Ocean Fire", scores_count=50))
+    index.upsert(song(2, "Fire", scores_count=1))
+    index.upsert(song(3, "Campfire", scores_count=90))
+    index.upsert(song(4, "Fire Escape", scores_count=5))
+    index.upsert(song(5, "Other", artist="Fire Band", scores_count=500))
+
+    ranked, total = index.search("fire")
+    # whole name, name prefix, artist prefix, word in the name, then substring
+    assert names(ranked) == ["Fire", "Fire Escape", "Other", "Ocean Fire", "Campfire"]
+    assert total == 5
+
+    page, total = index.search("FIRE", offset=1, limit=2)
+    assert names(page) == ["Fire Escape", "Other"]
+    assert total == 5
+
+
+def test_updates_and_removals_replace_postings():
+    index = SongSearchIndex()
+    index.upsert(song(1, "Old Name"))
+    index.upsert(song(1, "New Name"))
+
+    assert index.search("old") == ([], 0)
+    assert names(index.search("new")[0]) == ["New Name"]
+
+    index.remove(1)
+    assert index.search("name") == ([], 0)
+    assert len(index) == 0
+
+
+class FakeResp:
+    def __init__(self, payload):
+        self.status_code = 200
+        self.payload = payload
+        self.text = ""
+
+    def json(self):
+        return self.payload
+
+
+def search_client(monkeypatch, responses, **config):
+    calls = []
+
+    def fake_post(url, json=None, headers=None, stream=False, timeout=None):
+        calls.append(json)
+        return FakeResp(responses.pop(0))
+
+    catalog = SongCatalog()
+    monkeypatch.setattr(song_catalog_module.session, "post", fake_post)
+    monkeypatch.setattr(songs_module, "song_catalog", catalog)
+    app = Flask(__name__)
+    app.config.update(SUPABASE_URL="http://sb.test", SUPABASE_SERVICE_KEY="key", SONG_CATALOG_REFRESH_SECONDS=60, **config)
+    app.register_blueprint(songs_module.bp)
+    return app.test_client(), catalog, calls
+
+
+def test_search_endpoint_loads_then_applies_deltas(monkeypatch):
+    client, catalog, calls = search_client(monkeypatch, [
+        {"server_time": T1, "songs": [song(1, "Fire"), song(2, "Ice")], "deleted": []},
+        {"server_time": T2, "songs": [song(3, "Fire Escape")], "deleted": [{"id": 1, "md5": "md5-1"}]},
+    ])
+
+    body = json.loads(client.get("/api/songs/search?q=fire").data)
+    assert names(body["songs"]) == ["Fire"]
+    assert body["total"] == 1
+
+    # within the refresh interval the catalog is not synced again
+    client.get("/api/songs/search?q=ice")
+    assert calls == [{}]
+
+    catalog.synced_at = time.monotonic() - 61
+    body = json.loads(client.get("/api/songs/search?q=fire").data)
+    assert names(body["songs"]) == ["Fire Escape"]
+    assert calls == [{}, {"since": T1}]
+    assert catalog.cursor == T2
+
+
+def test_search_endpoint_rejects_bad_args(monkeypatch):
+    client, _, calls = search_client(monkeypatch, [])
+
+    assert client.get("/api/songs/search").status_code == 400
+    assert client.get("/api/songs/search?q=a&limit=-1").status_code == 400
+    assert calls == []
+
+
+def test_search_endpoint_reports_an_unavailable_catalog(monkeypatch):
+    client, catalog, _ = search_client(monkeypatch, [])
+    monkeypatch.setattr(
+        song_catalog_module.session, "post",
+        lambda *a, **k: SimpleNamespace(status_code=500, text="down"),
+    )
+
+    assert client.get("/api/songs/search?q=fire").status_code == 502
+    assert not catalog.loaded
+
+
+def test_song_list_is_served_from_the_catalog(monkeypatch):
+    client, catalog, calls = search_client(monkeypatch, [
+        {"server_time": T1, "songs": [song(1, "Fire", last_update=T1), song(2, "Ice", last_update=T1)], "deleted": []},
+        {"server_time": T2, "songs": [song(3, "Sand", last_update=T2)], "deleted": [{"id": 1, "md5": "md5-1"}]},
+    ], SONG_CATALOG_CACHE=True)
+
+    bare = client.get("/api/songs")
+    assert names(json.loads(bare.data)) == ["Fire", "Ice"]
+    envelope = client.get("/api/songs?v=2")
+    assert json.loads(envelope.data) == {"server_time": T1, "songs": json.loads(bare.data), "deleted": []}
+    assert bare.headers["ETag"] != envelope.headers["ETag"]
+    assert client.get("/api/songs", headers={"If-None-Match": bare.headers["ETag"]}).status_code == 304
+    assert calls == [{}]
+
+    catalog.expire()
+    assert client.get("/api/songs", headers={"If-None-Match": bare.headers["ETag"]}).status_code == 200
+
+    delta = json.loads(client.get("/api/songs", query_string={"since": "2026-07-01T12:00:00Z"}).data)
+    assert delta == {"server_time": T2, "songs": [song(3, "Sand", last_update=T2)], "deleted": [{"id": 1, "md5": "md5-1"}]}
+    assert calls == [{}, {"since": T1}]
+
+
+def test_since_before_the_catalog_load_goes_to_the_rpc(monkeypatch):
+    envelope = {"server_time": T1, "songs": [song(1, "Fire")], "deleted": []}
+    client, _, calls = search_client(monkeypatch, [envelope], SONG_CATALOG_CACHE=True)
+    client.get("/api/songs/search?q=fire")
+
+    streamed = SimpleNamespace(status_code=200, iter_content=lambda chunk_size: iter([b"{}"]))
+    monkeypatch.setattr(song_catalog_module.session, "post", lambda *a, json=None, **k: calls.append(json) or streamed)
+
+    r = client.get("/api/songs", query_string={"since": "2026-06-01T00:00:00+00:00"})
+    assert r.data == b"{}"
+    assert calls == [{}, {"since": "2026-06-01T00:00:00+00:00"}]
+
+
+def test_song_list_is_sent_precompressed_once_per_version(fake_redis, monkeypatch):
+    client, catalog, _ = search_client(monkeypatch, [
+        {"server_time": T1, "songs": [song(1, "Fire", last_update=T1)], "deleted": []},
+        {"server_time": T2, "songs": [song(2, "Ice", last_update=T2)], "deleted": []},
+    ], SONG_CATALOG_CACHE=True, REDIS_URL="redis://test")
+    compressed = []
+    original = song_snapshots_module.compress_snapshot
+    monkeypatch.setattr(song_snapshots_module, "redis", fake_redis)
+    monkeypatch.setattr(song_snapshots_module, "snapshot_blobs", song_snapshots_module.SnapshotBlobs())
+    monkeypatch.setattr(
+        song_snapshots_module, "compress_snapshot",
+        lambda body, encoding: compressed.append(encoding) or original(body, encoding),
+    )
+
+    plain = client.get("/api/songs")
+    first = client.get("/api/songs", headers={"Accept-Encoding": "gzip, br, zstd"})
+    assert first.headers["Content-Encoding"] == "zstd"
+    assert first.headers["Vary"] == "Accept-Encoding"
+    assert client.get("/api/songs", headers={"Accept-Encoding": "gzip, br, zstd"}).data == first.data
+
+    zipped = client.get("/api/songs", headers={"Accept-Encoding": "gzip, br;q=0.5"})
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(zipped.data) == plain.data
+    assert zipped.headers["ETag"] not in (first.headers["ETag"], plain.headers["ETag"])
+    assert compressed == ["zstd", "gzip"]
+    assert len(fake_redis.data) == 2
+
+    headers = {"Accept-Encoding": "gzip", "If-None-Match": zipped.headers["ETag"]}
+    assert client.get("/api/songs", headers=headers).status_code == 304
+
+    # another worker picks the blob up from Redis instead of compressing again
+    monkeypatch.setattr(song_snapshots_module, "snapshot_blobs", song_snapshots_module.SnapshotBlobs())
+    assert client.get("/api/songs", headers={"Accept-Encoding": "gzip"}).data == zipped.data
+    assert compressed == ["zstd", "gzip"]
+
+    # a new catalog version is compressed afresh
+    catalog.expire()
+    newer = client.get("/api/songs", headers={"Accept-Encoding": "gzip"})
+    assert names(json.loads(gzip.decompress(newer.data))) == ["Fire", "Ice"]
+    assert compressed == ["zstd", "gzip", "gzip"]
@@ -0,0 +1,85 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask
+
+from app.api import songs as songs_module
+from app.services import song_extras as song_extras_module
+from app.services.song_extras import SongExtraCache, invalidate_song_extras, song_extra_cache
+from app.utils.payloads import encode_payload
+
+
+def reads(supabase):
+    """The md5 of every ``songs_extra`` read, which must fetch only ``song_data``."""
+    assert all(query.columns == "song_data" for query in supabase.queries)
+    return [md5 for query in supabase.reads("songs_extra") for md5 in query.values("eq", "md5")]
+
+
+@pytest.fixture
+def extras(monkeypatch, fake_supabase):
+    song_extra_cache.clear()
+    supabase = fake_supabase({"songs_extra": [
+        {"md5": "abc", "song_data": {"name": "Sleepers", "notesData": {"instruments": ["guitar"]}}},
+    ]})
+    app = Flask(__name__)
+    app.register_blueprint(songs_module.bp)
+    monkeypatch.setattr(songs_module, "get_supabase", lambda: supabase)
+    yield app, supabase
+    song_extra_cache.clear()
+
+
+def test_payload_is_encoded_once_and_revalidated_by_etag(extras):
+    app, supabase = extras
+    client = app.test_client()
+
+    r = client.get("/api/songs/abc/extra", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(r.data))["name"] == "Sleepers"
+
+    r = client.get("/api/songs/abc/extra", headers={"If-None-Match": r.headers["ETag"], "Accept-Encoding": "gzip"})
+    assert r.status_code == 304
+    assert client.get("/api/songs/abc/extra").get_json()["notesData"] == {"instruments": ["guitar"]}
+    assert reads(supabase) == ["abc"]
+
+    assert client.get("/api/songs/nope/extra").status_code == 404
+
+
+def test_cache_is_bounded_by_bytes():
+    cache = SongExtraCache()
+    payloads = {md5: encode_payload(json.dumps({"md5": md5, "pad": "x" * 200}).encode()) for md5 in "abc"}
+    size = len(payloads["a"].body) + len(payloads["a"].gzipped)
+    for md5, payload in payloads.items():
+        cache.put(md5, payload, max_bytes=2 * size)
+        cache.get("a")
+
+    # "b" was least recently used when "c" pushed the cache over its budget
+    assert cache.get("b") is None
+    assert cache.get("a") is payloads["a"] and cache.get("c") is payloads["c"]
+    assert cache.bytes == 2 * size
+
+    cache.put("big", payloads["a"], max_bytes=size - 1)
+    assert cache.get("big") is None
+
+
+def test_redis_tier_is_shared_and_invalidated(extras, monkeypatch, fake_redis):
+    app, supabase = extras
+    app.config["REDIS_URL"] = "redis://test"
+    monkeypatch.setattr(song_extras_module, "redis", fake_redis)
+    client = app.test_client()
+
+    first = client.get("/api/songs/abc/extra")
+    # another worker: nothing in its own memory, the blob comes from Redis
+    song_extra_cache.clear()
+    second = client.get("/api/songs/abc/extra")
+    assert second.get_json() == first.get_json()
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert reads(supabase) == ["abc"]
+
+    supabase.tables["songs_extra"][0]["song_data"] = {"name": "Sleepers (Remastered)"}
+    with app.app_context():
+        invalidate_song_extras(["abc"])
+    song_extra_cache.put("abc", encode_payload(b'{"name":"stale"}'), 1 << 20)  # a worker that missed it
+    assert client.get("/api/songs/abc/extra").get_json() == {"name": "Sleepers (Remastered)"}
+    assert reads(supabase) == ["abc", "abc"]
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from app.services.song_fetcher import fetch_songs_by_md5
+
+
+class Gate:
+    """Holds each query until ``parties`` are in flight; fails batches containing a ``fail`` md5."""
+
+    def __init__(self, parties=1, fail=()):
+        self.fail = set(fail)
+        self.lock = threading.Lock()
+        self.barrier = threading.Barrier(parties)
+        self.in_flight = 0
+        self.peak = 0
+
+    def __call__(self, query):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            self.barrier.wait(timeout=1)
+        except threading.BrokenBarrierError:
+            pass
+        with self.lock:
+            self.in_flight -= 1
+        if any(md5 in self.fail for md5 in query.values("in", "md5")[0]):
+            raise RuntimeError("boom")
+
+
+@pytest.fixture
+def songs_db(fake_supabase):
+    """A client over ``songs_new`` rows for ``md5s``, gated by a :class:`Gate`."""
+    def build(md5s, gate):
+        return fake_supabase({"songs_new": [{"md5": md5, "name": md5.upper()} for md5 in md5s]}, on_execute=gate)
+    return build
+
+
+def test_batches_are_fetched_concurrently_and_merged(songs_db):
+    md5s = [f"m{i}" for i in range(10)]
+    gate = Gate(parties=3)
+    supabase = songs_db(md5s[:9], gate)
+    timings = []
+
+    songs = fetch_songs_by_md5(
+        supabase, md5s, batch_size=4, concurrency=3,
+        on_batch=lambda start, count, seconds: timings.append((start, count)),
+    )
+
+    assert set(songs) == set(md5s[:9])
+    assert songs["m3"]["name"] == "M3"
+    assert gate.peak == 3
+    assert sorted(timings) == [(0, 4), (4, 4), (8, 2)]
+    assert [query.columns for query in supabase.queries] == ["md5,name,artist,charter_refs"] * 3
+
+
+def test_concurrency_one_runs_sequentially(songs_db):
+    gate = Gate()
+    supabase = songs_db(["a", "b", "c"], gate)
+
+    songs = fetch_songs_by_md5(supabase, ["a", "b", "c"], batch_size=1, concurrency=1)
+
+    assert set(songs) == {"a", "b", "c"}
+    assert gate.peak == 1
+
+
+def test_empty_input_makes_no_queries(songs_db):
+    supabase = songs_db([], Gate())
+
+    assert fetch_songs_by_md5(supabase, []) == {}
+    assert supabase.queries == []
+
+
+def test_failed_batch_raises(songs_db):
+    supabase = songs_db(["a", "b"], Gate(fail={"b"}))
+
+    with pytest.raises(RuntimeError):
+        fetch_songs_by_md5(supabase, ["a", "b"], batch_size=1, concurrency=2)
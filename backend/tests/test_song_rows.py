@@ -0,0 +1,84 @@
+import pytest
+from flask import Flask
+
+from app.api import songs as songs_module
+from app.services.song_rows import song_key, song_rows
+
+SONGS = [{"id": i, "md5": f"{i}a" * 16, "name": f"Song {i}"} for i in range(1, 8)]
+
+
+class Lookup:
+    """POSTs to /api/songs-by-ids; ``calls`` lists the ``in_()`` batches fetched."""
+
+    def __init__(self, client, supabase):
+        self.client = client
+        self.supabase = supabase
+
+    def __call__(self, ids, **extra):
+        r = self.client.post("/api/songs-by-ids", json={"ids": ids, **extra})
+        return r.status_code, r.get_json()
+
+    @property
+    def calls(self):
+        return [(column, values) for query in self.supabase.queries for _, column, values in query.filters]
+
+
+@pytest.fixture
+def lookup(monkeypatch, fake_supabase):
+    song_rows.clear()
+    # rows come back out of request order
+    supabase = fake_supabase({"songs_new": SONGS[::-1]})
+    app = Flask(__name__)
+    app.register_blueprint(songs_module.bp)
+    monkeypatch.setattr(songs_module, "get_supabase", lambda: supabase)
+    client = app.test_client()
+
+    yield Lookup(client, supabase)
+    song_rows.clear()
+
+
+def test_identifiers_are_classified():
+    assert song_key(5) == ("id", 5)
+    assert song_key("5") == ("id", 5)
+    assert song_key("a" * 32) == ("md5", "a" * 32)
+    with pytest.raises(ValueError):
+        song_key(True)
+    with pytest.raises(ValueError):
+        song_key({"id": 1})
+
+
+def test_mixed_ids_come_back_deduplicated_in_request_order(lookup):
+    status, body = lookup([3, SONGS[0]["md5"], "5", 3, 1, 99, "f" * 32], include_missing=True)
+    assert status == 200
+    # song 1 was asked for by md5 and by id; it is returned once, at its first position
+    assert [s["id"] for s in body["songs"]] == [3, 1, 5]
+    assert body["missing"] == [99, "f" * 32]
+    assert sorted(column for column, _ in lookup.calls) == ["id", "md5"]
+    assert dict(lookup.calls)["id"] == [3, 5, 1, 99]
+
+
+def test_default_response_is_a_bare_list(lookup):
+    status, body = lookup(["2", 4])
+    assert status == 200
+    assert [s["id"] for s in body] == [2, 4]
+
+
+def test_repeat_ids_are_served_from_the_row_cache(lookup):
+    lookup([1, 2, 3])
+    lookup.supabase.queries.clear()
+
+    # cached under both keys, so a lookup by md5 is also a hit
+    status, body = lookup([SONGS[1]["md5"], 3, 4])
+    assert [s["id"] for s in body] == [2, 3, 4]
+    assert lookup.calls == [("id", [4])]
+
+    song_rows.forget(2)
+    lookup.supabase.queries.clear()
+    lookup([SONGS[1]["md5"], 2])
+    assert sorted(lookup.calls) == [("id", [2]), ("md5", [SONGS[1]["md5"]])]
+
+
+def test_bad_identifiers_are_rejected(lookup):
+    assert lookup([1, None])[0] == 400
+    assert lookup("1,2")[0] == 400
+    assert lookup.calls == []
@@ -1,5 +1,7 @@
 import datetime
 import json
+import re
+from pathlib import Path
 from types import SimpleNamespace
 
 import jwt
@@ -7,6 +9,7 @@ from flask import Flask
 from flask.testing import FlaskClient
 
 from app.api import songs as songs_module
+from app.services import song_catalog as song_catalog_module
 
 ENVELOPE = {
     "server_time": "2026-07-13T00:00:00+00:00",
@@ -48,7 +51,7 @@ def make_app(monkeypatch, resp: FakeResp):
         )
         return resp
 
-    monkeypatch.setattr(songs_module.session, "post", fake_post)
+    monkeypatch.setattr(song_catalog_module.session, "post", fake_post)
     return app, holder
 
 
@@ -111,7 +114,7 @@ def test_rpc_timeout_returns_502(monkeypatch):
     def boom(*a, **k):
         raise songs_module.requests.Timeout("read timed out")
 
-    monkeypatch.setattr(songs_module.session, "post", boom)
+    monkeypatch.setattr(song_catalog_module.session, "post", boom)
     r = app.test_client().get("/api/songs?v=2")
     assert r.status_code == 502
     assert "error" in json.loads(r.data)
@@ -252,21 +255,12 @@ def test_get_song_uses_slim_columns(monkeypatch):
         assert cols != "*"
 
 
-def test_related_songs_uses_slim_columns(monkeypatch):
-    fake_sb = SelectSupabase({"songs_new": [{"id": 1}]})
-    app = Flask(__name__)
-    app.register_blueprint(songs_module.bp)
-    monkeypatch.setattr(songs_module, "get_supabase", lambda: fake_sb)
-
-    r = app.test_client().get("/api/related-songs", query_string={"album": "Some Album"})
-    assert r.status_code == 200
-
-    songs_new_calls = [cols for table, cols in fake_sb.log if table == "songs_new"]
-    assert songs_new_calls, "expected a songs_new query"
-    for cols in songs_new_calls:
-        assert cols == songs_module.SLIM_SONG_COLUMNS
-        assert "leaderboard" not in cols
-        assert "note_counts" not in cols
+def test_related_songs_rpc_selects_slim_columns():
+    sql = (Path(__file__).parents[1] / "migrations" / "sql" / "014_related_songs.sql").read_text()
+    selects = re.findall(r"SELECT (id, md5,.*?)\s+FROM songs_new", sql, re.S)
+    assert len(selects) == 4, "expected one select per related set"
+    for columns in selects:
+        assert ",".join(c.strip() for c in columns.split(",")) == songs_module.SLIM_SONG_COLUMNS
 
 
 def test_songs_by_ids_uses_slim_columns(monkeypatch):
@@ -302,6 +296,42 @@ def test_admin_remove_tombstones_before_delete(monkeypatch):
     assert ops.index(("upsert", "deleted_songs")) < ops.index(("delete", "songs_new"))
 
 
+def test_admin_remove_drops_the_leaderboard_mirror(monkeypatch):
+    data_map = {
+        ("users", "select"): [{"permissions": "admin"}],
+        ("songs_new", "select"): [{"id": 5, "md5": "abc"}],
+        ("songs_new", "delete"): [{"id": 5}],
+    }
+    forgotten = []
+    monkeypatch.setattr(songs_module, "forget_leaderboard", lambda redis, md5: forgotten.append(md5))
+    monkeypatch.setattr(songs_module, "invalidate_song_extras", lambda md5s: None)
+    client = admin_client(monkeypatch, FakeSupabase(data_map))
+    client.application.config["LEADERBOARD_MIRROR"] = True
+
+    r = client.post("/api/songs/5/admin",
+                    json={"action": "remove"},
+                    headers={"Authorization": f"Bearer {admin_token()}"})
+    assert r.status_code == 200
+    assert forgotten == ["abc"]
+
+
+def test_admin_remove_invalidates_the_song_extra(monkeypatch):
+    data_map = {
+        ("users", "select"): [{"permissions": "admin"}],
+        ("songs_new", "select"): [{"id": 5, "md5": "abc"}],
+        ("songs_new", "delete"): [{"id": 5}],
+    }
+    invalidated = []
+    monkeypatch.setattr(songs_module, "invalidate_song_extras", invalidated.extend)
+    client = admin_client(monkeypatch, FakeSupabase(data_map))
+
+    r = client.post("/api/songs/5/admin",
+                    json={"action": "remove"},
+                    headers={"Authorization": f"Bearer {admin_token()}"})
+    assert r.status_code == 200
+    assert invalidated == ["abc"]
+
+
 def test_admin_remove_missing_song_404_no_tombstone(monkeypatch):
     data_map = {
         ("users", "select"): [{"permissions": "admin"}],
@@ -363,3 +393,151 @@ def test_admin_verify_bumps_last_update(monkeypatch):
     assert "last_update" in captured["payload"]
     # parses as a datetime
     datetime.datetime.fromisoformat(captured["payload"]["last_update"])
+
+
+class BrowseQuery:
+    """Records every call in the browse chain and returns the canned rows.
+
+    A query for NULL sort values (``is_`` without ``not_``) returns ``nulls``.
+    """
+
+    def __init__(self, calls: list, data: list, nulls: tuple):
+        self.calls = calls
+        self.data = data
+        self.nulls = list(nulls)
+        self.for_nulls = False
+        self.negate = False
+
+    @property
+    def not_(self):
+        self.calls.append(("not_", (), {}))
+        self.negate = True
+        return self
+
+    def __getattr__(self, name):
+        def record(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            if name == "is_" and not self.negate:
+                self.for_nulls = True
+            self.negate = False
+            return self
+        return record
+
+    def execute(self):
+        return SimpleNamespace(data=self.nulls if self.for_nulls else self.data)
+
+
+def browse_client(monkeypatch, data: list, nulls: tuple = ()):
+    calls: list = []
+    fake_sb = SimpleNamespace(table=lambda name: BrowseQuery(calls, data, nulls))
+    app = Flask(__name__)
+    app.register_blueprint(songs_module.bp)
+    monkeypatch.setattr(songs_module, "get_supabase", lambda: fake_sb)
+    return app.test_client(), calls
+
+
+def test_browse_filters_sorts_and_pages_by_keyset(monkeypatch):
+    page = [{"id": i, "artist": "Band", "last_update": f"2026-07-0{i}T00:00:00+00:00"} for i in (1, 2, 3)]
+    client, calls = browse_client(monkeypatch, page)
+
+    r = client.get("/api/songs/browse", query_string={
+        "artist": "Band", "charter": "Someone", "sort": "last_update", "order": "desc", "limit": 2,
+    })
+    assert r.status_code == 200
+    body = r.get_json()
+    assert [s["id"] for s in body["songs"]] == [1, 2]
+    assert body["next_cursor"]
+    assert ("eq", ("artist", "Band"), {}) in calls
+    assert ("contains", ("charter_refs", ["Someone"]), {}) in calls
+    assert ("is_", ("last_update", "null"), {}) in calls
+    assert ("order", ("last_update",), {"desc": True}) in calls
+    assert ("order", ("id",), {"desc": True}) in calls
+    assert ("limit", (3,), {}) in calls
+    assert not any(name == "or_" for name, _, _ in calls)
+    # a full page never reaches the NULL rows
+    assert calls.count(("not_", (), {})) == 1
+
+    calls.clear()
+    r = client.get("/api/songs/browse", query_string={
+        "artist": "Band", "sort": "last_update", "order": "desc", "limit": 3, "cursor": body["next_cursor"],
+    })
+    assert r.status_code == 200
+    assert r.get_json()["next_cursor"] is None
+    # the bound lets the (last_update, id) index scan start at the cursor
+    assert ("lte", ("last_update", "2026-07-02T00:00:00+00:00"), {}) in calls
+    after = [args[0] for name, args, _ in calls if name == "or_"]
+    assert after == [
+        'last_update.lt."2026-07-02T00:00:00+00:00",'
+        'and(last_update.eq."2026-07-02T00:00:00+00:00",id.lt.2)'
+    ]
+
+
+def test_browse_null_sort_values_follow_the_others(monkeypatch):
+    client, calls = browse_client(
+        monkeypatch, [{"id": 3, "year": 1999}], nulls=({"id": 5, "year": None}, {"id": 6, "year": None})
+    )
+    r = client.get("/api/songs/browse", query_string={"sort": "year", "limit": 2})
+    body = r.get_json()
+    assert [s["id"] for s in body["songs"]] == [3, 5]
+    # the NULL query only fetches what the page still needs
+    assert ("limit", (2,), {}) in calls
+
+    calls.clear()
+    client.get("/api/songs/browse", query_string={"sort": "year", "limit": 2, "cursor": body["next_cursor"]})
+    assert ("not_", (), {}) not in calls
+    assert ("gt", ("id", 5), {}) in calls
+
+
+def test_browse_name_filter_escapes_like_wildcards(monkeypatch):
+    client, calls = browse_client(monkeypatch, [])
+    client.get("/api/songs/browse", query_string={"name": "100%_a\\b"})
+    assert ("ilike", ("name", "%100\\%\\_a\\\\b%"), {}) in calls
+
+
+def test_browse_rejects_unlisted_fields_and_bad_args(monkeypatch):
+    client, calls = browse_client(monkeypatch, [])
+    for args in (
+        {"sort": "leaderboard"},
+        {"sort": "charter"},
+        {"order": "sideways"},
+        {"leaderboard": "x"},
+        {"limit": "-1"},
+        {"limit": "0"},
+        {"cursor": "not-a-cursor"},
+    ):
+        assert client.get("/api/songs/browse", query_string=args).status_code == 400, args
+    assert calls == []
+
+
+def test_popular_songs_read_one_page_by_scores_count(monkeypatch):
+    client, calls = browse_client(monkeypatch, [{"id": 4, "scores_count": 90}])
+
+    r = client.get("/api/songs/popular", query_string={"limit": 500})
+    assert r.status_code == 200
+    assert r.get_json() == [{"id": 4, "scores_count": 90}]
+    assert ("select", (songs_module.SLIM_SONG_COLUMNS,), {}) in calls
+    assert ("order", ("scores_count",), {"desc": True, "nullsfirst": False}) in calls
+    assert ("limit", (songs_module.MAX_TOP_LIMIT,), {}) in calls
+
+    assert client.get("/api/songs/popular", query_string={"limit": 0}).status_code == 400
+
+
+def test_recent_songs_come_from_the_latest_plays_rpc(monkeypatch):
+    calls = []
+    recent = [{"id": 1, "most_recent_player": "p", "most_recent_date": "2026-07-01T00:00:00+00:00"}]
+
+    def rpc(name, params):
+        calls.append((name, params))
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=recent))
+
+    app = Flask(__name__)
+    app.register_blueprint(songs_module.bp)
+    monkeypatch.setattr(songs_module, "get_supabase", lambda: SimpleNamespace(rpc=rpc))
+    client = app.test_client()
+
+    assert client.get("/api/songs/recent").get_json() == recent
+    client.get("/api/songs/recent", query_string={"limit": 5, "unique_users": "true"})
+    assert calls == [
+        ("get_recent_songs", {"p_limit": songs_module.DEFAULT_TOP_LIMIT, "p_unique_users": False}),
+        ("get_recent_songs", {"p_limit": 5, "p_unique_users": True}),
+    ]
@@ -0,0 +1,40 @@
+from app.services.upload_digest import (
+    UPLOAD_DIGEST_KEY,
+    forget_processed_upload,
+    get_processed_upload,
+    record_processed_upload,
+    scoredata_digest,
+)
+
+
+def test_digest_is_stable_and_content_sensitive():
+    assert scoredata_digest(b"abc") == scoredata_digest(b"abc")
+    assert scoredata_digest(b"abc") != scoredata_digest(b"abd")
+
+
+def test_identical_upload_returns_previous_summary(fake_redis):
+    digest = scoredata_digest(b"scores")
+    record_processed_upload(fake_redis, "u1", digest, {"total_songs": 3})
+
+    previous = get_processed_upload(fake_redis, "u1", digest)
+
+    assert previous is not None
+    assert previous["total_songs"] == 3
+    assert "processed_at" in previous
+    assert fake_redis.ttls[UPLOAD_DIGEST_KEY.format(user_id="u1")]
+
+
+def test_different_upload_or_user_is_not_a_duplicate(fake_redis):
+    record_processed_upload(fake_redis, "u1", scoredata_digest(b"old"), {"total_songs": 3})
+
+    assert get_processed_upload(fake_redis, "u1", scoredata_digest(b"new")) is None
+    assert get_processed_upload(fake_redis, "u2", scoredata_digest(b"old")) is None
+
+
+def test_forget_clears_the_record(fake_redis):
+    digest = scoredata_digest(b"scores")
+    record_processed_upload(fake_redis, "u1", digest, {"total_songs": 3})
+
+    forget_processed_upload(fake_redis, "u1")
+
+    assert get_processed_upload(fake_redis, "u1", digest) is None
@@ -267,11 +267,6 @@ class Leaderboard(commands.Cog):
         response_msg = await ctx.send(f"🔍 Searching for '{song_name}'...")
         
         try:
-            # Check if songs are cached - if not, update message
-            cache_key = self.api._get_cache_key("api/songs", None)
-            if not self.api._is_cache_valid(cache_key):
-                await response_msg.edit(content=f"🔍 Fetching song database (this may take a moment)...")
-            
             matching_songs = await self.api.search_songs(song_name)
             
             if not matching_songs:
@@ -34,11 +34,6 @@ class Songs(commands.Cog):
         response_msg = await ctx.send(f"🔍 Searching for songs matching '{query}'...")
         
         try:
-            # Check if songs are cached - if not, update message
-            cache_key = self.api._get_cache_key("api/songs", None)
-            if not self.api._is_cache_valid(cache_key):
-                await response_msg.edit(content=f"🔍 Fetching song database (this may take a moment)...")
-            
             matching_songs = await self.api.search_songs(query)
             
             if not matching_songs:
@@ -91,11 +86,6 @@ class Songs(commands.Cog):
         response_msg = await ctx.send("🎵 Fetching most popular songs...")
         
         try:
-            # Check if songs are cached - if not, update message
-            cache_key = self.api._get_cache_key("api/songs", None)
-            if not self.api._is_cache_valid(cache_key):
-                await response_msg.edit(content=f"🎵 Fetching song database (this may take a moment)...")
-            
             popular_songs = await self.api.get_popular_songs(limit)
             
             if not popular_songs:
@@ -145,11 +135,6 @@ class Songs(commands.Cog):
         response_msg = await ctx.send(f"🎵 Fetching recently played songs{' (unique per user)' if unique else ''}...")
         
         try:
-            # Check if scores are cached - if not, update message
-            cache_key = self.api._get_cache_key("api/songs", None)
-            if not self.api._is_cache_valid(cache_key):
-                await response_msg.edit(content=f"🎵 Fetching song database (this may take a moment)...")
-            
             recent_songs = await self.api.get_recent_songs(unique_users=unique)
             
             if not recent_songs:
@@ -203,11 +188,6 @@ class Songs(commands.Cog):
         response_msg = await ctx.send(f"🔍 Searching for '{song_name}'...")
         
         try:
-            # Check if songs are cached - if not, update message
-            cache_key = self.api._get_cache_key("api/songs", None)
-            if not self.api._is_cache_valid(cache_key):
-                await response_msg.edit(content=f"🔍 Fetching song database (this may take a moment)...")
-            
             matching_songs = await self.api.search_songs(song_name)
             
             if not matching_songs:
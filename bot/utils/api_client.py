@@ -112,38 +112,12 @@ class DMBotAPI:
             raise Exception(f"Request error: {str(e)}")
     
     # Song-related methods
-    async def search_songs(self, query: str) -> List[Dict[str, Any]]:
-        """Search for songs by name"""
+    async def search_songs(self, query: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Search for songs by name, artist, album or charter, best matches first"""
         try:
-            # First try to get all songs (should be cached after first call)
-            songs = await self.request("GET", "api/songs", use_cache=True)
-            
-            # Filter songs by the query (case-insensitive partial match)
-            query_terms = query.lower().split()
-            matching_songs = []
-            
-            for song in songs:
-                song_parts = [
-                    song.get("name", "").lower(),
-                    song.get("artist", "").lower(),
-                    song.get("album", "").lower(),
-                    song.get("playlist", "").lower() if song.get("playlist") else ""
-                ]
-                
-                # Check if all query terms appear in at least one song part
-                if all(any(term in part for part in song_parts) for term in query_terms):
-                    matching_songs.append(song)
-            
-            # Sort by relevance and popularity
-            original_query = query.lower()
-            matching_songs.sort(key=lambda s: (
-                0 if s.get("name", "").lower() == original_query else 1,
-                0 if s.get("artist", "").lower() == original_query else 2,
-                0 if s.get("album", "").lower() == original_query else 3,
-                -(s.get("scores_count", 0) or 0)
-            ))
-            
-            return matching_songs
+            params = {"q": query, "limit": limit}
+            data = await self.request("GET", "api/songs/search", params=params, use_cache=True)
+            return data.get("songs", [])
         except Exception as e:
             print(f"Error searching songs: {e}")
             return []
@@ -187,15 +161,8 @@ class DMBotAPI:
     async def get_popular_songs(self, limit: int = 20) -> List[Dict[str, Any]]:
         """Get list of popular songs"""
         try:
-            songs = await self.request("GET", "api/songs", use_cache=True)
-            
-            # Sort by number of scores (popularity)
-            popular_songs = sorted(
-                songs, 
-                key=lambda s: -(s.get("scores_count", 0) or 0)
-            )
-            
-            return popular_songs[:limit]
+            params = {"limit": limit}
+            return await self.request("GET", "api/songs/popular", params=params, use_cache=True)
         except Exception as e:
             print(f"Error getting popular songs: {e}")
             return []
@@ -211,75 +178,8 @@ class DMBotAPI:
             List of recent songs
         """
         try:
-            songs = await self.request("GET", "api/songs", use_cache=True)
-            
-            # Filter out songs without a leaderboard
-            recent_songs = [
-                song for song in songs 
-                if song.get("leaderboard")
-            ]
-            
-            # Process songs to extract most recent play
-            for song in recent_songs:
-                leaderboard = song.get("leaderboard", [])
-                # Sort leaderboard by posted timestamp (most recent first)
-                if leaderboard:
-                    try:
-                        # Parse leaderboard entries if they're stored as JSON strings
-                        parsed_leaderboard = []
-                        for entry in leaderboard:
-                            if isinstance(entry, str):
-                                try:
-                                    parsed_entry = json.loads(entry)
-                                    parsed_leaderboard.append(parsed_entry)
-                                except (json.JSONDecodeError, TypeError):
-                                    # If entry can't be parsed as JSON, use as is
-                                    parsed_leaderboard.append(entry)
-                            else:
-                                parsed_leaderboard.append(entry)
-                                
-                        # Sort by posted date (most recent first)
-                        sorted_leaderboard = sorted(
-                            parsed_leaderboard,
-                            key=lambda e: e.get("posted", ""),
-                            reverse=True
-                        )
-                        
-                        # Store the most recent player and date for this song
-                        if sorted_leaderboard:
-                            most_recent = sorted_leaderboard[0]
-                            song["most_recent_player"] = most_recent.get("username", "Unknown Player")
-                            song["most_recent_date"] = most_recent.get("posted", "")
-                            song["most_recent_user_id"] = most_recent.get("user_id", "")
-                    except Exception as e:
-                        print(f"Error processing leaderboard for song {song.get('name')}: {e}")
-                        song["most_recent_player"] = "Unknown Player"
-                        song["most_recent_date"] = ""
-                        song["most_recent_user_id"] = ""
-                else:
-                    song["most_recent_player"] = "Unknown Player"
-                    song["most_recent_date"] = ""
-                    song["most_recent_user_id"] = ""
-            
-            # Sort songs by the most recent play date
-            recent_songs.sort(key=lambda s: s.get("most_recent_date", ""), reverse=True)
-            
-            # If unique_users is True, filter to only show one song per user
-            if unique_users:
-                seen_users = set()
-                filtered_songs = []
-                
-                for song in recent_songs:
-                    user_id = song.get("most_recent_user_id")
-                    if user_id and user_id not in seen_users:
-                        seen_users.add(user_id)
-                        filtered_songs.append(song)
-                        if len(filtered_songs) >= limit:
-                            break
-                
-                return filtered_songs[:limit]
-            
-            return recent_songs[:limit]
+            params = {"limit": limit, "unique_users": "true" if unique_users else "false"}
+            return await self.request("GET", "api/songs/recent", params=params, use_cache=True)
         except Exception as e:
             print(f"Error getting recent songs: {e}")
             return []
@@ -336,9 +236,8 @@ class DMBotAPI:
         """Get global user rankings"""
         try:
             params = {"limit": limit, "offset": offset}
-            # TODO: Implement /api/rankings endpoint
-            rankings = await self.request("GET", "api/rankings", params=params, use_cache=True)
-            return rankings
+            data = await self.request("GET", "api/rankings", params=params, use_cache=True)
+            return data.get("rankings", [])
         except Exception as e:
             print(f"Error getting global rankings: {e}")
             return []
@@ -347,20 +246,20 @@ class DMBotAPI:
         """Get rankings around a specific user"""
         try:
             params = {"range": range}
-            # TODO: Implement /api/rankings/{user_id} endpoint
-            rankings = await self.request("GET", f"api/rankings/{user_id}", params=params, use_cache=True)
-            return rankings
+            data = await self.request("GET", f"api/rankings/{user_id}", params=params, use_cache=True)
+            return data.get("rankings", [])
         except Exception as e:
             print(f"Error getting nearby rankings: {e}")
             return []
     
-    async def get_ranking_changes(self, limit: int = 20) -> List[Dict[str, Any]]:
-        """Get recent ranking changes"""
+    async def get_ranking_changes(self, limit: int = 20, since: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get recent ranking changes, or those after the ``since`` cursor (a change id)"""
         try:
             params = {"limit": limit}
-            # TODO: Implement /api/rankings/recent-changes endpoint
-            changes = await self.request("GET", "api/rankings/recent-changes", params=params, use_cache=True)
-            return changes
+            if since is not None:
+                params["since"] = since
+            data = await self.request("GET", "api/rankings/recent-changes", params=params, use_cache=True)
+            return data.get("changes", [])
         except Exception as e:
             print(f"Error getting ranking changes: {e}")
             return []